@@ -0,0 +1,154 @@
+"""
+Benchmarks batched (NumPy) automod evaluation against the per-message path.
+
+Only the threshold rules are compared, the others run per message either
+way. Needs no database or Discord connection. Run from the PizzaHat directory:
+
+    python -m benchmarks.automod_batch --messages 20000 --batch 256
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import string
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+from utils import features
+from utils.batch import VECTORIZED, evaluate_vectorized
+from utils.features import extract
+from utils.rules import RULES, CompiledRule, Plan
+
+MENTION_REGEX = re.compile(r"<@!?([0-9]{15,20})>")
+
+
+class FakeMessage:
+    __slots__ = (
+        "id",
+        "content",
+        "channel",
+        "author",
+        "raw_mentions",
+        "raw_role_mentions",
+        "mention_everyone",
+    )
+
+    def __init__(self, id: int, content: str):
+        self.id = id
+        self.content = content
+        self.channel = SimpleNamespace(id=1)
+        self.author = SimpleNamespace(id=id % 50, _roles=[])
+        self.raw_mentions = [int(x) for x in MENTION_REGEX.findall(content)]
+        self.raw_role_mentions = []
+        self.mention_everyone = False
+
+
+def build_messages(rng: random.Random, count: int) -> List[FakeMessage]:
+    def word():
+        return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+
+    messages = []
+
+    for i in range(count):
+        parts = [word() for _ in range(rng.randint(3, 40))]
+        kind = rng.random()
+
+        if kind < 0.05:
+            parts = [p.upper() for p in parts]
+        elif kind < 0.08:
+            parts += [f"<@{rng.randrange(10**17, 10**18)}>" for _ in range(4)]
+        elif kind < 0.10:
+            parts += ["\N{PILE OF POO}"] * 12
+        elif kind < 0.12:
+            parts = ["".join(c + "\u0336\u0322" for c in p) for p in parts]
+        elif kind < 0.30:
+            parts.append("caf\u00e9")
+
+        messages.append(FakeMessage(i, " ".join(parts)))
+
+    return messages
+
+
+async def _mentions(msg, threshold):
+    return extract(msg).mentions >= threshold
+
+
+async def _caps(msg, threshold):
+    f = extract(msg)
+    if f.length <= 7:
+        return False
+    return bool(f.cased and f.upper == f.cased) or f.caps_ratio > threshold
+
+
+async def _emojis(msg, threshold):
+    return extract(msg).total_emojis > threshold
+
+
+async def _zalgo(msg, threshold):
+    return extract(msg).combining_density > threshold
+
+
+def build_plan() -> Plan:
+    checks = {"mentions": _mentions, "caps": _caps, "emojis": _emojis, "zalgo": _zalgo}
+    rules = tuple(
+        CompiledRule(name, checks[name], RULES[name].threshold, "delete", RULES[name].reason)
+        for name in VECTORIZED
+    )
+    return Plan(frozenset(), rules)
+
+
+async def per_message(messages: List[FakeMessage], plan: Plan) -> List[Optional[str]]:
+    verdicts = []
+
+    for msg in messages:
+        result = await plan.evaluate(msg)  # type: ignore
+        verdicts.append(result[0].name if result else None)
+
+    return verdicts
+
+
+def batched(messages: List[FakeMessage], plan: Plan, size: int) -> List[Optional[str]]:
+    verdicts: List[Optional[str]] = []
+
+    for i in range(0, len(messages), size):
+        chunk = messages[i : i + size]
+        rules = evaluate_vectorized(chunk, [plan] * len(chunk))  # type: ignore
+        verdicts.extend(r.name if r else None for r in rules)
+
+    return verdicts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    messages = build_messages(random.Random(args.seed), args.messages)
+    plan = build_plan()
+
+    start = time.perf_counter()
+    expected = asyncio.run(per_message(messages, plan))
+    base = time.perf_counter() - start
+
+    # Don't let the batch path reuse features cached by the per-message run
+    features._cache.clear()
+
+    start = time.perf_counter()
+    got = batched(messages, plan, args.batch)
+    fast = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(expected, got))
+    hits = sum(v is not None for v in expected)
+
+    print(f"{args.messages:,} messages, {hits:,} hits, batches of {args.batch}\n")
+    print(f"{'per message':<16}{args.messages / base:>12,.0f} msg/s")
+    print(f"{'batched':<16}{args.messages / fast:>12,.0f} msg/s")
+    print(f"\nSpeedup: {base / fast:.1f}x, {mismatches} verdict mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Replays a message corpus through the AutoMod checks and reports throughput.
+
+Messages are fake discord.Message objects and time is simulated from their
+timestamps, so spam/duplicate windows behave like they would live. Invites
+resolve to another guild without any request. Needs no database or Discord
+connection, but does need the bot's dependencies and utils/config.py.
+Run from the PizzaHat directory:
+
+    python -m benchmarks.automod_replay --messages 20000 --dump corpus.jsonl
+    python -m benchmarks.automod_replay --corpus corpus.jsonl --all-rules
+
+A corpus is JSON lines of {"content", "channel_id", "author_id", "time"}
+with an optional "label". Hits on messages labelled "clean" are counted as
+false positives. Dump a synthetic corpus once and replay it on each branch
+to compare them on the same input.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import string
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+from utils import duplicates, features, spam
+from utils.automod import AutoMod
+from utils.config import BANNED_WORDS
+from utils.rules import Plan
+
+MENTION_REGEX = re.compile(r"<@!?([0-9]{15,20})>")
+ROLE_MENTION_REGEX = re.compile(r"<@&([0-9]{15,20})>")
+
+GUILD_ID = 1
+OTHER_GUILD_ID = 2
+
+
+class Clock:
+    """Stands in for time.monotonic in the modules with time windows."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeMessage:
+    __slots__ = (
+        "id",
+        "content",
+        "guild",
+        "channel",
+        "author",
+        "attachments",
+        "raw_mentions",
+        "raw_role_mentions",
+        "mention_everyone",
+        "time",
+        "label",
+    )
+
+    def __init__(self, id: int, guild, entry: dict):
+        content = entry["content"]
+
+        self.id = id
+        self.content = content
+        self.guild = guild
+        self.channel = SimpleNamespace(id=entry["channel_id"], parent_id=None)
+        self.author = SimpleNamespace(id=entry["author_id"], _roles=[], bot=False)
+        self.attachments = []
+        self.raw_mentions = [int(x) for x in MENTION_REGEX.findall(content)]
+        self.raw_role_mentions = [int(x) for x in ROLE_MENTION_REGEX.findall(content)]
+        self.mention_everyone = "@everyone" in content or "@here" in content
+        self.time = entry["time"]
+        self.label = entry.get("label")
+
+
+def synthetic_corpus(rng: random.Random, count: int, rate: float) -> List[dict]:
+    """Mostly clean chatter with every kind of abuse the rules look for mixed in."""
+
+    def word():
+        return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+
+    def sentence(lo=3, hi=25):
+        return " ".join(word() for _ in range(rng.randint(lo, hi))).capitalize()
+
+    def snowflake():
+        return rng.randrange(10**17, 10**18)
+
+    entries: List[dict] = []
+    now = 0.0
+
+    def add(content, label, channel_id=None, author_id=None):
+        nonlocal now
+        now += rng.expovariate(rate)
+        entries.append(
+            {
+                "content": content,
+                "channel_id": channel_id or rng.randint(1, 20),
+                "author_id": author_id or rng.randint(1, 2000),
+                "time": round(now, 4),
+                "label": label,
+            }
+        )
+
+    while len(entries) < count:
+        kind = rng.random()
+
+        if kind < 0.80:
+            text = sentence()
+            extra = rng.random()
+            if extra < 0.1:
+                text += " \N{FACE WITH TEARS OF JOY}"
+            elif extra < 0.15:
+                text += f" https://example.com/{word()}"
+            elif extra < 0.2:
+                text += f" <@{snowflake()}>"
+            elif extra < 0.25:
+                text = "LOL"
+            add(text, "clean")
+        elif kind < 0.83:
+            add(sentence().upper(), "caps")
+        elif kind < 0.85:
+            add(sentence(1, 5) + "".join(f" <@{snowflake()}>" for _ in range(5)), "mentions")
+        elif kind < 0.87:
+            add(sentence(1, 5) + " " + "\N{PILE OF POO}" * 15, "emojis")
+        elif kind < 0.89:
+            add("".join(c + "\u0336\u0322\u0317" for c in sentence()), "zalgo")
+        elif kind < 0.91:
+            add(f"{sentence(1, 8)} discord.gg/{word()}{word()}", "invites")
+        elif kind < 0.93 and BANNED_WORDS:
+            parts = sentence().split()
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(BANNED_WORDS))
+            add(" ".join(parts), "words")
+        elif kind < 0.96:
+            # One user flooding a channel
+            author, channel = rng.randint(1, 2000), rng.randint(1, 20)
+            for _ in range(8):
+                add(sentence(1, 6), "spam", channel, author)
+        elif kind < 0.98:
+            # The same ad posted by several accounts across channels
+            text = sentence(8, 15)
+            for _ in range(6):
+                add(text, "duplicates")
+        else:
+            # Long messages, the pathological case for inline checks
+            add(" ".join(sentence() for _ in range(rng.randint(20, 60)))[:4000], "clean")
+
+    return entries[:count]
+
+
+def percentile(samples: List[int], pct: float) -> float:
+    if not samples:
+        return 0.0
+
+    index = min(int(len(samples) * pct / 100), len(samples) - 1)
+    return samples[index] / 1000
+
+
+SCAN = "scan"
+
+
+class Recorder:
+    """
+    Wraps each rule's check to time it and count hits. The content scan the
+    rules share is timed as its own row, so it isn't charged to whichever
+    rule happens to run first.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[int]] = {SCAN: []}
+        self.hits: Dict[str, int] = {SCAN: 0}
+        self.false_positives: Dict[str, int] = {SCAN: 0}
+
+    def scan(self, msg) -> None:
+        start = time.perf_counter_ns()
+        features.extract(msg)
+        self.samples[SCAN].append(time.perf_counter_ns() - start)
+
+    def wrap(self, rule):
+        samples = self.samples.setdefault(rule.name, [])
+        self.hits.setdefault(rule.name, 0)
+        self.false_positives.setdefault(rule.name, 0)
+        check = rule.check
+
+        async def timed(msg, threshold):
+            start = time.perf_counter_ns()
+            hit = await check(msg, threshold)
+            samples.append(time.perf_counter_ns() - start)
+
+            if hit:
+                self.hits[rule.name] += 1
+                if msg.label == "clean":
+                    self.false_positives[rule.name] += 1
+
+            return hit
+
+        return rule._replace(check=timed)
+
+
+async def fetch_invite(code: str, with_counts: bool = False):
+    return SimpleNamespace(guild=SimpleNamespace(id=OTHER_GUILD_ID))
+
+
+async def no_invites():
+    return []
+
+
+async def replay(messages: List[FakeMessage], all_rules: bool):
+    bot = SimpleNamespace(
+        allowed_mentions=None, db=None, session=None, fetch_invite=fetch_invite
+    )
+    automod = AutoMod(bot)  # type: ignore
+    recorder = Recorder()
+
+    plan = await automod.rules.get(GUILD_ID)
+    plan = Plan(plan.exempt, tuple(recorder.wrap(r) for r in plan.rules))
+
+    clock = Clock()
+    spam.time = duplicates.time = clock  # type: ignore
+    actioned = 0
+
+    start = time.perf_counter()
+
+    for msg in messages:
+        clock.now = msg.time
+        recorder.scan(msg)
+
+        if all_rules:
+            hit = False
+            for rule in plan.rules:
+                hit = bool(await rule.check(msg, rule.threshold)) or hit  # type: ignore
+        else:
+            hit = await plan.evaluate(msg) is not None  # type: ignore
+
+        actioned += hit
+
+    elapsed = time.perf_counter() - start
+
+    spam.time = duplicates.time = time  # type: ignore
+    await automod.cog_unload()
+    return elapsed, actioned, recorder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="JSON lines corpus to replay")
+    parser.add_argument("--dump", help="write the synthetic corpus here")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=50.0, help="synthetic messages/sec")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--all-rules", action="store_true", help="run every rule instead of stopping at the first hit"
+    )
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    else:
+        entries = synthetic_corpus(random.Random(args.seed), args.messages, args.rate)
+
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+
+    guild = SimpleNamespace(id=GUILD_ID, vanity_url_code=None, invites=no_invites)
+    messages = [FakeMessage(i, guild, e) for i, e in enumerate(entries, 1)]
+    features._cache.clear()
+
+    elapsed, actioned, recorder = asyncio.run(replay(messages, args.all_rules))
+
+    print(
+        f"{len(messages):,} messages in {elapsed:.2f}s, "
+        f"{len(messages) / elapsed:,.0f} msg/s, {actioned:,} actioned\n"
+    )
+    print(
+        f"{'rule':<12}{'calls':>9}{'hits':>8}{'clean hits':>12}"
+        f"{'p50 us':>9}{'p99 us':>9}{'max us':>9}"
+    )
+
+    for name, samples in recorder.samples.items():
+        samples.sort()
+        print(
+            f"{name:<12}{len(samples):>9,}{recorder.hits[name]:>8,}"
+            f"{recorder.false_positives[name]:>12,}"
+            f"{percentile(samples, 50):>9.1f}{percentile(samples, 99):>9.1f}"
+            f"{(samples[-1] / 1000 if samples else 0):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
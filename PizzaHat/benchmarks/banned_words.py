@@ -0,0 +1,82 @@
+"""
+Benchmarks the banned-word matcher against the old per-word substring loop.
+
+Needs no database or Discord connection. Run from the PizzaHat directory:
+
+    python -m benchmarks.banned_words --words 10000 --messages 2000
+"""
+
+import argparse
+import random
+import string
+import time
+from typing import Callable, List
+
+from utils.matcher import WordMatcher
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+
+
+def build_messages(
+    rng: random.Random, words: List[str], count: int, hit_rate: float
+) -> List[str]:
+    messages = []
+
+    for _ in range(count):
+        parts = [random_word(rng) for _ in range(rng.randint(5, 30))]
+
+        if rng.random() < hit_rate:
+            parts.insert(rng.randrange(len(parts)), rng.choice(words))
+
+        messages.append(" ".join(parts).capitalize())
+
+    return messages
+
+
+def legacy(words: List[str]) -> Callable[[str], bool]:
+    def check(content: str) -> bool:
+        for word in words.copy():
+            if word in content.lower():
+                return True
+        return False
+
+    return check
+
+
+def run(name: str, check: Callable[[str], bool], messages: List[str]) -> float:
+    start = time.perf_counter()
+    hits = sum(1 for m in messages if check(m))
+    per_msg = (time.perf_counter() - start) * 1_000_000 / len(messages)
+
+    print(f"{name:<24}{per_msg:>12.1f}us/msg{hits:>10} hits")
+    return per_msg
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--words", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--hit-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [random_word(rng) for _ in range(args.words)]
+    messages = build_messages(rng, words, args.messages, args.hit_rate)
+
+    start = time.perf_counter()
+    substring = WordMatcher(words, whole_words=False)
+    whole = WordMatcher(words)
+    print(f"Built 2 automata over {args.words:,} words in {time.perf_counter() - start:.2f}s\n")
+
+    base = run("substring loop", legacy(words), messages)
+    fast = run("aho-corasick (substring)", lambda m: bool(substring.search(m)), messages)
+    run("aho-corasick (words)", lambda m: bool(whole.search(m)), messages)
+
+    print(f"\nSpeedup (same semantics): {base / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
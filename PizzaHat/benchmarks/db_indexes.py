@@ -0,0 +1,192 @@
+"""
+Benchmarks the bot's hot-path queries before and after the index migrations.
+
+Everything is created inside a scratch schema which is dropped first, so only
+point this at a local/throwaway Postgres. Run from the PizzaHat directory:
+
+    python -m benchmarks.db_indexes --dsn postgresql://localhost/pizzahat --rows 2000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+
+import asyncpg
+from core.migrations import MIGRATIONS
+
+SCHEMA = "pizzahat_bench"
+
+# name -> (query, params factory)
+Query = Tuple[str, Callable[[], tuple]]
+
+
+def build_queries(rows: int, guilds: int, users: int) -> Dict[str, Query]:
+    def warnlogs_params():
+        i = random.randrange(rows)
+        return ((i * 7919) % users, i % guilds)
+
+    def afk_params():
+        i = random.randrange(rows)
+        return (i % guilds, i)
+
+    def star_user_params():
+        i = random.randrange(rows)
+        return (i % guilds, i)
+
+    def star_bot_params():
+        i = random.randrange(rows)
+        return (i % guilds, i + rows)
+
+    def tags_params():
+        i = random.randrange(rows)
+        return (i % guilds, f"tag_{i}")
+
+    return {
+        "warnlogs by user": (
+            "SELECT * FROM warnlogs WHERE user_id=$1 AND guild_id=$2",
+            warnlogs_params,
+        ),
+        "afk by member": (
+            "SELECT reason FROM afk WHERE guild_id=$1 AND user_id=$2",
+            afk_params,
+        ),
+        "star_info by user_msg_id": (
+            "SELECT bot_msg_id FROM star_info WHERE guild_id=$1 AND user_msg_id=$2",
+            star_user_params,
+        ),
+        "star_info by bot_msg_id": (
+            "SELECT user_msg_id FROM star_info WHERE guild_id=$1 AND bot_msg_id=$2",
+            star_bot_params,
+        ),
+        "tags by name": (
+            "SELECT content FROM tags WHERE guild_id=$1 AND tag_name=$2",
+            tags_params,
+        ),
+    }
+
+
+async def seed(conn: asyncpg.Connection, rows: int, guilds: int, users: int) -> None:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    for statement in MIGRATIONS[0].statements:
+        await conn.execute(statement)
+
+    # The original tags table only allows one row per guild, start from a bare heap
+    await conn.execute("ALTER TABLE tags DROP CONSTRAINT tags_pkey")
+
+    print(f"Seeding {rows:,} rows per table...")
+    start = time.perf_counter()
+
+    await conn.execute(
+        """INSERT INTO warnlogs (guild_id, user_id, mod_id, reason)
+        SELECT i % $2, (i * 7919) % $3, i % 1000, 'benchmark'
+        FROM generate_series(0, $1 - 1) AS i""",
+        rows,
+        guilds,
+        users,
+    )
+    await conn.execute(
+        """INSERT INTO afk (guild_id, user_id, reason)
+        SELECT i % $2, i, 'benchmark' FROM generate_series(0, $1 - 1) AS i""",
+        rows,
+        guilds,
+    )
+    await conn.execute(
+        """INSERT INTO star_info (guild_id, user_msg_id, bot_msg_id)
+        SELECT i % $2, i, i + $1 FROM generate_series(0, $1 - 1) AS i""",
+        rows,
+        guilds,
+    )
+    await conn.execute(
+        """INSERT INTO tags (guild_id, tag_name, content, creator)
+        SELECT i % $2, 'tag_' || i, 'benchmark', i % 1000
+        FROM generate_series(0, $1 - 1) AS i""",
+        rows,
+        guilds,
+    )
+    await conn.execute("ANALYZE")
+
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+
+async def apply_indexes(conn: asyncpg.Connection) -> None:
+    start = time.perf_counter()
+
+    for migration in MIGRATIONS[1:]:
+        for statement in migration.statements:
+            await conn.execute(statement)
+
+    await conn.execute("ANALYZE")
+    print(f"Built indexes in {time.perf_counter() - start:.1f}s")
+
+
+async def measure(
+    conn: asyncpg.Connection, queries: Dict[str, Query], iterations: int
+) -> Dict[str, Tuple[float, float]]:
+    results = {}
+
+    for name, (query, params) in queries.items():
+        stmt = await conn.prepare(query)
+        timings: List[float] = []
+
+        for _ in range(iterations):
+            args = params()
+            start = time.perf_counter()
+            await stmt.fetch(*args)
+            timings.append((time.perf_counter() - start) * 1000.0)
+
+        cuts = statistics.quantiles(timings, n=100)
+        results[name] = (cuts[49], cuts[98])
+
+    return results
+
+
+def report(
+    before: Dict[str, Tuple[float, float]], after: Dict[str, Tuple[float, float]]
+) -> None:
+    header = f"{'query':<28}{'p50 before':>12}{'p99 before':>12}{'p50 after':>12}{'p99 after':>12}"
+    print(header)
+    print("-" * len(header))
+
+    for name, (p50, p99) in before.items():
+        a50, a99 = after[name]
+        print(f"{name:<28}{p50:>10.3f}ms{p99:>10.3f}ms{a50:>10.3f}ms{a99:>10.3f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_PG_URL"))
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--guilds", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument(
+        "--keep", action="store_true", help="Don't drop the scratch schema afterwards"
+    )
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(args.dsn, server_settings={"search_path": SCHEMA})
+
+    try:
+        await seed(conn, args.rows, args.guilds, args.users)
+        queries = build_queries(args.rows, args.guilds, args.users)
+
+        before = await measure(conn, queries, args.iterations)
+        await apply_indexes(conn)
+        after = await measure(conn, queries, args.iterations)
+
+        report(before, after)
+
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
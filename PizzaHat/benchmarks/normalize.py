@@ -0,0 +1,103 @@
+"""
+Measures the per-message cost of text normalization.
+
+Compares utils.normalize against a per-character loop doing the same
+folding (minus joining spaced out letters), for plain ASCII chat, accented
+text and evasion attempts. Needs no database or Discord connection. Run
+from the PizzaHat directory:
+
+    python -m benchmarks.normalize --messages 20000
+"""
+
+import argparse
+import random
+import string
+import time
+import unicodedata
+from typing import Callable, Dict, List
+
+from utils.normalize import _CONFUSABLES, _LEET, normalize
+
+_BASELINE_MAP: Dict[str, str] = {
+    ch: latin for latin, chars in _CONFUSABLES.items() for ch in chars
+}
+
+
+def baseline(text: str) -> str:
+    """The obvious implementation, one unicodedata lookup per character."""
+
+    out = []
+
+    for ch in unicodedata.normalize("NFKD", text).casefold():
+        if unicodedata.category(ch) in ("Mn", "Me", "Cf"):
+            continue
+        ch = _BASELINE_MAP.get(ch, ch)
+        out.append(_LEET.get(ch, ch))
+
+    return "".join(out)
+
+
+def build_messages(rng: random.Random, kind: str, count: int) -> List[str]:
+    def word():
+        return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+
+    messages = []
+
+    for _ in range(count):
+        words = [word() for _ in range(rng.randint(3, 40))]
+
+        if kind == "accented":
+            words = [w.replace("e", "é").replace("a", "à") for w in words]
+        elif kind == "evasive":
+            evasive = []
+            for w in words:
+                trick = rng.random()
+                if trick < 0.3:
+                    w = "".join(
+                        rng.choice(_CONFUSABLES[c])
+                        if c in _CONFUSABLES and rng.random() < 0.5
+                        else c
+                        for c in w
+                    )
+                elif trick < 0.5:
+                    w = "\u200b".join(w)
+                elif trick < 0.6:
+                    w = " ".join(w)
+                elif trick < 0.7:
+                    w = "".join(chr(0xFF41 + ord(c) - 97) for c in w)
+                evasive.append(w)
+            words = evasive
+
+        messages.append(" ".join(words))
+
+    return messages
+
+
+def bench(fn: Callable[[str], str], messages: List[str]) -> float:
+    start = time.perf_counter()
+    for text in messages:
+        fn(text)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f"{'corpus':<12}{'baseline':>12}{'normalize':>12}{'speedup':>10}")
+
+    for kind in ("ascii", "accented", "evasive"):
+        messages = build_messages(rng, kind, args.messages)
+        slow = bench(baseline, messages)
+        fast = bench(normalize, messages)
+        print(f"{kind:<12}{slow:>9.1f} us{fast:>9.1f} us{slow / fast:>9.1f}x")
+
+    print("\nPer message, computed once and shared through features.extract.")
+
+
+if __name__ == "__main__":
+    main()
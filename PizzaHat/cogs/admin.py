@@ -52,6 +52,7 @@ class Admin(Cog, emoji=916988537264570368):
                     ctx.guild.id,
                     role.id,
                 )
+                self.bot.settings.invalidate(ctx.guild.id)
                 await ctx.send(f"{self.bot.yes} Staff role set to {role.name}")
 
         except Exception as e:
@@ -80,6 +81,7 @@ class Admin(Cog, emoji=916988537264570368):
                     ctx.guild.id,
                     channel.id,
                 )
+                self.bot.settings.invalidate(ctx.guild.id)
                 await ctx.send(f"{self.bot.yes} Mod-logs channel set to {channel}")
 
         except Exception as e:
@@ -1,4 +1,5 @@
 import traceback
+from typing import Optional, Union
 
 import discord
 from core.bot import PizzaHat
@@ -7,6 +8,8 @@ from discord import ui
 from discord.ext import commands
 from discord.ext.commands import Context
 from utils.config import BANNED_WORDS
+from utils.phash import to_signed
+from utils.rules import ACTIONS, RULES
 
 
 def actions_embed(ctx: Context):
@@ -172,6 +175,7 @@ class AutoModeration(Cog, emoji=1207259153437949953):
                 if self.bot.db and ctx.guild
                 else None
             )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
             await ctx.send(f"{self.bot.yes} Auto-mod enabled.")
 
         except Exception as e:
@@ -200,12 +204,552 @@ class AutoModeration(Cog, emoji=1207259153437949953):
                 if self.bot.db and ctx.guild
                 else None
             )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
             await ctx.send(f"{self.bot.yes} Auto-mod disabled.")
 
         except Exception as e:
             await ctx.send(f"{self.bot.no} Something went wrong...")
             print(f"Error in automod disable cmd: {e}")
 
+    def invalidate_banned_words(self, guild_id: int) -> None:
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is not None:
+            cog.banned.invalidate(guild_id)  # type: ignore
+
+    def invalidate_images(self, guild_id: int) -> None:
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is not None:
+            cog.images.invalidate(guild_id)  # type: ignore
+
+    def invalidate_rules(self, guild_id: int) -> None:
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is not None:
+            cog.rules.invalidate(guild_id)  # type: ignore
+
+    @automod.command(name="rules")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def automod_rules(self, ctx: Context):
+        """
+        Shows the server's auto-mod rules in the order they are checked.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is None or ctx.guild is None:
+            return await ctx.send(f"{self.bot.no} Auto-mod is not loaded.")
+
+        plan = await cog.rules.get(ctx.guild.id)  # type: ignore
+        enabled = {r.name: r for r in plan.rules}
+
+        em = discord.Embed(title="Auto-mod rules", color=self.bot.color)
+
+        for name in RULES:
+            rule = enabled.get(name)
+            em.add_field(
+                name=f"{self.bot.yes if rule else self.bot.no} {name}",
+                value=(
+                    f"Action: `{rule.action}`\nThreshold: `{rule.threshold:g}`"
+                    if rule and rule.threshold is not None
+                    else f"Action: `{rule.action}`" if rule else "Disabled"
+                )
+                + ("\nShadow mode" if rule and rule.shadow else ""),
+            )
+
+        if plan.exempt:
+            mentions = [
+                f"<#{i}>" if ctx.guild.get_channel(i) else f"<@&{i}>"
+                for i in plan.exempt
+            ]
+            em.add_field(name="Exempt", value=", ".join(mentions), inline=False)
+
+        await ctx.send(embed=em)
+
+    @automod.command(name="set")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_set(self, ctx: Context, rule: str, setting: str, *, value: str):
+        """
+        Changes a setting of an auto-mod rule.
+
+        Settings are `enabled` (on/off), `threshold` (a number),
+        `action` (delete, warn, timeout or log) and `shadow` (on/off).
+        A rule in shadow mode is checked and counted but never acted on,
+        see `automod stats`. The duplicates and images rules start in
+        shadow mode.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        rule, setting, value = rule.lower(), setting.lower(), value.strip().lower()
+
+        if rule not in RULES:
+            return await ctx.send(
+                f"{self.bot.no} Unknown rule, choose from: {', '.join(RULES)}"
+            )
+
+        if setting in ("enabled", "shadow"):
+            if value not in ("on", "off", "true", "false"):
+                return await ctx.send(f"{self.bot.no} Value must be `on` or `off`.")
+            column, arg = setting, value in ("on", "true")
+
+        elif setting == "threshold":
+            if RULES[rule].threshold is None:
+                return await ctx.send(f"{self.bot.no} That rule has no threshold.")
+            try:
+                column, arg = "threshold", float(value)
+            except ValueError:
+                return await ctx.send(f"{self.bot.no} Threshold must be a number.")
+
+        elif setting == "action":
+            if value not in ACTIONS:
+                return await ctx.send(
+                    f"{self.bot.no} Action must be one of: {', '.join(ACTIONS)}"
+                )
+            column, arg = "action", value
+
+        else:
+            return await ctx.send(
+                f"{self.bot.no} Setting must be `enabled`, `threshold`, `action` or `shadow`."
+            )
+
+        try:
+            (
+                await self.bot.db.execute(
+                    f"""INSERT INTO automod_rules (guild_id, rule, {column}) VALUES ($1, $2, $3)
+                    ON CONFLICT (guild_id, rule) DO UPDATE SET {column}=EXCLUDED.{column}""",
+                    ctx.guild.id,
+                    rule,
+                    arg,
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.invalidate_rules(ctx.guild.id)  # type: ignore
+            await ctx.send(f"{self.bot.yes} Set `{setting}` of `{rule}` to `{value}`.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod set cmd: {e}")
+
+    @automod.command(name="stats")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    async def automod_stats(self, ctx: Context, hours: int = 24):
+        """
+        Shows how often each auto-mod rule was hit in the last `hours` hours,
+        including what rules in shadow mode would have done.
+
+        Stats are written about once a minute.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        hours = max(1, min(hours, 24 * 30))
+
+        try:
+            rows = (
+                await self.bot.db.fetch(
+                    """SELECT rule, sum(checked) AS checked, sum(hits) AS hits,
+                    sum(shadow_hits) AS shadow_hits FROM automod_stats
+                    WHERE guild_id=$1 AND bucket >= date_trunc('hour', now()) - make_interval(hours => $2)
+                    GROUP BY rule""",
+                    ctx.guild.id,
+                    hours,
+                )
+                if self.bot.db and ctx.guild
+                else []
+            )
+            stats = {r["rule"]: r for r in rows}
+
+            em = discord.Embed(
+                title=f"Auto-mod stats, last {hours}h",
+                color=self.bot.color,
+                timestamp=ctx.message.created_at,
+            )
+
+            for name in RULES:
+                row = stats.get(name)
+
+                if row is None or not row["checked"]:
+                    continue
+
+                lines = [f"Checked: `{row['checked']:,}`"]
+                if row["hits"]:
+                    lines.append(
+                        f"Hits: `{row['hits']:,}` ({row['hits'] / row['checked']:.2%})"
+                    )
+                if row["shadow_hits"]:
+                    lines.append(
+                        f"Shadow hits: `{row['shadow_hits']:,}` "
+                        f"({row['shadow_hits'] / row['checked']:.2%})"
+                    )
+
+                em.add_field(name=name, value="\n".join(lines))
+
+            if not em.fields:
+                em.description = "No messages were checked in that time."
+
+            await ctx.send(embed=em)
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod stats cmd: {e}")
+
+    @automod.command(name="exempt")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_exempt(
+        self, ctx: Context, *, target: Union[discord.Role, discord.TextChannel]
+    ):
+        """
+        Exempts a role or channel from auto-mod, or removes the exemption.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        try:
+            res = (
+                await self.bot.db.execute(
+                    "DELETE FROM automod_exempt WHERE guild_id=$1 AND target_id=$2",
+                    ctx.guild.id,
+                    target.id,
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+
+            if res == "DELETE 0":
+                await self.bot.db.execute(  # type: ignore
+                    "INSERT INTO automod_exempt (guild_id, target_id) VALUES ($1, $2)",
+                    ctx.guild.id,  # type: ignore
+                    target.id,
+                )
+                await ctx.send(f"{self.bot.yes} {target.mention} is now exempt.")
+            else:
+                await ctx.send(f"{self.bot.yes} {target.mention} is no longer exempt.")
+
+            self.invalidate_rules(ctx.guild.id)  # type: ignore
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod exempt cmd: {e}")
+
+    async def hash_image(self, ctx: Context) -> Optional[int]:
+        """Hashes the image attached to the command or to the message it replies to."""
+
+        cog = self.bot.get_cog("AutoMod")
+        ref = ctx.message.reference
+        attachments = ctx.message.attachments or (
+            ref.resolved.attachments
+            if ref and isinstance(ref.resolved, discord.Message)
+            else []
+        )
+
+        if cog is None or not attachments:
+            return None
+
+        return await cog.images.hash_attachment(attachments[0])  # type: ignore
+
+    @automod.command(name="blockimage")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_blockimage(self, ctx: Context):
+        """
+        Blocks an image, attach it or reply to a message with it.
+
+        Similar looking copies of the image are blocked too.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        h = await self.hash_image(ctx)
+
+        if h is None:
+            return await ctx.send(f"{self.bot.no} Attach or reply to an image.")
+
+        try:
+            (
+                await self.bot.db.execute(
+                    "INSERT INTO image_blocklist (guild_id, hash) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+                    ctx.guild.id,
+                    to_signed(h),
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.invalidate_images(ctx.guild.id)  # type: ignore
+
+            # The images rule starts in shadow mode, where nothing is blocked yet
+            plan = await self.bot.get_cog("AutoMod").rules.get(ctx.guild.id)  # type: ignore
+            rule = next((r for r in plan.rules if r.name == "images"), None)
+
+            if rule is None:
+                note = f"\nThe `images` rule is disabled, turn it on with `{ctx.clean_prefix}automod set images enabled on`."
+            elif rule.shadow:
+                note = f"\nThe `images` rule is in shadow mode, matches are only counted. Enforce it with `{ctx.clean_prefix}automod set images shadow off`."
+            else:
+                note = ""
+
+            await ctx.send(f"{self.bot.yes} Image blocked (`{h:016x}`).{note}")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod blockimage cmd: {e}")
+
+    @automod.command(name="unblockimage")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_unblockimage(self, ctx: Context):
+        """
+        Unblocks an image, attach it or reply to a message with it.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        h = await self.hash_image(ctx)
+
+        if h is None:
+            return await ctx.send(f"{self.bot.no} Attach or reply to an image.")
+
+        try:
+            res = (
+                await self.bot.db.execute(
+                    "DELETE FROM image_blocklist WHERE guild_id=$1 AND hash=$2",
+                    ctx.guild.id,
+                    to_signed(h),
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+
+            if res == "DELETE 0":
+                return await ctx.send(f"{self.bot.no} That image is not blocked.")
+
+            self.invalidate_images(ctx.guild.id)  # type: ignore
+            await ctx.send(f"{self.bot.yes} Image unblocked.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod unblockimage cmd: {e}")
+
+    @automod.command(name="addword")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_addword(self, ctx: Context, *, word: str):
+        """
+        Adds a word to the server's banned words.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        word = word.strip().lower()
+
+        if not word or len(word) > 100:
+            return await ctx.send(
+                f"{self.bot.no} Word must be between 1 and 100 characters."
+            )
+
+        try:
+            (
+                await self.bot.db.execute(
+                    "INSERT INTO banned_words (guild_id, word) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+                    ctx.guild.id,
+                    word,
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.invalidate_banned_words(ctx.guild.id)  # type: ignore
+            await ctx.send(f"{self.bot.yes} Added `{word}` to banned words.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod addword cmd: {e}")
+
+    @automod.command(name="removeword")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    async def automod_removeword(self, ctx: Context, *, word: str):
+        """
+        Removes a word from the server's banned words.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        try:
+            res = (
+                await self.bot.db.execute(
+                    "DELETE FROM banned_words WHERE guild_id=$1 AND word=$2",
+                    ctx.guild.id,
+                    word.strip().lower(),
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+
+            if res == "DELETE 0":
+                return await ctx.send(f"{self.bot.no} That word is not banned.")
+
+            self.invalidate_banned_words(ctx.guild.id)  # type: ignore
+            await ctx.send(f"{self.bot.yes} Removed `{word}` from banned words.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod removeword cmd: {e}")
+
+    @automod.command(name="antialt")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.bot_has_permissions(kick_members=True, ban_members=True, manage_roles=True)
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    async def automod_antialt(
+        self,
+        ctx: Context,
+        min_age: int,
+        level: int = 1,
+        role: Optional[discord.Role] = None,
+    ):
+        """
+        Enables anti-alt and raid lockdown for new members.
+
+        Accounts younger than `min_age` days are handled by `level`:
+        1 gives them `role`, 2 kicks them and 3 bans them. During a raid
+        every new member is handled the same way, see `automod raid`.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        if min_age < 0 or level not in (1, 2, 3):
+            return await ctx.send(
+                f"{self.bot.no} Minimum age can't be negative and level must be 1, 2 or 3."
+            )
+
+        if level == 1 and role is None:
+            return await ctx.send(f"{self.bot.no} Level 1 needs a role to give.")
+
+        try:
+            (
+                await self.bot.db.execute(
+                    """INSERT INTO antialt (guild_id, enabled, min_age, restricted_role, level)
+                    VALUES ($1, true, $2, $3, $4)
+                    ON CONFLICT (guild_id) DO UPDATE SET enabled=true, min_age=EXCLUDED.min_age,
+                    restricted_role=EXCLUDED.restricted_role, level=EXCLUDED.level""",
+                    ctx.guild.id,
+                    min_age,
+                    role.id if role else None,
+                    level,
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
+            await ctx.send(f"{self.bot.yes} Anti-alt enabled.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod antialt cmd: {e}")
+
+    @automod.command(name="raid")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    async def automod_raid(self, ctx: Context, joins: int, seconds: float):
+        """
+        Sets how many joins within how many seconds count as a raid.
+
+        Takes effect once anti-alt is enabled.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        if not 2 <= joins <= 100 or not 1 <= seconds <= 3600:
+            return await ctx.send(
+                f"{self.bot.no} Joins must be between 2 and 100 and seconds between 1 and 3600."
+            )
+
+        try:
+            (
+                await self.bot.db.execute(
+                    """INSERT INTO antialt (guild_id, raid_joins, raid_window) VALUES ($1, $2, $3)
+                    ON CONFLICT (guild_id) DO UPDATE SET raid_joins=EXCLUDED.raid_joins,
+                    raid_window=EXCLUDED.raid_window""",
+                    ctx.guild.id,
+                    joins,
+                    seconds,
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
+            await ctx.send(
+                f"{self.bot.yes} A raid is now {joins} joins within {seconds:g} seconds."
+            )
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod raid cmd: {e}")
+
+    @automod.command(name="antialt-off")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    async def automod_antialt_off(self, ctx: Context):
+        """
+        Disables anti-alt and lifts any raid lockdown.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        try:
+            (
+                await self.bot.db.execute(
+                    "UPDATE antialt SET enabled=false WHERE guild_id=$1", ctx.guild.id
+                )
+                if self.bot.db and ctx.guild
+                else None
+            )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
+
+            cog = self.bot.get_cog("JoinGate")
+            if cog is not None:
+                cog.lift_lockdown(ctx.guild.id)  # type: ignore
+
+            await ctx.send(f"{self.bot.yes} Anti-alt disabled.")
+
+        except Exception as e:
+            await ctx.send(f"{self.bot.no} Something went wrong...")
+            print(f"Error in automod antialt-off cmd: {e}")
+
+    @automod.command(name="unlock")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def automod_unlock(self, ctx: Context):
+        """
+        Ends a raid lockdown early.
+
+        To use this command, you must have Manage Server permission.
+        """
+
+        cog = self.bot.get_cog("JoinGate")
+
+        if cog is not None and cog.lift_lockdown(ctx.guild.id):  # type: ignore
+            await ctx.send(f"{self.bot.yes} Lockdown lifted.")
+        else:
+            await ctx.send(f"{self.bot.no} This server isn't in lockdown.")
+
     @automod.command(name="antislur")
     @commands.has_permissions(manage_guild=True)
     @commands.bot_has_permissions(manage_guild=True)
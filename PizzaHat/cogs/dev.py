@@ -192,6 +192,129 @@ class Dev(Cog, emoji=833297795761831956):
         else:
             await ctx.send(fmt)
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def dbstats(self, ctx: Context, reset: bool = False):
+        """Shows DB pool usage and per-query latency stats."""
+
+        db = self.bot.db
+        wait = db.pool_wait
+        writes = self.bot.write_buffer
+
+        lines = [
+            f"Pool: {db.get_size()} open, {db.get_idle_size()} idle "
+            f"(min {db.get_min_size()}, max {db.get_max_size()})",
+            f"Pool wait: {plural(wait.count):acquire} | p50 {wait.percentile(50):.0f}ms "
+            f"| p99 {wait.percentile(99):.0f}ms | max {wait.max:.1f}ms",
+            f"Write buffer: {writes.depth} queued | {plural(writes.flushed_rows):row} in "
+            f"{plural(writes.round_trips):round trip} | flush p50 {writes.flush_latency.percentile(50):.0f}ms "
+            f"| p99 {writes.flush_latency.percentile(99):.0f}ms | {writes.dropped_rows} dropped",
+        ]
+
+        table = TabularData()
+        table.set_columns(["query", "calls", "total ms", "p50", "p99", "max"])
+
+        by_total = sorted(db.queries.items(), key=lambda i: i[1].total, reverse=True)
+        for query, h in by_total[:10]:
+            table.add_row(
+                [
+                    query if len(query) <= 50 else query[:47] + "...",
+                    h.count,
+                    f"{h.total:.0f}",
+                    f"{h.percentile(50):.0f}",
+                    f"{h.percentile(99):.0f}",
+                    f"{h.max:.1f}",
+                ]
+            )
+
+        fmt = "\n".join(lines) + f"\n```\n{table.render()}\n```"
+
+        if reset:
+            db.reset_stats()
+
+        if len(fmt) > 2000:
+            fp = io.BytesIO(fmt.encode("utf-8"))
+            await ctx.send("Too many results...", file=discord.File(fp, "dbstats.txt"))
+
+        else:
+            await ctx.send(fmt)
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def starstats(self, ctx: Context):
+        """Shows how many starboard updates were coalesced."""
+
+        cog = self.bot.get_cog("StarboardEvents")
+
+        if cog is None:
+            return await ctx.send("Starboard events are not loaded.")
+
+        await ctx.send(
+            f"```\nRequested: {cog.updates_requested}\n"  # type: ignore
+            f"Coalesced: {cog.updates_coalesced}\n"  # type: ignore
+            f"Skipped (no change): {cog.updates_skipped}\n"  # type: ignore
+            f"Sent: {cog.updates_sent}\n"  # type: ignore
+            f"Pending: {len(cog._scheduled)}\n```"  # type: ignore
+        )
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def logstats(self, ctx: Context):
+        """Shows mod-log delivery queue depth and lag."""
+
+        modlog = self.bot.modlog
+        lag = modlog.lag
+
+        await ctx.send(
+            f"```\nQueued: {modlog.depth} embeds in {len(modlog._workers)} channels\n"
+            f"Delivered: {modlog.sent_embeds} embeds in {modlog.sent_messages} messages\n"
+            f"Retried: {modlog.retries} | Dropped: {modlog.dropped}\n"
+            f"Lag: p50 {lag.percentile(50):.0f}ms | p99 {lag.percentile(99):.0f}ms | max {lag.max:.0f}ms\n```"
+        )
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def poolstats(self, ctx: Context):
+        """Shows automod check pool utilization and queue wait."""
+
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is None or cog.executor is None:  # type: ignore
+            return await ctx.send("The automod check pool is not running.")
+
+        pool = cog.executor  # type: ignore
+        wait = pool.queue_wait
+        took = pool.run_time
+
+        await ctx.send(
+            f"```\nIn flight: {pool.in_flight}/{pool.max_pending} | "
+            f"Utilization: {pool.utilization:.0%} of {pool.max_workers} workers\n"
+            f"Completed: {pool.completed} | Timed out: {pool.timeouts} | "
+            f"Saturated: {pool.saturated} | Errors: {pool.errors}\n"
+            f"Queue wait: p50 {wait.percentile(50):.0f}ms | p99 {wait.percentile(99):.0f}ms | max {wait.max:.0f}ms\n"
+            f"Run time: p50 {took.percentile(50):.0f}ms | p99 {took.percentile(99):.0f}ms | max {took.max:.0f}ms\n```"
+        )
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def reloaddomains(self, ctx: Context):
+        """Recompiles the domain blocklist from its lists."""
+
+        cog = self.bot.get_cog("AutoMod")
+
+        if cog is None:
+            return await ctx.send("Auto-mod is not loaded.")
+
+        blocklist = cog.domains  # type: ignore
+
+        if await blocklist.reload(force=True):
+            await ctx.send(
+                f"{self.bot.yes} Loaded {len(blocklist.domains):,} blocked domains "
+                f"({blocklist.hits:,} links blocked so far)."
+            )
+        else:
+            await ctx.send(f"{self.bot.no} Reload failed, check the logs.")
+
     @commands.command(hidden=True)
     @commands.is_owner()
     async def botlogs(self, ctx: Context):
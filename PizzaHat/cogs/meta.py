@@ -64,13 +64,8 @@ class Meta(Cog, emoji="😎"):
 
         try:
             (
-                await self.bot.db.execute(
-                    "INSERT INTO afk (guild_id, user_id, reason) VALUES ($1, $2, $3)",
-                    ctx.guild.id,
-                    ctx.author.id,
-                    reason,
-                )
-                if self.bot.db and ctx.guild
+                await self.bot.afk.set(ctx.guild.id, ctx.author.id, reason)
+                if ctx.guild
                 else None
             )
             await ctx.send(f"{self.bot.yes} AFK status set successfully.")
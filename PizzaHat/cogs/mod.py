@@ -7,8 +7,10 @@ import discord
 import humanfriendly
 from core.bot import PizzaHat
 from core.cog import Cog
+from core.statements import WARNLOG_INSERT
 from discord.ext import commands
 from discord.ext.commands import Context
+from utils.normalize import fold
 from utils.ui import Paginator
 
 
@@ -69,27 +71,40 @@ class Mod(Cog, emoji=847248846526087239):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def decancer(self, ctx: Context, member: discord.Member):
         """
-        Removes special characters and renames the member as "Moderated Nickname"
+        Cleans up a member's nickname: fancy/look-alike letters are replaced
+        with plain ones, invisible characters removed and characters used to
+        hoist to the top of the member list stripped from the start.
+        Renames them to "Moderated Nickname" if nothing readable is left.
 
         In order for this to work, the bot must have Manage Nicknames permissions.
 
         To use this command, you must have Manage Nicknames permission.
         """
 
-        characters = "!@#$%^&*()_+-=.,/?;:[]{}`~\"'\\|<>"
+        characters = "!@#$%^&*()_+-=.,/?;:[]{}`~\"'\\|<> "
 
-        try:
-            if member.display_name[
-                0
-            ] in characters and not member.display_name.startswith("[AFK] "):
-                await member.edit(
-                    nick="Moderated Nickname",
-                    reason=f"Decancered member (req. by: {ctx.author}).",
-                )
-                await ctx.send(f"{self.bot.yes} Successfully decancered {member}")
+        name = member.display_name
+        afk = name.startswith("[AFK] ")
+        if afk:
+            name = name[6:]
+
+        clean = fold(name, keep_case=True).lstrip(characters)[:32].strip()
+
+        if not clean:
+            clean = "Moderated Nickname"
+
+        if afk:
+            clean = f"[AFK] {clean}"[:32]
 
-            if characters not in member.display_name[0]:
-                await ctx.send("No special characters found.")
+        if clean == member.display_name:
+            return await ctx.send("No special characters found.")
+
+        try:
+            await member.edit(
+                nick=clean,
+                reason=f"Decancered member (req. by: {ctx.author}).",
+            )
+            await ctx.send(f"{self.bot.yes} Successfully decancered {member}")
 
         except discord.HTTPException:
             await ctx.send("Something went wrong.")
@@ -976,16 +991,8 @@ class Mod(Cog, emoji=847248846526087239):
                             "You cant warn someone that has higher or same role heirarchy."
                         )
 
-                (
-                    await self.bot.db.execute(
-                        "INSERT INTO warnlogs (guild_id, user_id, mod_id, reason) VALUES ($1, $2, $3, $4)",
-                        ctx.guild.id,
-                        member.id,
-                        ctx.author.id,
-                        reason,
-                    )
-                    if self.bot.db
-                    else None
+                self.bot.write_buffer.add(
+                    WARNLOG_INSERT, ctx.guild.id, member.id, ctx.author.id, reason
                 )
 
                 em = discord.Embed(
@@ -1017,6 +1024,7 @@ class Mod(Cog, emoji=847248846526087239):
         member = member or ctx.author
 
         if ctx.guild is not None:
+            await self.bot.write_buffer.flush(WARNLOG_INSERT)
             records = (
                 await self.bot.db.fetch(
                     "SELECT * FROM warnlogs WHERE user_id = $1 AND guild_id = $2",
@@ -1067,6 +1075,7 @@ class Mod(Cog, emoji=847248846526087239):
         """
 
         try:
+            await self.bot.write_buffer.flush(WARNLOG_INSERT)
             result = (
                 await self.bot.db.execute(
                     "DELETE FROM warnlogs WHERE id = $1 AND user_id = $2 AND guild_id = $3",
@@ -46,6 +46,7 @@ class Starboard(Cog, emoji="⭐"):
                 if self.bot.db and ctx.guild
                 else None
             )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
             await ctx.send(
                 f"{self.bot.yes} Starboard channel set to {channel.mention}."
             )
@@ -79,6 +80,7 @@ class Starboard(Cog, emoji="⭐"):
                 if self.bot.db and ctx.guild
                 else None
             )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
             await ctx.send(f"{self.bot.yes} Starboard star count set to `{count}`.")
 
         except Exception as e:
@@ -112,6 +114,7 @@ class Starboard(Cog, emoji="⭐"):
                 if self.bot.db and ctx.guild
                 else None
             )
+            self.bot.settings.invalidate(ctx.guild.id)  # type: ignore
             await ctx.send(
                 f"{self.bot.yes} Starboard self-star set to `{'true' if enable else 'false'}`."
             )
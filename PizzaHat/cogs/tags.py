@@ -43,13 +43,15 @@ class Tags(Cog, emoji="🏷"):
 
         data = (
             await self.bot.db.fetchrow(
-                "SELECT * FROM tags WHERE guild_id=$1", ctx.guild.id
+                "SELECT * FROM tags WHERE guild_id=$1 AND tag_name=$2",
+                ctx.guild.id,
+                name,
             )
             if self.bot.db and ctx.guild
             else None
         )
 
-        if data is None or data[1] != name:
+        if data is None:
             (
                 await self.bot.db.execute(
                     "INSERT INTO tags (guild_id, tag_name, content, creator) VALUES ($1, $2, $3, $4)",
@@ -63,7 +65,7 @@ class Tags(Cog, emoji="🏷"):
             )
             await ctx.send(f"{self.bot.yes} Tag created successfully!")
 
-        elif data[1] == name:
+        else:
             await ctx.send(f"{self.bot.no} Tag with this name already exists!")
 
     @tag.command(name="delete", aliases=["remove", "del"])
@@ -1,6 +1,7 @@
+from typing import Optional
+
 import chat_exporter
 import discord
-from async_lru import alru_cache
 from core.bot import PizzaHat
 from core.cog import Cog
 from discord import ButtonStyle, Interaction, ui
@@ -14,11 +15,9 @@ class TicketView(ui.View):
         self.thread_id = None
         super().__init__(timeout=None)
 
-    @alru_cache()
-    async def get_staff_role(self, guild_id: int) -> int:
-        return await self.bot.db.fetchval(
-            "SELECT role_id FROM staff_role WHERE guild_id=$1", guild_id
-        )
+    async def get_staff_role(self, guild_id: int) -> Optional[int]:
+        config = await self.bot.settings.get(guild_id)
+        return config.staff_role_id
 
     @ui.button(
         emoji="<:ticket_emoji:1004648922158989404>", custom_id="create_ticket_btn"
@@ -26,8 +25,9 @@ class TicketView(ui.View):
     @commands.bot_has_permissions(create_private_threads=True)
     async def create_ticket(self, interaction: Interaction, button: ui.Button):
         if interaction.guild is not None:
-            staff_role = interaction.guild.get_role(
-                await self.get_staff_role(interaction.guild.id)
+            staff_role_id = await self.get_staff_role(interaction.guild.id)
+            staff_role = (
+                interaction.guild.get_role(staff_role_id) if staff_role_id else None
             )
 
             if staff_role is not None:
@@ -0,0 +1,78 @@
+import datetime
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional
+
+import discord
+from core.database import BufferedStatement
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+AFK_UPSERT = BufferedStatement(
+    "INSERT INTO afk (guild_id, user_id, reason) VALUES ($1, $2, $3) "
+    "ON CONFLICT (guild_id, user_id) DO UPDATE SET reason=EXCLUDED.reason"
+)
+
+
+class AFKEntry(NamedTuple):
+    reason: str
+    since: datetime.datetime
+
+
+class AFKCache:
+    """
+    In-memory index of AFK members, keyed by guild ID then user ID.
+
+    Loaded once at startup and kept in sync by `set` and `remove`,
+    so message listeners never have to query the `afk` table.
+    """
+
+    def __init__(self, bot: "PizzaHat"):
+        self.bot = bot
+        self._guilds: Dict[int, Dict[int, AFKEntry]] = {}
+
+    async def load(self) -> None:
+        if not self.bot.db:
+            return
+
+        rows = await self.bot.db.fetch("SELECT guild_id, user_id, reason FROM afk")
+
+        # Rows loaded from the DB have no timestamp, treat them as set long ago.
+        since = datetime.datetime.fromtimestamp(0, tz=datetime.timezone.utc)
+        self._guilds.clear()
+
+        for row in rows:
+            self._guilds.setdefault(row["guild_id"], {})[row["user_id"]] = AFKEntry(
+                row["reason"], since
+            )
+
+    def get_guild(self, guild_id: int) -> Optional[Dict[int, AFKEntry]]:
+        """Returns the AFK members of a guild, or None if nobody is AFK there."""
+
+        return self._guilds.get(guild_id)
+
+    def get(self, guild_id: int, user_id: int) -> Optional[AFKEntry]:
+        guild = self._guilds.get(guild_id)
+        return guild.get(user_id) if guild else None
+
+    async def set(self, guild_id: int, user_id: int, reason: str) -> None:
+        self.bot.write_buffer.add(AFK_UPSERT, guild_id, user_id, reason)
+
+        self._guilds.setdefault(guild_id, {})[user_id] = AFKEntry(
+            reason, discord.utils.utcnow()
+        )
+
+    async def remove(self, guild_id: int, user_id: int) -> None:
+        guild = self._guilds.get(guild_id)
+
+        if guild is None or guild.pop(user_id, None) is None:
+            return
+
+        if not guild:
+            del self._guilds[guild_id]
+
+        if self.bot.db:
+            # A queued upsert for this member would otherwise land after the delete
+            await self.bot.write_buffer.flush(AFK_UPSERT)
+            await self.bot.db.execute(
+                "DELETE FROM afk WHERE guild_id=$1 AND user_id=$2", guild_id, user_id
+            )
@@ -8,12 +8,16 @@ from logging.config import dictConfig
 import aiohttp
 import core.database as db
 import discord
+from core.afk import AFKCache
+from core.modlog import ModLogDispatcher
+from core.settings import GuildSettings
 from discord.ext import commands
 from discord.ext.commands import CommandError, Context
 from discord.ext.commands.errors import ExtensionAlreadyLoaded
 
 INITIAL_EXTENSIONS = [
     "cogs.admin",
+    "cogs.automod",
     "cogs.dev",
     "cogs.emojis",
     "cogs.games",
@@ -26,8 +30,10 @@ INITIAL_EXTENSIONS = [
 ]
 
 SUB_EXTENSIONS = [
-    # "utils.automod",
+    "utils.automod",
+    "utils.joingate",
     "utils.events",
+    "utils.starboard",
     "utils.help",
 ]
 
@@ -99,6 +105,7 @@ class PizzaHat(commands.Bot):
             messages=True,
             reactions=True,
             integrations=True,
+            invites=True,
             message_content=True,
             auto_moderation=True,
         )
@@ -121,6 +128,8 @@ class PizzaHat(commands.Bot):
         self.no = "<:no:829841023445631017>"
         self.color = 0x456DD4
         self.session = aiohttp.ClientSession()
+        self.settings = GuildSettings(self)
+        self.modlog = ModLogDispatcher(self)
 
     async def setup_hook(self) -> None:
         if not hasattr(self, "uptime"):
@@ -131,6 +140,21 @@ class PizzaHat(commands.Bot):
         # Create DB connection
         self.db = await db.create_db_pool()
 
+        # Bring the schema up to date, refuses to start on a mismatch
+        applied = await db.run_migrations(self.db)
+        print(f"Applied {applied} pending migration(s).")
+
+        # Batch high-volume inserts instead of one round-trip each
+        self.write_buffer = db.WriteBehindBuffer(self.db)
+        self.write_buffer.start()
+
+        # Load AFK statuses into memory
+        self.afk = AFKCache(self)
+        await self.afk.load()
+
+        # Re-queue mod-logs that weren't delivered before the last shutdown
+        await self.modlog.load()
+
         # Make the tickets view persistent
         ticket_view = import_module("cogs.tickets").TicketView(self)
         self.add_view(ticket_view)
@@ -171,6 +195,32 @@ class PizzaHat(commands.Bot):
         )
         print("=========================")
 
+    async def close(self) -> None:
+        # Unloading runs the cogs' last flushes, which still need the
+        # mod-log and write buffer below, and Discord for deletes
+        for ext in tuple(self.extensions):
+            try:
+                await self.unload_extension(ext)
+
+            except Exception as e:
+                print(f"Failed to unload extension {ext}")
+                print("".join(traceback.format_exception(e, e, e.__traceback__)))  # type: ignore
+
+        for cog in tuple(self.cogs):
+            try:
+                await self.remove_cog(cog)
+
+            except Exception as e:
+                print(f"Failed to remove cog {cog}")
+                print("".join(traceback.format_exception(e, e, e.__traceback__)))  # type: ignore
+
+        await self.modlog.close()
+
+        if hasattr(self, "write_buffer"):
+            await self.write_buffer.close()
+
+        await super().close()
+
     async def on_command_error(self, ctx: Context, error: CommandError) -> None:
         if isinstance(error, commands.CommandNotFound):
             pass
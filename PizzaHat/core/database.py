@@ -1,15 +1,382 @@
+import asyncio
+import bisect
+import logging
 import os
+import re
 import ssl
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import asyncpg
+from core.migrations import MIGRATIONS
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("bot")
 
-async def create_db_pool():
+# Arbitrary key for pg_advisory_xact_lock, so two instances starting at
+# the same time don't race each other through the migrations.
+MIGRATIONS_LOCK_KEY = 0x50495A41
+
+POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", 2))
+POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", 10))
+STATEMENT_CACHE_SIZE = int(os.getenv("PG_STATEMENT_CACHE_SIZE", 256))
+COMMAND_TIMEOUT = float(os.getenv("PG_COMMAND_TIMEOUT", 10))
+SLOW_QUERY_MS = float(os.getenv("PG_SLOW_QUERY_MS", 100))
+
+WRITE_BUFFER_INTERVAL = float(os.getenv("WRITE_BUFFER_INTERVAL", 1.0))
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH", 500))
+WRITE_BUFFER_MAX_BACKLOG = int(os.getenv("WRITE_BUFFER_MAX_BACKLOG", 50_000))
+
+# Upper bounds in milliseconds, the last bucket catches everything else
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class SchemaVersionMismatch(RuntimeError):
+    pass
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every query."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket containing the given percentile."""
+
+        if not self.count:
+            return 0.0
+
+        target = self.count * pct / 100
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return (
+                    HISTOGRAM_BUCKETS[index]
+                    if index < len(HISTOGRAM_BUCKETS)
+                    else self.max
+                )
+
+        return self.max
+
+
+def _normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def _redact(args: Tuple[Any, ...]) -> str:
+    return ", ".join(f"${i}=<{type(a).__name__}>" for i, a in enumerate(args, 1))
+
+
+class InstrumentedPool:
+    """
+    Thin wrapper around `asyncpg.Pool` that records per-query latency,
+    time spent waiting for a connection, and logs slow queries.
+
+    Anything not wrapped here is forwarded to the underlying pool.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, slow_query_ms: float = SLOW_QUERY_MS):
+        self.pool = pool
+        self.slow_query_ms = slow_query_ms
+        self.queries: Dict[str, Histogram] = {}
+        self.pool_wait = Histogram()
+
+    def __getattr__(self, name: str):
+        return getattr(self.pool, name)
+
+    @asynccontextmanager
+    async def acquire(self, *, timeout: Optional[float] = None):
+        start = time.perf_counter()
+
+        async with self.pool.acquire(timeout=timeout) as conn:
+            self.pool_wait.add((time.perf_counter() - start) * 1000.0)
+            yield conn
+
+    async def _run(self, method: str, query: str, args: tuple, timeout):
+        async with self.acquire() as conn:
+            start = time.perf_counter()
+
+            try:
+                return await getattr(conn, method)(query, *args, timeout=timeout)
+
+            finally:
+                self._record(query, args, (time.perf_counter() - start) * 1000.0)
+
+    def _record(self, query: str, args: tuple, ms: float) -> None:
+        key = _normalize_query(query)
+        histogram = self.queries.get(key)
+
+        if histogram is None:
+            histogram = self.queries[key] = Histogram()
+
+        histogram.add(ms)
+
+        if ms >= self.slow_query_ms:
+            logger.warning(f"Slow query ({ms:.1f}ms): {key} [{_redact(args)}]")
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._run("execute", query, args, timeout)
+
+    async def executemany(self, query: str, args, *, timeout: Optional[float] = None):
+        return await self._run("executemany", query, (args,), timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._run("fetch", query, args, timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._run("fetchrow", query, args, timeout)
+
+    async def fetchval(self, query: str, *args, timeout: Optional[float] = None):
+        return await self._run("fetchval", query, args, timeout)
+
+    def reset_stats(self) -> None:
+        self.queries.clear()
+        self.pool_wait = Histogram()
+
+
+async def create_db_pool() -> InstrumentedPool:
     ssl_object = ssl.create_default_context()
     ssl_object.check_hostname = False
     ssl_object.verify_mode = ssl.CERT_NONE
 
-    return await asyncpg.create_pool(dsn=os.getenv("PG_URL"), ssl=ssl_object)
+    pool = await asyncpg.create_pool(
+        dsn=os.getenv("PG_URL"),
+        ssl=ssl_object,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+        command_timeout=COMMAND_TIMEOUT,
+    )
+
+    return InstrumentedPool(pool)  # type: ignore
+
+
+async def run_migrations(pool: InstrumentedPool) -> int:
+    """
+    Applies every pending migration in a single transaction.
+
+    Raises `SchemaVersionMismatch` if the database has migrations this
+    version of the bot doesn't know about, or if they don't match ours.
+    Returns the number of migrations applied.
+    """
+
+    known = {m.version: m for m in MIGRATIONS}
+    latest = max(known)
+
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATIONS_LOCK_KEY)
+            await conn.execute(
+                """CREATE TABLE IF NOT EXISTS schema_migrations
+                (version INT PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"""
+            )
+
+            applied = {
+                r["version"]: r["description"]
+                for r in await conn.fetch(
+                    "SELECT version, description FROM schema_migrations"
+                )
+            }
+
+            for version, description in applied.items():
+                if version not in known:
+                    raise SchemaVersionMismatch(
+                        f"Database is at schema version {max(applied)} but this build only knows up to {latest}."
+                    )
+
+                if known[version].description != description:
+                    raise SchemaVersionMismatch(
+                        f"Migration {version} was applied as {description!r} but this build has {known[version].description!r}."
+                    )
+
+            pending = [m for m in MIGRATIONS if m.version not in applied]
+
+            for migration in pending:
+                for statement in migration.statements:
+                    await conn.execute(statement)
+
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES ($1, $2)",
+                    migration.version,
+                    migration.description,
+                )
+                logger.info(
+                    f"Applied migration {migration.version}: {migration.description}"
+                )
+
+    # Statements cached on open connections were planned against the old schema
+    if pending:
+        await pool.expire_connections()
+
+    return len(pending)
+
+
+class BufferedStatement(NamedTuple):
+    """
+    A write that can be deferred and batched by `WriteBehindBuffer`.
+
+    When `table` and `columns` are set the batch is sent with COPY,
+    otherwise `query` is run once with `executemany`.
+    """
+
+    query: str
+    table: Optional[str] = None
+    columns: Optional[Tuple[str, ...]] = None
+
+
+class WriteBehindBuffer:
+    """
+    Queues writes per statement and flushes them in batches, either every
+    `interval` seconds or as soon as `max_batch` rows are waiting.
+
+    Writes become visible in the DB only after a flush. Code that reads
+    back what it just queued must call `flush(statement)` first. A failed
+    flush is logged, never raised: rows are kept for the next flush if the
+    database was unreachable and dropped if it rejected them.
+    """
+
+    def __init__(
+        self,
+        pool: InstrumentedPool,
+        *,
+        interval: float = WRITE_BUFFER_INTERVAL,
+        max_batch: int = WRITE_BUFFER_MAX_BATCH,
+        max_backlog: int = WRITE_BUFFER_MAX_BACKLOG,
+    ):
+        self.pool = pool
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_backlog = max_backlog
+
+        self._queues: Dict[BufferedStatement, List[tuple]] = {}
+        self._depth = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.flush_latency = Histogram()
+        self.flushed_rows = 0
+        self.round_trips = 0
+        self.dropped_rows = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Stops the background flusher and writes out everything left. A flush
+        already running is waited for, not cancelled, it holds rows that are
+        no longer queued.
+        """
+
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+
+    def add(self, statement: BufferedStatement, *args) -> None:
+        self._queues.setdefault(statement, []).append(args)
+        self._depth += 1
+
+        if self._depth >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self, statement: Optional[BufferedStatement] = None) -> None:
+        """Flushes every queued statement, or only the given one."""
+
+        async with self._lock:
+            if statement is not None:
+                statements = [statement] if statement in self._queues else []
+            else:
+                statements = list(self._queues)
+
+            for stmt in statements:
+                rows = self._queues.pop(stmt, None)
+                if not rows:
+                    continue
+
+                self._depth -= len(rows)
+                start = time.perf_counter()
+
+                try:
+                    if stmt.table is not None:
+                        async with self.pool.acquire() as conn:
+                            await conn.copy_records_to_table(
+                                stmt.table, records=rows, columns=stmt.columns
+                            )
+                    else:
+                        await self.pool.executemany(stmt.query, rows)
+
+                except (OSError, asyncpg.PostgresConnectionError, asyncio.TimeoutError):
+                    # Transient, put the rows back in front and retry next time
+                    self._requeue(stmt, rows)
+                    logger.warning(
+                        f"Write-behind flush of {len(rows)} rows failed, will retry",
+                        exc_info=True,
+                    )
+                    continue
+
+                except asyncio.CancelledError:
+                    # Cancelled mid-write, the rows may not have made it
+                    self._requeue(stmt, rows)
+                    raise
+
+                except Exception:
+                    self.dropped_rows += len(rows)
+                    logger.exception(
+                        f"Write-behind flush rejected, dropped {len(rows)} rows"
+                    )
+                    continue
+
+                self.flush_latency.add((time.perf_counter() - start) * 1000.0)
+                self.flushed_rows += len(rows)
+                self.round_trips += 1
+
+    def _requeue(self, statement: BufferedStatement, rows: List[tuple]) -> None:
+        queue = self._queues.setdefault(statement, [])
+        queue[:0] = rows
+        self._depth += len(rows)
+
+        overflow = self._depth - self.max_backlog
+        if overflow > 0:
+            del queue[:overflow]
+            self._depth -= overflow
+            self.dropped_rows += overflow
+            logger.error(f"Write-behind backlog full, dropped {overflow} rows")
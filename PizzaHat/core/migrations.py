@@ -0,0 +1,126 @@
+from typing import List, NamedTuple
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+
+
+# Append new migrations at the end with the next version number.
+# Never edit a migration that has already been released.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "initial schema",
+        [
+            """CREATE TABLE IF NOT EXISTS afk
+            (guild_id BIGINT, user_id BIGINT, reason TEXT)""",
+            """CREATE TABLE IF NOT EXISTS warnlogs
+            (id SERIAL PRIMARY KEY, guild_id BIGINT, user_id BIGINT, mod_id BIGINT, reason TEXT)""",
+            """CREATE TABLE IF NOT EXISTS modlogs
+            (guild_id BIGINT PRIMARY KEY, channel_id BIGINT)""",
+            """CREATE TABLE IF NOT EXISTS automod
+            (guild_id BIGINT PRIMARY KEY, enabled BOOL DEFAULT false)""",
+            """CREATE TABLE IF NOT EXISTS antialt
+            (guild_id BIGINT PRIMARY KEY, enabled BOOL DEFAULT false, min_age INT, restricted_role BIGINT, level INT)""",
+            """CREATE TABLE IF NOT EXISTS staff_role
+            (guild_id BIGINT PRIMARY KEY, role_id BIGINT)""",
+            """CREATE TABLE IF NOT EXISTS tags
+            (guild_id BIGINT PRIMARY KEY, tag_name TEXT, content TEXT, creator BIGINT)""",
+            """CREATE TABLE IF NOT EXISTS star_config
+            (guild_id BIGINT PRIMARY KEY, channel_id BIGINT, star_count INT DEFAULT 5, self_star BOOL DEFAULT true)""",
+            """CREATE TABLE IF NOT EXISTS star_info
+            (guild_id BIGINT, user_msg_id BIGINT PRIMARY KEY, bot_msg_id BIGINT)""",
+        ],
+    ),
+    Migration(
+        2,
+        "allow more than one tag per guild",
+        [
+            "DELETE FROM tags WHERE tag_name IS NULL",
+            "ALTER TABLE tags DROP CONSTRAINT IF EXISTS tags_pkey",
+            "ALTER TABLE tags ADD PRIMARY KEY (guild_id, tag_name)",
+        ],
+    ),
+    Migration(
+        3,
+        "hot-path indexes",
+        [
+            # Mod.warnings / Mod.deletewarn
+            "CREATE INDEX IF NOT EXISTS warnlogs_guild_user_idx ON warnlogs (guild_id, user_id)",
+            # starboard deletes by bot_msg_id, lookups by user_msg_id use the primary key
+            "CREATE INDEX IF NOT EXISTS star_info_guild_bot_msg_idx ON star_info (guild_id, bot_msg_id)",
+        ],
+    ),
+    Migration(
+        4,
+        "one afk row per member",
+        [
+            """DELETE FROM afk a USING afk b
+            WHERE a.ctid < b.ctid AND a.guild_id = b.guild_id AND a.user_id = b.user_id""",
+            # AFKCache.set / AFKCache.remove, and the upsert's conflict target
+            "CREATE UNIQUE INDEX IF NOT EXISTS afk_guild_user_key ON afk (guild_id, user_id)",
+        ],
+    ),
+    Migration(
+        5,
+        "mod-log outbox",
+        [
+            """CREATE TABLE IF NOT EXISTS modlog_outbox
+            (id BIGSERIAL PRIMARY KEY, key TEXT NOT NULL UNIQUE, channel_id BIGINT NOT NULL,
+            embed JSONB NOT NULL, attempts INT NOT NULL DEFAULT 0, created_at TIMESTAMPTZ NOT NULL DEFAULT now())""",
+        ],
+    ),
+    Migration(
+        6,
+        "per-guild banned words",
+        [
+            """CREATE TABLE IF NOT EXISTS banned_words
+            (guild_id BIGINT, word TEXT, PRIMARY KEY (guild_id, word))""",
+        ],
+    ),
+    Migration(
+        7,
+        "automod rule config",
+        [
+            """CREATE TABLE IF NOT EXISTS automod_rules
+            (guild_id BIGINT, rule TEXT, enabled BOOL NOT NULL DEFAULT true, threshold REAL,
+            action TEXT NOT NULL DEFAULT 'delete', PRIMARY KEY (guild_id, rule))""",
+            # Role and channel IDs
+            """CREATE TABLE IF NOT EXISTS automod_exempt
+            (guild_id BIGINT, target_id BIGINT, PRIMARY KEY (guild_id, target_id))""",
+        ],
+    ),
+    Migration(
+        8,
+        "image blocklist",
+        [
+            # guild_id 0 applies to every guild, hash is a 64-bit dHash
+            """CREATE TABLE IF NOT EXISTS image_blocklist
+            (guild_id BIGINT, hash BIGINT, PRIMARY KEY (guild_id, hash))""",
+        ],
+    ),
+    Migration(
+        9,
+        "automod shadow mode and stats",
+        [
+            # NULL keeps the rule's default, see utils.rules.RULES
+            """ALTER TABLE automod_rules ADD COLUMN IF NOT EXISTS shadow BOOL""",
+            # Hourly buckets, written by utils.rules.RuleStats
+            """CREATE TABLE IF NOT EXISTS automod_stats
+            (guild_id BIGINT, rule TEXT, bucket TIMESTAMPTZ, checked BIGINT NOT NULL DEFAULT 0,
+            hits BIGINT NOT NULL DEFAULT 0, shadow_hits BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, rule, bucket))""",
+        ],
+    ),
+    Migration(
+        10,
+        "per-guild raid thresholds",
+        [
+            # NULL uses RAID_JOINS/RAID_WINDOW from the environment
+            """ALTER TABLE antialt ADD COLUMN IF NOT EXISTS raid_joins INT,
+            ADD COLUMN IF NOT EXISTS raid_window REAL""",
+        ],
+    ),
+]
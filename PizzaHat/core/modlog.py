@@ -0,0 +1,320 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional
+
+import discord
+from core.database import BufferedStatement, Histogram
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+logger = logging.getLogger("bot")
+
+FLUSH_INTERVAL = float(os.getenv("MODLOG_FLUSH_INTERVAL", 2.0))
+MAX_QUEUE = int(os.getenv("MODLOG_MAX_QUEUE", 1000))
+MAX_CONCURRENCY = int(os.getenv("MODLOG_MAX_CONCURRENCY", 5))
+MAX_ATTEMPTS = int(os.getenv("MODLOG_MAX_ATTEMPTS", 8))
+MAX_BACKOFF = 300.0
+# Seconds close() keeps delivering before leaving the rest for the next start
+CLOSE_TIMEOUT = 5.0
+
+# Discord limits for a single message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+OUTBOX_INSERT = BufferedStatement(
+    "INSERT INTO modlog_outbox (key, channel_id, embed) VALUES ($1, $2, $3::jsonb) ON CONFLICT (key) DO NOTHING"
+)
+
+
+class OutboxEntry:
+    __slots__ = ("key", "embed", "queued_at", "attempts")
+
+    def __init__(self, key: str, embed: discord.Embed, attempts: int = 0):
+        self.key = key
+        self.embed = embed
+        self.queued_at = time.monotonic()
+        self.attempts = attempts
+
+
+class ModLogDispatcher:
+    """
+    Delivers mod-log embeds through a persistent outbox.
+
+    Embeds are queued per channel and written to the `modlog_outbox` table
+    through the write buffer as they are queued. Workers send them in
+    batches of up to 10 and only delete the rows once Discord accepted
+    them, so entries survive failed requests and restarts. Each entry's key
+    is built from the event it logs, so an event is queued at most once per
+    run and stored at most once.
+    """
+
+    def __init__(self, bot: "PizzaHat", interval: float = FLUSH_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self._queues: Dict[int, Deque[OutboxEntry]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._keys: set = set()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        self._closing = asyncio.Event()
+
+        self.lag = Histogram()
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.retries = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def load(self) -> None:
+        """Re-queues everything that wasn't delivered before the last shutdown."""
+
+        if not self.bot.db:
+            return
+
+        rows = await self.bot.db.fetch(
+            "SELECT key, channel_id, embed, attempts FROM modlog_outbox ORDER BY id"
+        )
+
+        for row in rows:
+            embed = discord.Embed.from_dict(json.loads(row["embed"]))
+            self._enqueue(
+                row["channel_id"], OutboxEntry(row["key"], embed, row["attempts"])
+            )
+
+        if rows:
+            logger.info(f"Re-queued {len(rows)} undelivered mod-log entries")
+
+    def send(
+        self,
+        channel: discord.abc.Messageable,
+        embed: discord.Embed,
+        event: str,
+        target_id: int,
+        at: Optional[datetime.datetime] = None,
+    ) -> None:
+        """
+        Queues an embed for the channel, never waits on Discord or the DB.
+
+        `event` and `target_id` (the message, member, role... it is about)
+        and `at` make up the entry's key. `at` should be when the event
+        happened if it is known, the embed's timestamp is used otherwise.
+        """
+
+        at = at or embed.timestamp or discord.utils.utcnow()
+        guild_id = getattr(getattr(channel, "guild", None), "id", 0)
+        key = f"{guild_id}:{event}:{target_id}:{int(at.timestamp() * 1000)}"
+
+        if key in self._keys:
+            return
+
+        if getattr(self.bot, "write_buffer", None) is not None:
+            self.bot.write_buffer.add(
+                OUTBOX_INSERT, key, channel.id, json.dumps(embed.to_dict())  # type: ignore
+            )
+
+        self._enqueue(channel.id, OutboxEntry(key, embed))  # type: ignore
+
+    def _enqueue(self, channel_id: int, entry: OutboxEntry) -> None:
+        queue = self._queues.get(channel_id)
+
+        if queue is None:
+            queue = self._queues[channel_id] = deque()
+
+        if len(queue) >= MAX_QUEUE:
+            # Its row stays in the outbox, it is picked up on the next start
+            self._keys.discard(queue.popleft().key)
+            self.dropped += 1
+
+        queue.append(entry)
+        self._keys.add(entry.key)
+
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._worker(channel_id))
+
+    def _next_batch(self, queue: Deque[OutboxEntry]) -> List[OutboxEntry]:
+        batch = []
+        size = 0
+
+        while queue and len(batch) < MAX_EMBEDS:
+            embed_size = len(queue[0].embed)
+
+            if batch and size + embed_size > MAX_EMBED_CHARS:
+                break
+
+            batch.append(queue.popleft())
+            size += embed_size
+
+        return batch
+
+    async def _sleep(self, delay: float) -> bool:
+        """Waits `delay` seconds, returns True early if the dispatcher is closing."""
+
+        try:
+            await asyncio.wait_for(self._closing.wait(), delay)
+        except asyncio.TimeoutError:
+            return False
+
+        return True
+
+    async def _worker(self, channel_id: int) -> None:
+        try:
+            await self.bot.wait_until_ready()
+
+            # Closing only ever interrupts the waits, never a delivery
+            while not await self._sleep(self.interval):
+                queue = self._queues.get(channel_id)
+                if not queue:
+                    return
+
+                while queue:
+                    try:
+                        delay = await self._deliver(channel_id, queue)
+                    except Exception:
+                        # Keep the queue alive, the entries come back on restart
+                        logger.exception(f"Mod-log delivery to {channel_id} failed")
+                        delay = self.interval
+
+                    if self._closing.is_set() or (delay and await self._sleep(delay)):
+                        return
+
+        finally:
+            self._workers.pop(channel_id, None)
+            if not self._queues.get(channel_id):
+                self._queues.pop(channel_id, None)
+
+    async def _deliver(self, channel_id: int, queue: Deque[OutboxEntry]) -> float:
+        """Sends one batch, returns how long to wait before the next one."""
+
+        batch = self._next_batch(queue)
+        channel = self.bot.get_channel(channel_id)
+
+        if channel is None:
+            # Log channel is gone, nothing will ever be delivered there
+            batch.extend(queue)
+            queue.clear()
+            self.dropped += len(batch)
+            await self._complete(batch)
+            return 0
+
+        try:
+            async with self._semaphore:
+                await channel.send(embeds=[e.embed for e in batch])  # type: ignore
+
+        except discord.HTTPException as e:
+            if e.status == 429:
+                # Wait as long as Discord asked us to, doesn't count as an attempt
+                queue.extendleft(reversed(batch))
+                self.retries += 1
+                return float(e.response.headers.get("Retry-After", 1))
+
+            if e.status >= 500:
+                return await self._retry(queue, batch, e)
+
+            # Missing permissions, invalid embed etc. retrying won't help
+            self.dropped += len(batch)
+            logger.warning(f"Failed to deliver mod-logs to {channel_id}: {e}")
+            await self._complete(batch)
+            return 0
+
+        except (OSError, asyncio.TimeoutError) as e:
+            return await self._retry(queue, batch, e)
+
+        now = time.monotonic()
+        for entry in batch:
+            self.lag.add((now - entry.queued_at) * 1000.0)
+
+        self.sent_messages += 1
+        self.sent_embeds += len(batch)
+        await self._complete(batch)
+        return 0
+
+    async def _retry(
+        self, queue: Deque[OutboxEntry], batch: List[OutboxEntry], error: Exception
+    ) -> float:
+        attempts = max(e.attempts for e in batch) + 1
+
+        if attempts >= MAX_ATTEMPTS:
+            self.dropped += len(batch)
+            logger.error(f"Giving up on {len(batch)} mod-log entries: {error}")
+            await self._complete(batch)
+            return 0
+
+        for entry in batch:
+            entry.attempts = attempts
+
+        queue.extendleft(reversed(batch))
+        self.retries += 1
+
+        if self.bot.db:
+            try:
+                await self.bot.db.execute(
+                    "UPDATE modlog_outbox SET attempts=$2 WHERE key = ANY($1::text[])",
+                    [e.key for e in batch],
+                    attempts,
+                )
+            except Exception as e:
+                # Only the count is lost, a restart retries a few more times
+                logger.warning(f"Failed to record mod-log attempts: {e}")
+
+        return min(2.0**attempts, MAX_BACKOFF)
+
+    async def _complete(self, batch: List[OutboxEntry]) -> None:
+        self._keys.difference_update(e.key for e in batch)
+        keys = [e.key for e in batch]
+
+        if not self.bot.db:
+            return
+
+        try:
+            # The rows may still be in the write buffer, they must not be
+            # inserted after they were deleted
+            if getattr(self.bot, "write_buffer", None) is not None:
+                await self.bot.write_buffer.flush(OUTBOX_INSERT)
+
+            await self.bot.db.execute(
+                "DELETE FROM modlog_outbox WHERE key = ANY($1::text[])", keys
+            )
+        except Exception as e:
+            # The rows are sent again after a restart, better twice than never
+            logger.warning(f"Failed to clear {len(keys)} delivered mod-logs: {e}")
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """
+        Lets the workers finish the batch they are sending, then delivers
+        what is still queued. Whatever isn't sent within `timeout` seconds
+        stays in the outbox for the next start. The write buffer must be
+        closed after this.
+        """
+
+        self._closing.set()
+
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.depth} mod-log entries left for the next start")
+
+    async def _drain(self) -> None:
+        workers = list(self._workers.values())
+
+        if not self.bot.is_ready():
+            # Still waiting for the gateway, nothing is being sent
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            return
+
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        for channel_id, queue in [(c, q) for c, q in self._queues.items() if q]:
+            while queue:
+                # Rate limited or failing, no waiting around at shutdown
+                if await self._deliver(channel_id, queue):
+                    break
@@ -0,0 +1,168 @@
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+
+GUILD_SETTINGS_QUERY = """
+SELECT
+    modlogs.channel_id AS modlogs_channel_id,
+    automod.enabled AS automod_enabled,
+    staff_role.role_id AS staff_role_id,
+    star_config.channel_id AS star_channel_id,
+    star_config.star_count AS star_count,
+    star_config.self_star AS self_star,
+    antialt.enabled AS antialt_enabled,
+    antialt.min_age AS antialt_min_age,
+    antialt.restricted_role AS antialt_restricted_role,
+    antialt.level AS antialt_level,
+    antialt.raid_joins AS antialt_raid_joins,
+    antialt.raid_window AS antialt_raid_window
+FROM (SELECT $1::BIGINT AS guild_id) AS g
+LEFT JOIN modlogs ON modlogs.guild_id = g.guild_id
+LEFT JOIN automod ON automod.guild_id = g.guild_id
+LEFT JOIN staff_role ON staff_role.guild_id = g.guild_id
+LEFT JOIN star_config ON star_config.guild_id = g.guild_id
+LEFT JOIN antialt ON antialt.guild_id = g.guild_id
+"""
+
+
+class GuildConfig:
+    """Snapshot of every per-guild setting the bot reads on hot paths."""
+
+    __slots__ = (
+        "guild_id",
+        "modlogs_channel_id",
+        "automod_enabled",
+        "staff_role_id",
+        "star_channel_id",
+        "star_count",
+        "self_star",
+        "antialt_enabled",
+        "antialt_min_age",
+        "antialt_restricted_role",
+        "antialt_level",
+        "antialt_raid_joins",
+        "antialt_raid_window",
+    )
+
+    def __init__(self, guild_id: int, record=None):
+        self.guild_id: int = guild_id
+        self.modlogs_channel_id: Optional[int] = None
+        self.automod_enabled: bool = False
+        self.staff_role_id: Optional[int] = None
+        self.star_channel_id: Optional[int] = None
+        self.star_count: int = 5
+        self.self_star: bool = True
+        self.antialt_enabled: bool = False
+        self.antialt_min_age: Optional[int] = None
+        self.antialt_restricted_role: Optional[int] = None
+        self.antialt_level: Optional[int] = None
+        self.antialt_raid_joins: Optional[int] = None
+        self.antialt_raid_window: Optional[float] = None
+
+        if record is not None:
+            self.modlogs_channel_id = record["modlogs_channel_id"]
+            self.automod_enabled = bool(record["automod_enabled"])
+            self.staff_role_id = record["staff_role_id"]
+            self.star_channel_id = record["star_channel_id"]
+            if record["star_count"] is not None:
+                self.star_count = record["star_count"]
+            if record["self_star"] is not None:
+                self.self_star = record["self_star"]
+            self.antialt_enabled = bool(record["antialt_enabled"])
+            self.antialt_min_age = record["antialt_min_age"]
+            self.antialt_restricted_role = record["antialt_restricted_role"]
+            self.antialt_level = record["antialt_level"]
+            self.antialt_raid_joins = record["antialt_raid_joins"]
+            self.antialt_raid_window = record["antialt_raid_window"]
+
+    def __repr__(self) -> str:
+        attrs = " ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"<GuildConfig {attrs}>"
+
+
+class GuildSettings:
+    """
+    Bounded LRU cache of `GuildConfig` records.
+
+    Every setting of a guild is loaded with a single query. Commands that
+    write to one of the config tables must call `invalidate` afterwards.
+    """
+
+    def __init__(self, bot: "PizzaHat", max_size: int = 5000):
+        self.bot = bot
+        self.max_size = max_size
+        self._cache: "OrderedDict[int, GuildConfig]" = OrderedDict()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._invalidated: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get(self, guild_id: int) -> GuildConfig:
+        config = self._cache.get(guild_id)
+
+        if config is not None:
+            self._cache.move_to_end(guild_id)
+            return config
+
+        # Coalesce concurrent misses for the same guild into one query
+        pending = self._pending.get(guild_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[guild_id] = future
+
+        try:
+            config = await self._fetch(guild_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            self._invalidated.discard(guild_id)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # silence "never retrieved" when nobody waits
+            self._invalidated.discard(guild_id)
+            raise
+        else:
+            future.set_result(config)
+        finally:
+            del self._pending[guild_id]
+
+        # Don't cache results that were invalidated while the query ran
+        if guild_id in self._invalidated:
+            self._invalidated.discard(guild_id)
+        else:
+            self._store(config)
+
+        return config
+
+    async def _fetch(self, guild_id: int) -> GuildConfig:
+        record = (
+            await self.bot.db.fetchrow(GUILD_SETTINGS_QUERY, guild_id)
+            if self.bot.db
+            else None
+        )
+        return GuildConfig(guild_id, record)
+
+    def _store(self, config: GuildConfig) -> None:
+        self._cache[config.guild_id] = config
+        self._cache.move_to_end(config.guild_id)
+
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, guild_id: int) -> None:
+        """Drops the cached config of a guild so the next read reloads it."""
+
+        self._cache.pop(guild_id, None)
+
+        if guild_id in self._pending:
+            self._invalidated.add(guild_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,9 @@
+from core.database import BufferedStatement
+
+# Write-behind statements used by more than one module
+
+WARNLOG_INSERT = BufferedStatement(
+    "INSERT INTO warnlogs (guild_id, user_id, mod_id, reason) VALUES ($1, $2, $3, $4)",
+    table="warnlogs",
+    columns=("guild_id", "user_id", "mod_id", "reason"),
+)
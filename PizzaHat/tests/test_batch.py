@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from utils.batch import AutoModBatcher
+from utils.rules import CompiledRule, Plan
+
+_ids = itertools.count(1)
+
+
+def message(content):
+    return SimpleNamespace(
+        id=next(_ids),
+        content=content,
+        channel=SimpleNamespace(id=1, parent_id=None),
+        author=SimpleNamespace(_roles=[]),
+        raw_mentions=[],
+        raw_role_mentions=[],
+        mention_everyone=False,
+    )
+
+
+class FakeAutoMod:
+    def __init__(self):
+        self.actions = []
+
+    async def take_action(self, msg, rule, hit):
+        self.actions.append((msg.id, rule.name))
+
+
+async def hit(msg, threshold):
+    return True
+
+
+async def miss(msg, threshold):
+    return False
+
+
+def plan(shadow_mentions=True, caps=miss):
+    rules = (
+        CompiledRule("mentions", hit, 3, "delete", "", shadow=shadow_mentions),
+        CompiledRule("caps", caps, 0.7, "delete", ""),
+        CompiledRule("emojis", miss, 10, "delete", ""),
+        CompiledRule("spam", miss, 5, "delete", ""),
+    )
+    return Plan(frozenset(), rules, {r.name: [0, 0, 0] for r in rules})
+
+
+def run_batch(messages, p):
+    automod = FakeAutoMod()
+    batcher = AutoModBatcher(automod, window=60)  # type: ignore
+    asyncio.run(batcher.run([(m, p) for m in messages]))
+    return automod.actions
+
+
+def test_counts_match_unbatched_evaluation():
+    msg = message("THIS WHOLE MESSAGE IS SHOUTED")
+    batched = plan()
+    actions = run_batch([msg], batched)
+
+    # Unbatched, the caps check itself finds it
+    unbatched = plan(caps=hit)
+    found = asyncio.run(unbatched.evaluate(msg))
+
+    assert found is not None and found[0].name == "caps"
+    assert actions == [(msg.id, "caps")]
+    # The shadow rule before the hit is counted, nothing after it is checked
+    assert batched.counters == unbatched.counters == {
+        "mentions": [1, 0, 1],
+        "caps": [1, 1, 0],
+        "emojis": [0, 0, 0],
+        "spam": [0, 0, 0],
+    }
+
+
+def test_clean_messages_run_every_rule():
+    p = plan(shadow_mentions=False)
+    p.rules = (p.rules[0]._replace(threshold=99),) + p.rules[1:]
+
+    assert run_batch([message("hello there")], p) == []
+    assert p.counters == {
+        "mentions": [1, 0, 0],
+        "caps": [1, 0, 0],
+        "emojis": [1, 0, 0],
+        "spam": [1, 0, 0],
+    }
@@ -0,0 +1,118 @@
+import asyncio
+import os
+
+import pytest
+from utils.domains import (
+    DomainBlocklist,
+    DomainSet,
+    compile_lists,
+    extract_hosts,
+    parse_line,
+    reverse,
+)
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("evil.com", "evil.com"),
+        ("  Evil.COM.  ", "evil.com"),
+        ("0.0.0.0 evil.com", "evil.com"),
+        ("127.0.0.1 localhost", None),
+        ("*.evil.com", "evil.com"),
+        ("evil.com # tracker", "evil.com"),
+        ("# comment", None),
+        ("", None),
+        ("nodot", None),
+        ("bücher.de", "xn--bcher-kva.de"),
+    ],
+)
+def test_parse_line(line, expected):
+    assert parse_line(line) == expected
+
+
+def test_reverse():
+    assert reverse("a.evil.com") == b"com.evil.a"
+
+
+def write(directory, name, lines):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def test_compiled_set_matches_subdomains(tmp_path):
+    source = write(tmp_path, "a.txt", ["evil.com", "0.0.0.0 bad.org", "evil.com"])
+    path = os.path.join(tmp_path, "compiled.bin")
+
+    assert compile_lists([source], path) == 2
+
+    domains = DomainSet(path)
+
+    assert len(domains) == 2
+    assert domains.match("evil.com") == "evil.com"
+    assert domains.match("a.b.EVIL.com.") == "evil.com"
+    assert domains.match("notevil.com") is None
+    assert domains.match("evil.com.example") is None
+    assert domains.match("com") is None
+
+
+def test_empty_set_matches_nothing():
+    assert DomainSet().match("evil.com") is None
+
+
+def test_extract_hosts():
+    hosts = list(
+        extract_hosts(
+            "see https://Evil.com/x and bad.org, mail me@home.net",
+            ["https://Evil.com/x"],
+        )
+    )
+
+    assert hosts == ["evil.com", "bad.org"]
+
+
+def load(blocklist, force=False):
+    return asyncio.run(blocklist.reload(force))
+
+
+def test_startup_reuses_the_compiled_file(tmp_path):
+    write(tmp_path, "a.txt", ["evil.com"])
+    assert load(DomainBlocklist(str(tmp_path)))
+
+    compiled = os.path.join(tmp_path, "compiled.bin")
+    built = os.stat(compiled).st_mtime_ns
+
+    restarted = DomainBlocklist(str(tmp_path))
+    assert load(restarted)
+    assert restarted.match("evil.com") == "evil.com"
+    assert os.stat(compiled).st_mtime_ns == built
+
+
+def test_startup_recompiles_after_a_list_is_removed(tmp_path):
+    write(tmp_path, "a.txt", ["evil.com"])
+    removed = write(tmp_path, "b.txt", ["bad.org"])
+    assert load(DomainBlocklist(str(tmp_path)))
+
+    os.remove(removed)
+
+    restarted = DomainBlocklist(str(tmp_path))
+    assert load(restarted)
+    assert restarted.match("evil.com") == "evil.com"
+    assert restarted.match("bad.org") is None
+
+
+def test_reload_picks_up_changes(tmp_path):
+    source = write(tmp_path, "a.txt", ["evil.com"])
+    blocklist = DomainBlocklist(str(tmp_path))
+    assert load(blocklist)
+
+    # Nothing changed
+    assert not load(blocklist)
+
+    write(tmp_path, "a.txt", ["evil.com", "bad.org"])
+    os.utime(source, ns=(0, os.stat(source).st_mtime_ns + 1_000_000_000))
+
+    assert load(blocklist)
+    assert blocklist.match("x.bad.org") == "bad.org"
@@ -0,0 +1,135 @@
+import itertools
+import random
+import string
+from types import SimpleNamespace
+
+from utils import duplicates
+from utils.duplicates import BANDS, DuplicateDetector, hamming, simhash
+
+_ids = itertools.count(1)
+
+AD = "Free nitro for everyone, just click the link in my bio to claim it"
+
+
+def message(content, channel_id=1, author_id=1, guild_id=1):
+    return SimpleNamespace(
+        id=next(_ids),
+        content=content,
+        guild=SimpleNamespace(id=guild_id),
+        channel=SimpleNamespace(id=channel_id),
+        author=SimpleNamespace(id=author_id),
+        raw_mentions=[],
+        raw_role_mentions=[],
+        mention_everyone=False,
+    )
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def detector(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(duplicates, "time", clock)
+    return DuplicateDetector(**kwargs), clock
+
+
+def test_simhash_ignores_case_and_punctuation():
+    assert simhash("Hello, World!") == simhash("hello world")
+    assert simhash("!!! ...") is None
+
+
+def test_simhash_near_duplicates_are_close():
+    a = simhash(AD)
+    b = simhash(AD + "!!1 now")
+    c = simhash("Completely unrelated chatter about dinner plans")
+
+    assert hamming(a, b) < hamming(a, c)
+
+
+def test_flags_same_message_across_users(monkeypatch):
+    dups, clock = detector(monkeypatch)
+    posted = []
+
+    for author_id in range(1, 4):
+        msg = message(AD, channel_id=author_id, author_id=author_id)
+        posted.append(msg)
+        assert dups.record(msg, threshold=4) is None
+        clock.now += 1
+
+    last = message(AD, channel_id=9, author_id=9)
+    found = dups.record(last, threshold=4)
+
+    assert found is not None
+    assert sorted(i for ids in found.values() for i in ids) == sorted(
+        [m.id for m in posted] + [last.id]
+    )
+
+    # Further copies are returned one by one while flagged
+    again = message(AD, channel_id=2, author_id=5)
+    assert dups.record(again, threshold=4) == {2: [again.id]}
+
+
+def test_one_user_in_one_channel_is_left_to_spam(monkeypatch):
+    dups, _ = detector(monkeypatch)
+
+    for _ in range(5):
+        assert dups.record(message(AD), threshold=3) is None
+
+
+def test_short_messages_are_ignored(monkeypatch):
+    dups, _ = detector(monkeypatch)
+
+    for author_id in range(10):
+        assert dups.record(message("good morning", author_id=author_id), 2) is None
+
+
+def test_hits_expire_after_the_window(monkeypatch):
+    dups, clock = detector(monkeypatch, window=30.0)
+
+    for author_id in range(3):
+        dups.record(message(AD, author_id=author_id), threshold=4)
+        clock.now += 20
+
+    assert dups.record(message(AD, author_id=9), threshold=4) is None
+
+
+def test_clusters_sharing_a_band_are_all_found(monkeypatch):
+    dups, _ = detector(monkeypatch)
+    guild = dups._get_guild(1)
+    rng = random.Random(0)
+
+    # Two unrelated fingerprints with the same first band
+    first = rng.getrandbits(64) & ~0xFF
+    other = (rng.getrandbits(64) & ~0xFF) | (first & 0xFF)
+    a = dups._find_cluster(guild, first)
+    b = dups._find_cluster(guild, other)
+
+    assert a is not b
+    assert len(guild.bands[(0, first & 0xFF)]) == 2
+
+    # Both stay reachable, a near copy of the first one finds it
+    assert dups._find_cluster(guild, first ^ 0b101) is a
+    assert dups._find_cluster(guild, other ^ (1 << 40)) is b
+
+
+def test_eviction_cleans_up_bands(monkeypatch):
+    dups, clock = detector(monkeypatch, window=10.0, max_clusters=2)
+    rng = random.Random(1)
+
+    for _ in range(20):
+        words = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(6)
+        )
+        dups.record(message(words, author_id=rng.randint(1, 50)), threshold=4)
+        clock.now += 1
+
+    guild = dups._get_guild(1)
+
+    assert len(guild.clusters) <= 2
+    assert len(guild.bands) <= 2 * BANDS
+    assert all(ids <= set(guild.clusters) for ids in guild.bands.values())
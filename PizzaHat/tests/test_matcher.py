@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.matcher import BannedWords, WordMatcher
+from utils.normalize import normalize
+
+
+def test_empty_matcher_finds_nothing():
+    matcher = WordMatcher(["", "   "])
+
+    assert matcher.size == 0
+    assert matcher.search("anything at all") is None
+
+
+def test_words_are_counted_once():
+    assert WordMatcher(["bad", "BAD", " bad ", "worse"]).size == 2
+
+
+@pytest.mark.parametrize(
+    "text, found",
+    [
+        ("that is bad", "bad"),
+        ("BAD idea", "bad"),
+        ("(bad)", "bad"),
+        ("badminton", None),
+        ("a_bad_name", None),
+        ("bad2", None),
+    ],
+)
+def test_whole_words(text, found):
+    assert WordMatcher(["bad"]).search(text) == found
+
+
+def test_substrings_without_whole_words():
+    assert WordMatcher(["bad"], whole_words=False).search("badminton") == "bad"
+
+
+def test_overlapping_words():
+    matcher = WordMatcher(["he", "she", "hers", "his"])
+
+    assert matcher.search("ushers") is None
+    assert matcher.search("not hers") == "hers"
+    assert WordMatcher(["he", "she"], whole_words=False).search("ushers") == "she"
+
+
+def test_falls_back_past_a_partial_match():
+    # "abd" fails at "d", the search must resume from the "b" suffix
+    assert WordMatcher(["bd"], whole_words=False).search("abd") == "bd"
+
+
+def test_first_match_wins():
+    assert WordMatcher(["beta", "alpha"]).search("alpha then beta") == "alpha"
+
+
+def test_matches_normalized_text():
+    matcher = WordMatcher(map(normalize, ["badword"]))
+
+    assert matcher.search(normalize("b4dw0rd")) == "badword"
+    assert matcher.search(normalize("b a d w o r d")) == "badword"
+
+
+class FakeDB:
+    def __init__(self, words):
+        self.words = words
+        self.queries = 0
+
+    async def fetch(self, query, guild_id):
+        self.queries += 1
+        return [{"word": w} for w in self.words.get(guild_id, [])]
+
+
+def test_guild_lists_are_cached_until_invalidated():
+    db = FakeDB({1: ["Späm"]})
+    banned = BannedWords(SimpleNamespace(db=db), ["global"])  # type: ignore
+
+    async def run():
+        assert await banned.search(1, "global") == "global"
+        assert await banned.search(1, normalize("spam here")) == "spam"
+        assert await banned.search(2, "spam") is None
+        assert db.queries == 2
+
+        await banned.search(1, "spam")
+        assert db.queries == 2
+
+        banned.invalidate(1)
+        await banned.search(1, "spam")
+        assert db.queries == 3
+
+    asyncio.run(run())
+
+
+def test_guild_cache_is_bounded():
+    db = FakeDB({})
+    banned = BannedWords(SimpleNamespace(db=db), [], max_size=2)  # type: ignore
+
+    async def run():
+        for guild_id in (1, 2, 1, 3):
+            await banned.get(guild_id)
+
+    asyncio.run(run())
+
+    # 2 was the least recently used
+    assert list(banned._guilds) == [1, 3]
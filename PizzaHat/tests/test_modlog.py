@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import discord
+
+from core.modlog import OUTBOX_INSERT, ModLogDispatcher
+
+AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeBuffer:
+    def __init__(self):
+        self.rows = []
+        self.flushes = 0
+
+    def add(self, statement, *args):
+        assert statement is OUTBOX_INSERT
+        self.rows.append(args)
+
+    async def flush(self, statement=None):
+        self.flushes += 1
+
+
+class FakeDB:
+    def __init__(self):
+        self.deleted = []
+
+    async def execute(self, query, keys, *args):
+        if query.startswith("DELETE"):
+            self.deleted.extend(keys)
+
+
+class FakeChannel:
+    def __init__(self, id, delay=0.0):
+        self.id = id
+        self.guild = SimpleNamespace(id=1)
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, embeds):
+        await asyncio.sleep(self.delay)
+        self.sent.append(embeds)
+
+
+def fake_bot(channel):
+    async def wait_until_ready():
+        pass
+
+    return SimpleNamespace(
+        db=FakeDB(),
+        write_buffer=FakeBuffer(),
+        get_channel=lambda id: channel if id == channel.id else None,
+        wait_until_ready=wait_until_ready,
+        is_ready=lambda: True,
+    )
+
+
+def test_entries_are_stored_when_queued():
+    channel = FakeChannel(10)
+    bot = fake_bot(channel)
+
+    async def run():
+        modlog = ModLogDispatcher(bot, interval=60)  # type: ignore
+        modlog.send(channel, discord.Embed(title="a"), "ban", 5, AT)  # type: ignore
+        # The same event again is not queued twice
+        modlog.send(channel, discord.Embed(title="a"), "ban", 5, AT)  # type: ignore
+        assert modlog.depth == 1
+        await modlog.close()
+
+    asyncio.run(run())
+
+    key = f"1:ban:5:{int(AT.timestamp() * 1000)}"
+    assert [row[:2] for row in bot.write_buffer.rows] == [(key, 10)]
+    assert len(channel.sent) == 1
+    # Flushed before the delivered row is deleted
+    assert bot.write_buffer.flushes == 1 and bot.db.deleted == [key]
+
+
+def test_close_lets_a_delivery_finish():
+    channel = FakeChannel(10, delay=0.2)
+    bot = fake_bot(channel)
+
+    async def run():
+        modlog = ModLogDispatcher(bot, interval=0.01)  # type: ignore
+        for i in range(15):
+            modlog.send(channel, discord.Embed(title=str(i)), "ban", i, AT)  # type: ignore
+
+        # The worker is now sending the first 10
+        await asyncio.sleep(0.1)
+        await modlog.close()
+        return modlog
+
+    modlog = asyncio.run(run())
+
+    assert [len(embeds) for embeds in channel.sent] == [10, 5]
+    assert modlog.depth == 0 and len(bot.db.deleted) == 15
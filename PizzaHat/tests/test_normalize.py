@@ -0,0 +1,76 @@
+import pytest
+from utils.normalize import fold, normalize
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["meet at room 455", "1945", "555-1234", "2nd"],
+)
+def test_numbers_are_left_alone(text):
+    assert normalize(text) == text
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("h3ll0 w0rld", "hello world"),
+        ("$h1t", "shit"),
+        ("@ss", "ass"),
+        ("b.4.d", "bad"),
+    ],
+)
+def test_leetspeak_in_words(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("b a d", "bad"),
+        ("b.a.d", "bad"),
+        ("b-a-d word", "bad word"),
+    ],
+)
+def test_spaced_out_letters(text, expected):
+    assert normalize(text) == expected
+
+
+def test_ascii_is_only_lowered():
+    assert fold("Hello World") == "hello world"
+    assert fold("Hello World", keep_case=True) == "Hello World"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("cafè", "cafe"),
+        ("ｆｕｌｌ", "full"),  # fullwidth
+        ("\U0001d41b\U0001d41a\U0001d41d", "bad"),  # math bold
+        ("b\u200ba\u200bd", "bad"),  # zero-width spaces
+        ("\U0001f1e6\U0001f1e7", "ab"),  # regional indicators
+    ],
+)
+def test_fold(text, expected):
+    assert fold(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("\u0440\u0430ypal", "paypal"),  # Cyrillic r and a
+        ("\u0430ss", "ass"),
+        ("\u0251ss", "ass"),  # Latin alpha, always folded
+        ("\u0430 s s", "ass"),  # only mixed once joined
+    ],
+)
+def test_mixed_script_look_alikes(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["Иван", "Привет мир"],
+)
+def test_single_script_words_keep_their_letters(text):
+    assert fold(text, keep_case=True) == text
+    assert normalize(text) == text.casefold()
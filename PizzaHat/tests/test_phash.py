@@ -0,0 +1,74 @@
+import io
+import random
+
+import pytest
+from PIL import Image
+from utils.phash import BKTree, dhash, hamming, to_signed, to_unsigned
+
+
+def brute_force(hashes, h, max_distance):
+    return [x for x in hashes if hamming(x, h) <= max_distance]
+
+
+def gradient(width=64, height=48, noise=0, seed=0):
+    rng = random.Random(seed)
+    img = Image.new("L", (width, height))
+    img.putdata(
+        [
+            max(0, min(255, (x * 255) // width + rng.randint(-noise, noise)))
+            for y in range(height)
+            for x in range(width)
+        ]
+    )
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("h", [0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1])
+def test_signed_round_trip(h):
+    signed = to_signed(h)
+
+    assert -(1 << 63) <= signed < (1 << 63)
+    assert to_unsigned(signed) == h
+
+
+def test_empty_tree_finds_nothing():
+    assert BKTree().find(0, 64) is None
+
+
+def test_duplicates_are_stored_once():
+    tree = BKTree([5, 5, 5, 6])
+
+    assert len(tree) == 2
+
+
+def test_find_matches_brute_force():
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree(hashes)
+
+    for _ in range(200):
+        base = rng.choice(hashes)
+        query = base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        max_distance = rng.randint(0, 6)
+
+        found = tree.find(query, max_distance)
+        expected = brute_force(hashes, query, max_distance)
+
+        if expected:
+            assert found in expected
+        else:
+            assert found is None
+
+
+def test_dhash_survives_small_changes():
+    a = dhash(gradient())
+    b = dhash(gradient(noise=3, seed=1))
+
+    assert a is not None and b is not None
+    assert hamming(a, b) <= 6
+
+
+def test_dhash_of_garbage_is_none():
+    assert dhash(b"not an image") is None
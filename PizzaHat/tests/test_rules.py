@@ -0,0 +1,216 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.rules import CHECKED, HITS, RULES, SHADOW_HITS, CompiledRule, Plan, RuleEngine
+
+
+def message(channel_id=1, parent_id=None, roles=()):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id, parent_id=parent_id),
+        author=SimpleNamespace(_roles=list(roles)),
+    )
+
+
+def rule(name, hit, calls, shadow=False):
+    async def check(msg, threshold):
+        calls.append(name)
+        return hit
+
+    return CompiledRule(name, check, None, "delete", name, shadow=shadow)
+
+
+def counters(*names):
+    return {name: [0, 0, 0] for name in names}
+
+
+def test_first_enforced_hit_stops_evaluation():
+    calls = []
+    plan = Plan(
+        frozenset(),
+        (rule("a", False, calls), rule("b", "found", calls), rule("c", True, calls)),
+    )
+
+    found = asyncio.run(plan.evaluate(message()))
+
+    assert found is not None
+    assert found[0].name == "b" and found[1] == "found"
+    assert calls == ["a", "b"]
+
+
+def test_shadow_hits_are_counted_not_enforced():
+    calls = []
+    c = counters("a", "b")
+    plan = Plan(
+        frozenset(), (rule("a", True, calls, shadow=True), rule("b", False, calls)), c
+    )
+
+    assert asyncio.run(plan.evaluate(message())) is None
+    assert calls == ["a", "b"]
+    assert c["a"] == [1, 0, 1]
+    assert c["b"][CHECKED] == 1 and c["b"][HITS] == 0 and c["b"][SHADOW_HITS] == 0
+
+
+def test_known_results_are_not_checked_again():
+    calls = []
+    c = counters("a", "b", "c")
+    a, b = rule("a", True, calls), rule("b", True, calls)
+    plan = Plan(frozenset(), (a, b, rule("c", True, calls)), c)
+
+    found = asyncio.run(plan.evaluate(message(), {"a": False, "c": True}))
+
+    assert found is not None and found[0] is b
+    assert calls == ["b"]
+    assert c["a"] == [1, 0, 0] and c["c"] == [0, 0, 0]
+
+
+def test_exemptions():
+    plan = Plan(frozenset({10, 20, 30}), ())
+
+    assert not plan.is_exempt(message())
+    assert plan.is_exempt(message(channel_id=10))
+    assert plan.is_exempt(message(parent_id=20))
+    assert plan.is_exempt(message(roles=[5, 30]))
+    assert not Plan(frozenset(), ()).is_exempt(message(channel_id=10))
+
+
+def test_exempt_messages_are_not_checked():
+    calls = []
+    plan = Plan(frozenset({10}), (rule("a", True, calls),))
+
+    assert asyncio.run(plan.evaluate(message(channel_id=10))) is None
+    assert calls == []
+
+
+def test_heavy_plans():
+    async def check(msg, threshold):
+        return None
+
+    light = CompiledRule("a", check, None, "delete", "a")
+
+    assert not Plan(frozenset(), (light,)).heavy
+    assert Plan(frozenset(), (light, light._replace(heavy=True))).heavy
+
+
+def test_new_rules_default_to_shadow():
+    assert {name for name, spec in RULES.items() if spec.shadow} == {
+        "duplicates",
+        "images",
+    }
+
+
+def engine():
+    checks = {spec.method: object() for spec in RULES.values()}
+    automod = SimpleNamespace(bot=SimpleNamespace(db=None), **checks)
+    return RuleEngine(automod), checks  # type: ignore
+
+
+def test_defaults_without_a_database():
+    rules, checks = engine()
+    plan = asyncio.run(rules.get(1))
+
+    costs = [RULES[r.name].cost for r in plan.rules]
+    assert costs == sorted(costs)
+    assert [r.name for r in plan.rules] == sorted(RULES, key=lambda n: RULES[n].cost)
+
+    for r in plan.rules:
+        spec = RULES[r.name]
+        assert r.check is checks[spec.method]
+        assert r.threshold == spec.threshold
+        assert r.action == "delete"
+        assert r.shadow == spec.shadow
+
+    assert plan.exempt == frozenset()
+    assert plan.counters is rules.stats.counters(1)
+
+
+def test_plans_are_cached_until_invalidated():
+    rules, _ = engine()
+
+    first = asyncio.run(rules.get(1))
+    assert asyncio.run(rules.get(1)) is first
+
+    rules.invalidate(1)
+    assert asyncio.run(rules.get(1)) is not first
+
+
+class FakeDB:
+    def __init__(self, rows, exempt):
+        self.rows = rows
+        self.exempt = exempt
+
+    async def fetch(self, query, guild_id):
+        return self.rows if "automod_rules" in query else self.exempt
+
+
+def test_overrides():
+    rules, _ = engine()
+    rules.bot.db = FakeDB(
+        [
+            {"rule": "caps", "enabled": False, "threshold": None, "action": None, "shadow": None},
+            # A NULL shadow keeps the rule's default
+            {"rule": "duplicates", "enabled": True, "threshold": 9, "action": "warn", "shadow": None},
+            {"rule": "links", "enabled": True, "threshold": 9, "action": None, "shadow": None},
+            {"rule": "images", "enabled": True, "threshold": 3, "action": "ban", "shadow": False},
+        ],
+        [{"target_id": 10}],
+    )
+
+    plan = asyncio.run(rules.get(1))
+    compiled = {r.name: r for r in plan.rules}
+
+    assert "caps" not in compiled
+    assert compiled["duplicates"].threshold == 9
+    assert compiled["duplicates"].action == "warn"
+    assert compiled["duplicates"].shadow
+    # Rules without a threshold ignore one
+    assert compiled["links"].threshold is None
+    assert not compiled["links"].shadow
+    assert compiled["images"].threshold == 3
+    assert compiled["images"].action == "delete"
+    assert not compiled["images"].shadow
+    assert plan.exempt == frozenset({10})
+
+
+class SlowDB(FakeDB):
+    def __init__(self):
+        super().__init__([], [])
+        self.fetches = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self, query, guild_id):
+        self.fetches += 1
+        await self.release.wait()
+        return await super().fetch(query, guild_id)
+
+
+def test_concurrent_misses_compile_once():
+    rules, _ = engine()
+    db = rules.bot.db = SlowDB()
+
+    async def run():
+        tasks = [asyncio.create_task(rules.get(1)) for _ in range(5)]
+        await asyncio.sleep(0)
+        db.release.set()
+        return await asyncio.gather(*tasks)
+
+    plans = asyncio.run(run())
+
+    assert all(p is plans[0] for p in plans)
+    # One query for the rules, one for the exemptions
+    assert db.fetches == 2
+
+
+def test_invalidated_while_compiling_is_not_cached():
+    rules, _ = engine()
+    db = rules.bot.db = SlowDB()
+
+    async def run():
+        task = asyncio.create_task(rules.get(1))
+        await asyncio.sleep(0)
+        rules.invalidate(1)
+        db.release.set()
+        stale = await task
+
+        assert await rules.get(1) is not stale
+
+    asyncio.run(run())
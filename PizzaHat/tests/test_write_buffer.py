@@ -0,0 +1,88 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from core.database import BufferedStatement, WriteBehindBuffer
+
+INSERT = BufferedStatement("INSERT INTO t (x) VALUES ($1)")
+
+
+class SlowPool:
+    def __init__(self, delay=0.0, fail=None):
+        self.delay = delay
+        self.fail = fail
+        self.written = []
+
+    async def executemany(self, query, rows):
+        await asyncio.sleep(self.delay)
+
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            raise error
+
+        self.written.extend(rows)
+
+
+def test_close_waits_for_a_running_flush():
+    pool = SlowPool(delay=0.2)
+
+    async def run():
+        buffer = WriteBehindBuffer(pool, interval=0.01)  # type: ignore
+        buffer.start()
+
+        for i in range(10):
+            buffer.add(INSERT, i)
+
+        # Let the flusher take the rows and start writing them
+        await asyncio.sleep(0.05)
+        assert buffer.depth == 0 and not pool.written
+
+        await buffer.close()
+        return buffer
+
+    buffer = asyncio.run(run())
+
+    assert pool.written == [(i,) for i in range(10)]
+    assert buffer.depth == 0 and buffer.dropped_rows == 0
+
+
+def test_cancelled_flush_keeps_its_rows():
+    pool = SlowPool(delay=0.2)
+
+    async def run():
+        buffer = WriteBehindBuffer(pool)  # type: ignore
+        buffer.add(INSERT, 1)
+
+        task = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert buffer.depth == 1
+        pool.delay = 0
+        await buffer.flush()
+
+    asyncio.run(run())
+
+    assert pool.written == [(1,)]
+
+
+@pytest.mark.parametrize(
+    "error, kept", [(OSError(), True), (asyncpg.DataError("bad row"), False)]
+)
+def test_failed_flush_is_not_raised(error, kept):
+    pool = SlowPool(fail=error)
+
+    async def run():
+        buffer = WriteBehindBuffer(pool)  # type: ignore
+        buffer.add(INSERT, 1)
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(run())
+
+    assert buffer.depth == kept
+    assert buffer.dropped_rows == (not kept)
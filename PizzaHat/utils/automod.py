@@ -1,26 +1,63 @@
 import datetime
-import re
-from urllib import parse
+import os
 
 import discord
-from typing import Union
-import emojis
-from async_lru import alru_cache
 from core.bot import PizzaHat
 from core.cog import Cog
-from discord.ext import commands
+from core.statements import WARNLOG_INSERT
 
+from .batch import AutoModBatcher
 from .config import BANNED_WORDS
+from .domains import DomainBlocklist, extract_hosts
+from .duplicates import DuplicateDetector
+from .features import MessageFeatures, extract, scan, store
+from .invites import InviteResolver
+from .matcher import BannedWords
+from .offload import CheckExecutor
+from .phash import ImageScanner
+from .rules import CompiledRule, RuleEngine
+from .spam import SpamTracker
+
+# Seconds to collect messages for batched evaluation, 0 checks each one directly
+BATCH_WINDOW = float(os.getenv("AUTOMOD_BATCH_WINDOW", 0))
+# Content of messages this long is scanned in a process pool, also used to hash
+# images. 0 workers scans inline and hashes in a thread
+OFFLOAD_MIN_LENGTH = int(os.getenv("AUTOMOD_OFFLOAD_MIN_LENGTH", 1000))
+OFFLOAD_WORKERS = int(os.getenv("AUTOMOD_OFFLOAD_WORKERS", 2))
+OFFLOAD_TIMEOUT = float(os.getenv("AUTOMOD_OFFLOAD_TIMEOUT", 2.0))
+# Directory of domain lists (*.txt, one domain or hosts entry per line)
+DOMAIN_BLOCKLISTS = os.getenv("DOMAIN_BLOCKLISTS", "blocklists")
 
 
 class AutoMod(Cog):
     def __init__(self, bot: PizzaHat):
         self.bot: PizzaHat = bot
         self.mentions = bot.allowed_mentions
-        self.invite_regex = re.compile(
-            r"((http(s|):\/\/|)(discord)(\.(gg|io|me)\/|app\.com\/invite\/)([0-z]+))"
+        self.banned = BannedWords(bot, BANNED_WORDS)
+        self.spam = SpamTracker()
+        self.duplicates = DuplicateDetector()
+        self.invite_resolver = InviteResolver(bot)
+        self.executor = (
+            CheckExecutor(OFFLOAD_WORKERS, OFFLOAD_WORKERS * 8, OFFLOAD_TIMEOUT)
+            if OFFLOAD_WORKERS > 0
+            else None
         )
-        self.zalgo_regex = re.compile(r"%CC%", re.MULTILINE)
+        self.images = ImageScanner(bot, self.executor)
+        self.domains = DomainBlocklist(DOMAIN_BLOCKLISTS)
+        self.rules = RuleEngine(self)
+        self.batcher = AutoModBatcher(self, BATCH_WINDOW) if BATCH_WINDOW > 0 else None
+
+    async def cog_load(self) -> None:
+        await self.domains.reload()
+        self.domains.start()
+
+    async def cog_unload(self) -> None:
+        self.domains.close()
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self.executor is not None:
+            self.executor.close()
+        self.rules.stats.flush()
 
     def mod_perms(self, m: discord.Message):
         p = m.author.guild_permissions  # type: ignore
@@ -36,33 +73,19 @@ class AutoMod(Cog):
             else False
         )
 
-    @alru_cache()
     async def get_logs_channel(self, guild_id: int):
-        data = (
-            await self.bot.db.fetchval(
-                "SELECT channel_id FROM modlogs WHERE guild_id=$1", guild_id
-            )
-            if self.bot.db
-            else None
-        )
-        if data is not None:
-            return self.bot.get_channel(data)
-
-    @alru_cache()
-    async def check_if_am_is_enabled(self, guild_id: int) -> Union[bool, None]:
-        data = (
-            await self.bot.db.fetchval(
-                "SELECT enabled FROM automod WHERE guild_id=$1", guild_id
-            )
-            if self.bot.db
-            else None
-        )
-        if data is not None:
-            return data
+        config = await self.bot.settings.get(guild_id)
+
+        if config.modlogs_channel_id is not None:
+            return self.bot.get_channel(config.modlogs_channel_id)
+
+    async def check_if_am_is_enabled(self, guild_id: int) -> bool:
+        config = await self.bot.settings.get(guild_id)
+        return config.automod_enabled
 
     @Cog.listener()
     async def on_automod_trigger(self, msg: discord.Message, module: str):
-        logs_channel = self.bot.get_channel(self.get_logs_channel(msg.guild.id))  # type: ignore
+        logs_channel = await self.get_logs_channel(msg.guild.id)  # type: ignore
 
         if not logs_channel:
             return
@@ -79,164 +102,174 @@ class AutoMod(Cog):
         em.set_footer(text=f"Message ID: {msg.id} | User ID: {msg.author.id}")
         em.add_field(name="Module", value=module)
 
-        await logs_channel.send(embed=em)  # type: ignore
+        self.bot.modlog.send(
+            logs_channel, em, f"automod_{module}", msg.id, msg.created_at
+        )
+
+    @Cog.listener()
+    async def on_invite_create(self, invite: discord.Invite):
+        self.invite_resolver.add(invite)
+
+    @Cog.listener()
+    async def on_invite_delete(self, invite: discord.Invite):
+        self.invite_resolver.remove(invite)
+
+    @Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.invite_resolver.forget_guild(guild.id)
 
     @Cog.listener()
     async def on_message(self, msg: discord.Message):
-        if msg.guild is not None:
-            am_enabled_guild = await self.check_if_am_is_enabled(msg.guild.id)
+        if msg.author.bot or not msg.guild:
+            return
 
-        if msg.author.bot or msg.content == "" or not msg.guild:
+        if msg.content == "" and not msg.attachments:
+            return
+
+        if not await self.check_if_am_is_enabled(msg.guild.id):
             return
 
         if self.mod_perms(msg):
             return
 
-        if not am_enabled_guild:
+        plan = await self.rules.get(msg.guild.id)
+        self.rules.stats.tick()
+
+        if plan.is_exempt(msg):
             return
 
-    async def banned_words(self, msg: discord.Message):
-        banned_words = BANNED_WORDS.copy()
+        if (
+            plan.heavy
+            and self.executor is not None
+            and len(msg.content) >= OFFLOAD_MIN_LENGTH
+        ):
+            await self.prescan(msg)
 
-        for word in banned_words:
-            if word in msg.content.lower():
-                try:
-                    await msg.delete()
-                except Exception:
-                    pass
+        if self.batcher is not None:
+            self.batcher.submit(msg, plan)
+            return
 
-                await msg.channel.send(
-                    f"{msg.author.mention}, Watch your language.",
-                    delete_after=5,
-                    allowed_mentions=self.mentions,  # type: ignore
-                )
-                return True
-        return False
+        result = await plan.evaluate(msg)
 
-    async def all_caps(self, msg: discord.Message):
-        if len(msg.content) <= 7:
-            return False
+        if result is not None:
+            await self.take_action(msg, *result)
 
-        if msg.content.isupper():
-            try:
-                await msg.delete()
-            except Exception:
-                pass
+    async def prescan(self, msg: discord.Message) -> None:
+        """
+        Scans the content in the pool, heavy rules then find it through
+        `extract`. If the pool is full or too slow only the start of the
+        message is scanned, inline, as much as is never offloaded.
+        """
 
-            await msg.channel.send(
-                f"{msg.author.mention}, Too many caps.",
-                delete_after=5,
-                allowed_mentions=self.mentions,  # type: ignore
-            )
-            return True
+        scanned = await self.executor.run(scan, msg.content)  # type: ignore
 
-        upper_count = 0
+        if scanned is None:
+            scanned = scan(msg.content[:OFFLOAD_MIN_LENGTH])
 
-        for h in msg.content:
-            if h.isupper():
-                upper_count += 1
+        store(msg, MessageFeatures(msg, scanned))
 
-        if (upper_count / len(msg.content)) * 100 > 70:
-            await msg.delete()
-            await msg.channel.send(
-                f"{msg.author.mention}, Too many caps.",
-                delete_after=5,
-                allowed_mentions=self.mentions,  # type: ignore
-            )
-            return True
-        return False
+    async def take_action(self, msg: discord.Message, rule: CompiledRule, hit):
+        if rule.action in ("delete", "timeout"):
+            await self.delete(msg, hit)
 
-    async def message_spam(self, msg: discord.Message):
-        def _check(m):
-            return (
-                m.author == msg.author
-                and (
-                    datetime.datetime.utcnow() - m.created_at.replace(tzinfo=None)
-                ).seconds
-                < 7
-            )
+        if rule.action == "timeout" and isinstance(msg.author, discord.Member):
+            try:
+                await msg.author.timeout(
+                    datetime.timedelta(minutes=5), reason=f"Auto-mod: {rule.name}"
+                )
+            except discord.HTTPException:
+                pass
 
-        h = list(filter(lambda m: _check(m), self.bot.cached_messages))
+        if rule.action == "warn":
+            # Shows up in the warnings command like a moderator's warn
+            self.bot.write_buffer.add(
+                WARNLOG_INSERT,
+                msg.guild.id,  # type: ignore
+                msg.author.id,
+                self.bot.user.id,  # type: ignore
+                f"Auto-mod: {rule.reason}",
+            )
 
-        if len(h) >= 5:
-            await msg.channel.purge(limit=5, check=_check)  # type: ignore
+        if rule.action != "log":
             await msg.channel.send(
-                f"{msg.author.mention}, Stop spamming.",
+                f"{msg.author.mention}, {rule.reason}",
                 delete_after=5,
                 allowed_mentions=self.mentions,  # type: ignore
             )
-            return True
-        return False
 
-    async def invites(self, msg: discord.Message, m: dict) -> bool:
-        invite_match = self.invite_regex.findall(msg.content)
-
-        if invite_match and msg.guild is not None:
-            for e in invite_match:
-                try:
-                    invite = await self.bot.fetch_invite(e[-1])
-
-                except discord.NotFound:
-                    pass
-
-                else:
-                    if invite.guild is not None:
-                        if not invite.guild.id == msg.guild.id:
-                            await msg.delete()
-                            await msg.channel.send(
-                                f"{msg.author.mention}, No invite links.",
-                                delete_after=5,
-                                allowed_mentions=self.mentions,  # type: ignore
-                            )
-                            return True
-        return False
+        self.bot.dispatch("automod_trigger", msg, rule.name)
 
-    async def mass_mentions(self, msg: discord.Message):
-        if len(msg.mentions) >= 3:
-            await msg.delete()
-            await msg.channel.send(
-                f"{msg.author.mention}, Don't spam mentions.",
-                delete_after=5,
-                allowed_mentions=self.mentions,  # type: ignore
-            )
-            return True
-        return False
+    async def delete(self, msg: discord.Message, hit) -> None:
+        if not isinstance(hit, dict):
+            try:
+                await msg.delete()
+            except discord.HTTPException:
+                pass
+            return
 
-    async def emoji_spam(self, msg: discord.Message):
-        converter = commands.PartialEmojiConverter()
-        stuff = msg.content.split()
-        emoji_count = emojis.count(msg.content)
-        ctx = await self.bot.get_context(msg)
+        # message_spam/duplicate_messages found these, channel ID -> message IDs
+        for channel_id, message_ids in hit.items():
+            channel = msg.guild.get_channel_or_thread(channel_id)  # type: ignore
 
-        for thing in stuff:
+            if channel is None:
+                continue
+
+            # Exactly the recorded messages, no history scan
             try:
-                await converter.convert(ctx, thing)
-                emoji_count += 1
-            except commands.PartialEmojiConversionFailure:
+                await channel.delete_messages(  # type: ignore
+                    [discord.Object(id=i) for i in message_ids]
+                )
+            except discord.HTTPException:
                 pass
 
-        if emoji_count > 10:
-            await msg.delete()
-            await msg.channel.send(
-                f"{msg.author.mention}, Don't spam emojis.",
-                delete_after=5,
-                allowed_mentions=self.mentions,  # type: ignore
-            )
-            return True
+    # Checks, called as (msg, threshold) by the rule engine. See utils.rules
+
+    async def banned_words(self, msg: discord.Message, threshold=None):
+        text = extract(msg).normalized
+        return bool(await self.banned.search(msg.guild.id, text))  # type: ignore
+
+    async def all_caps(self, msg: discord.Message, threshold: float = 0.7):
+        f = extract(msg)
+
+        if f.length <= 7:
+            return False
+
+        # All cased characters upper, or most of the message
+        return bool(f.cased and f.upper == f.cased) or f.caps_ratio > threshold
+
+    async def message_spam(self, msg: discord.Message, threshold: float = 5):
+        return self.spam.record(msg, int(threshold))
+
+    async def duplicate_messages(self, msg: discord.Message, threshold: float = 4):
+        return self.duplicates.record(msg, int(threshold))
+
+    async def blocked_images(self, msg: discord.Message, threshold: float = 6):
+        if not msg.attachments:
+            return False
+
+        return await self.images.find_blocked(msg, int(threshold)) is not None
+
+    async def blocked_links(self, msg: discord.Message, threshold=None):
+        for host in extract_hosts(msg.content, extract(msg).urls):
+            if self.domains.match(host) is not None:
+                return True
         return False
 
-    async def zalgo_text(self, msg: discord.Message):
-        x = self.zalgo_regex.search(parse.quote(msg.content.encode("utf-8")))
-        if x:
-            await msg.delete()
-            await msg.channel.send(
-                f"{msg.author.mention}, No zalgo allowed.",
-                delete_after=5,
-                allowed_mentions=self.mentions,  # type: ignore
-            )
-            return True
+    async def invites(self, msg: discord.Message, threshold=None):
+        for code in extract(msg).invite_codes:
+            if await self.invite_resolver.is_foreign(msg.guild, code):  # type: ignore
+                return True
         return False
 
+    async def mass_mentions(self, msg: discord.Message, threshold: float = 3):
+        return extract(msg).mentions >= threshold
+
+    async def emoji_spam(self, msg: discord.Message, threshold: float = 10):
+        return extract(msg).total_emojis > threshold
+
+    async def zalgo_text(self, msg: discord.Message, threshold: float = 0.2):
+        return extract(msg).combining_density > threshold
+
 
 async def setup(bot):
     await bot.add_cog(AutoMod(bot))
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, List, Optional, Sequence, Set, Tuple
+
+import discord
+import numpy as np
+
+from .features import extract
+from .rules import CompiledRule, Plan
+
+if TYPE_CHECKING:
+    from .automod import AutoMod
+
+logger = logging.getLogger("bot")
+
+# Rules that are plain thresholds on content features, in plan order
+VECTORIZED = ("mentions", "caps", "emojis", "zalgo")
+
+# Combining diacritical mark blocks
+_COMBINING = (
+    (0x0300, 0x036F),
+    (0x1AB0, 0x1AFF),
+    (0x1DC0, 0x1DFF),
+    (0x20D0, 0x20FF),
+    (0xFE20, 0xFE2F),
+)
+
+
+def _segment_sums(mask: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    csum = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    return csum[ends] - csum[starts]
+
+
+class BatchFeatures:
+    """
+    Content features of many messages as column vectors.
+
+    All contents are decoded into one code point array, so letter case and
+    combining marks are counted with a handful of vector ops. Messages with
+    non-ASCII text (other than combining marks) or possible emoji/mentions
+    fall back to `extract` for the columns that need it.
+    """
+
+    __slots__ = ("length", "upper", "cased", "combining", "mentions", "emojis")
+
+    def __init__(self, messages: Sequence[discord.Message]):
+        contents = [m.content for m in messages]
+        n = len(contents)
+
+        length = np.fromiter((len(c) for c in contents), dtype=np.int64, count=n)
+        ends = np.cumsum(length)
+        starts = ends - length
+
+        cps = np.frombuffer("".join(contents).encode("utf-32-le"), dtype=np.uint32)
+
+        upper_mask = (cps >= 65) & (cps <= 90)
+        lower_mask = (cps >= 97) & (cps <= 122)
+        combining_mask = np.zeros(cps.shape, dtype=bool)
+        for lo, hi in _COMBINING:
+            combining_mask |= (cps >= lo) & (cps <= hi)
+
+        # '<' starts custom emoji and mentions, non-ASCII may be emoji or cased letters
+        special_mask = (cps == 60) | ((cps > 127) & ~combining_mask)
+
+        self.length = length
+        self.upper = _segment_sums(upper_mask, starts, ends)
+        self.cased = self.upper + _segment_sums(lower_mask, starts, ends)
+        self.combining = _segment_sums(combining_mask, starts, ends)
+        self.mentions = np.zeros(n, dtype=np.int64)
+        self.emojis = np.zeros(n, dtype=np.int64)
+
+        for i in np.flatnonzero(_segment_sums(special_mask, starts, ends)):
+            f = extract(messages[i])
+            self.upper[i] = f.upper
+            self.cased[i] = f.cased
+            self.combining[i] = f.combining_marks
+            self.mentions[i] = f.mentions
+            self.emojis[i] = f.total_emojis
+
+
+def evaluate_vectorized(
+    messages: Sequence[discord.Message], plans: Sequence[Plan]
+) -> List[Optional[CompiledRule]]:
+    """
+    Applies the `VECTORIZED` rules of each message's plan in one pass and
+    returns the first rule each message breaks, in plan order.
+    """
+
+    n = len(messages)
+    f = BatchFeatures(messages)
+
+    # Per message thresholds, disabled rules never match
+    thresholds = np.full((len(VECTORIZED), n), np.inf)
+    rules: List[dict] = []
+
+    for i, plan in enumerate(plans):
+        # Shadow rules don't decide the verdict, Plan.evaluate counts them
+        enabled = {
+            r.name: r for r in plan.rules if r.name in VECTORIZED and not r.shadow
+        }
+        rules.append(enabled)
+
+        for j, name in enumerate(VECTORIZED):
+            rule = enabled.get(name)
+            if rule is not None:
+                thresholds[j, i] = rule.threshold
+
+    length = np.maximum(f.length, 1)
+    caps = (f.length > 7) & (
+        ((f.cased > 0) & (f.upper == f.cased)) | (f.upper / length > thresholds[1])
+    )
+    caps &= np.isfinite(thresholds[1])
+
+    hits = np.stack(
+        (
+            f.mentions >= thresholds[0],
+            caps,
+            f.emojis > thresholds[2],
+            f.combining / length > thresholds[3],
+        )
+    )
+
+    any_hit = hits.any(axis=0)
+    first = hits.argmax(axis=0)
+
+    return [
+        rules[i][VECTORIZED[first[i]]] if any_hit[i] else None for i in range(n)
+    ]
+
+
+class AutoModBatcher:
+    """
+    Collects messages for `window` seconds and evaluates them together.
+
+    The threshold rules run vectorized over the whole batch, the remaining
+    rules (spam, banned words, invites) still run per message in plan order,
+    for all messages of the batch concurrently.
+    """
+
+    def __init__(self, automod: "AutoMod", window: float, max_batch: int = 512):
+        self.automod = automod
+        self.window = window
+        self.max_batch = max_batch
+        self._batch: List[Tuple[discord.Message, Plan]] = []
+        self._task: Optional[asyncio.Task] = None
+        # Batches being evaluated, kept so they aren't garbage collected
+        self._runs: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.messages = 0
+        self.errors = 0
+
+    def submit(self, msg: discord.Message, plan: Plan) -> None:
+        if plan.is_exempt(msg):
+            return
+
+        self._batch.append((msg, plan))
+
+        if len(self._batch) >= self.max_batch:
+            batch, self._batch = self._batch, []
+            self._spawn(batch)
+
+        elif self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+
+    def _spawn(self, batch: List[Tuple[discord.Message, Plan]]) -> None:
+        task = asyncio.create_task(self.run(batch))
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._task = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            self._spawn(batch)
+
+    async def run(self, batch: List[Tuple[discord.Message, Plan]]) -> None:
+        self.batches += 1
+        self.messages += len(batch)
+
+        messages = [m for m, _ in batch]
+        verdicts = evaluate_vectorized(messages, [p for _, p in batch])
+
+        await asyncio.gather(
+            *(
+                self._handle(msg, plan, rule)
+                for (msg, plan), rule in zip(batch, verdicts)
+            )
+        )
+
+    async def _handle(
+        self, msg: discord.Message, plan: Plan, rule: Optional[CompiledRule]
+    ) -> None:
+        # One message failing must not take the rest of the batch with it
+        try:
+            # The enforced vectorized rules are already decided, evaluating
+            # the plan in order counts and stops the same as unbatched
+            known = {
+                r.name: r is rule
+                for r in plan.rules
+                if r.name in VECTORIZED and not r.shadow
+            }
+            result = await plan.evaluate(msg, known)
+
+            if result is not None:
+                await self.automod.take_action(msg, *result)
+
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Auto-mod failed on message {msg.id}")
+
+    async def close(self) -> None:
+        """Evaluates what was collected so far and waits for running batches."""
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            self._spawn(batch)
+
+        if self._runs:
+            await asyncio.gather(*self._runs, return_exceptions=True)
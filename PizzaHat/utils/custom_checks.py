@@ -14,9 +14,9 @@ def server_staff_role():
     """Check if the server has a staff role set."""
 
     async def predicate(ctx: Context):
-        role_id = await ctx.bot.db.fetchval("SELECT role_id FROM staff_role WHERE guild_id=$1", ctx.guild.id)  # type: ignore
+        role_id = (await ctx.bot.settings.get(ctx.guild.id)).staff_role_id  # type: ignore
 
-        if ctx.guild.get_role(role_id):  # type: ignore
+        if role_id is not None and ctx.guild.get_role(role_id):  # type: ignore
             return True
 
         else:
@@ -30,9 +30,9 @@ def user_is_staff():
     """Check if the user has a staff role."""
 
     async def predicate(ctx: Context):
-        role_id = await ctx.bot.db.fetchval("SELECT role_id FROM staff_role WHERE guild_id=$1", ctx.guild.id)  # type: ignore
+        role_id = (await ctx.bot.settings.get(ctx.guild.id)).staff_role_id  # type: ignore
 
-        if role_id in [role.id for role in ctx.author.roles]:  # type: ignore
+        if role_id is not None and ctx.author.get_role(role_id):  # type: ignore
             return True
 
         else:
@@ -0,0 +1,319 @@
+import asyncio
+import contextlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("bot")
+
+MAGIC = b"PZDOMS01"
+# magic, entry count
+HEADER = struct.Struct("=8sI")
+
+# Bare domains, links without a scheme are still links to Discord's client
+DOMAIN_REGEX = re.compile(
+    r"(?<![\w@.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63})(?![\w-])",
+    re.IGNORECASE,
+)
+
+
+def reverse(domain: str) -> bytes:
+    """evil.example.com -> b"com.example.evil", so parents sort as prefixes."""
+
+    return ".".join(reversed(domain.split("."))).encode()
+
+
+def parse_line(line: str) -> Optional[str]:
+    """Accepts plain domain lists and hosts files ("0.0.0.0 evil.com")."""
+
+    line = line.split("#", 1)[0].strip().lower()
+
+    if not line:
+        return None
+
+    domain = line.split()[-1].rstrip(".")
+
+    if domain.startswith("*."):
+        domain = domain[2:]
+
+    if "." not in domain or domain in ("localhost", "localhost.localdomain"):
+        return None
+
+    try:
+        return domain.encode("idna").decode()
+    except UnicodeError:
+        return None
+
+
+def compile_lists(sources: Iterable[str], path: str) -> int:
+    """
+    Builds the memory-mappable blocklist at `path` from domain list files:
+    a header, (count + 1) offsets and the sorted, de-duplicated reversed
+    domains back to back. Written to a temporary file and swapped in, so a
+    reader never sees half of it. Returns the number of entries.
+    """
+
+    entries = set()
+
+    for source in sources:
+        with open(source, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                domain = parse_line(line)
+                if domain is not None:
+                    entries.add(reverse(domain))
+
+    ordered = sorted(entries)
+    offsets = array("I", [0])
+
+    for entry in ordered:
+        offsets.append(offsets[-1] + len(entry))
+
+    tmp = f"{path}.tmp"
+
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(ordered)))
+        offsets.tofile(f)
+        for entry in ordered:
+            f.write(entry)
+
+    os.replace(tmp, path)
+    return len(ordered)
+
+
+class DomainSet:
+    """
+    A compiled blocklist, memory-mapped so hundreds of thousands of entries
+    cost no Python objects and are shared with the page cache.
+
+    Lookups binary search the sorted reversed domains once per label of the
+    host, so "a.b.evil.com" is found by an "evil.com" entry.
+    """
+
+    __slots__ = ("_mm", "_offsets", "_start", "size")
+
+    def __init__(self, path: Optional[str] = None):
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets: Sequence[int] = ()
+        self._start = 0
+        self.size = 0
+
+        if path is None:
+            return
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= HEADER.size:
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(mm)
+
+        if magic != MAGIC:
+            mm.close()
+            raise ValueError(f"{path} is not a compiled domain blocklist")
+
+        self._start = HEADER.size + 4 * (count + 1)
+        self._offsets = memoryview(mm)[HEADER.size : self._start].cast("I")
+        self._mm = mm
+        self.size = count
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, reversed_domain: bytes) -> bool:
+        mm, offsets, start = self._mm, self._offsets, self._start
+        lo, hi = 0, self.size
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = mm[start + offsets[mid] : start + offsets[mid + 1]]  # type: ignore
+
+            if entry < reversed_domain:
+                lo = mid + 1
+            elif entry == reversed_domain:
+                return True
+            else:
+                hi = mid
+
+        return False
+
+    def match(self, host: str) -> Optional[str]:
+        """Returns the blocked domain covering the host, if any."""
+
+        if not self.size:
+            return None
+
+        labels = host.lower().rstrip(".").split(".")
+        key = b""
+
+        for label in reversed(labels):
+            key = key + b"." + label.encode() if key else label.encode()
+
+            # The TLD alone is never listed
+            if b"." in key and key in self:
+                return ".".join(reversed(key.decode().split(".")))
+
+        return None
+
+
+def extract_hosts(text: str, urls: Sequence[str]) -> Iterator[str]:
+    """Hosts of the message's links, with or without a scheme."""
+
+    seen = set()
+
+    for url in urls:
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            continue
+
+        if not host or host in seen:
+            continue
+
+        seen.add(host)
+
+        # Lists hold IDNs in their ASCII (punycode) form
+        try:
+            yield host.encode("idna").decode()
+        except UnicodeError:
+            yield host
+
+    for match in DOMAIN_REGEX.finditer(text):
+        host = match.group(1).lower()
+
+        if host not in seen:
+            seen.add(host)
+            yield host
+
+
+class DomainBlocklist:
+    """
+    The bot's domain blocklist, compiled from the `*.txt` lists in
+    `directory` into `directory/compiled.bin`.
+
+    Once started it recompiles in a thread whenever a list changes and swaps the
+    new set in once it is mapped, so messages keep being checked against
+    the old one until then. The lists a compiled file was built from are
+    recorded next to it, it is only reused at startup if they are the same.
+    """
+
+    def __init__(self, directory: str, interval: float = 60.0):
+        self.directory = directory
+        self.path = os.path.join(directory, "compiled.bin")
+        self.manifest_path = f"{self.path}.sources"
+        self.interval = interval
+        self.domains = DomainSet()
+        # (list file, modification time, size) of each list in the loaded set
+        self._state: Tuple[Tuple[str, int, int], ...] = ()
+        self._task: Optional[asyncio.Task] = None
+        # The watcher and the reload command must not compile at the same time
+        self._lock = asyncio.Lock()
+
+        self.reloads = 0
+        self.hits = 0
+
+    def match(self, host: str) -> Optional[str]:
+        domain = self.domains.match(host)
+
+        if domain is not None:
+            self.hits += 1
+
+        return domain
+
+    def _sources(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        return sorted(
+            os.path.join(self.directory, n) for n in names if n.endswith(".txt")
+        )
+
+    def _read_manifest(self) -> Optional[Tuple[Tuple[str, int, int], ...]]:
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return tuple(tuple(entry) for entry in json.load(f))  # type: ignore
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write_manifest(self, state: Tuple[Tuple[str, int, int], ...]) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+        os.replace(tmp, self.manifest_path)
+
+    def _build(self, force: bool) -> Optional[DomainSet]:
+        sources = self._sources()
+        stats = [os.stat(s) for s in sources]
+        state = tuple(
+            (os.path.basename(s), st.st_mtime_ns, st.st_size)
+            for s, st in zip(sources, stats)
+        )
+
+        if not force and state == self._state:
+            return None
+
+        if not sources:
+            self._state = state
+            return DomainSet()
+
+        # At startup the compiled file is reused if it was built from these lists
+        if force or self._state or self._read_manifest() != state:
+            # A crash between the two writes leaves no manifest, so no reuse
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.manifest_path)
+
+            count = compile_lists(sources, self.path)
+            self._write_manifest(state)
+            logger.info(f"Compiled {count} blocked domains from {len(sources)} lists")
+
+        domains = DomainSet(self.path)
+        self._state = state
+        return domains
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Rebuilds the set if a list changed, or always with `force`. Returns
+        whether a new set was swapped in.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            try:
+                domains = await loop.run_in_executor(None, self._build, force)
+            except (OSError, ValueError):
+                logger.exception("Failed to load the domain blocklist")
+                return False
+
+        if domains is None:
+            return False
+
+        self.domains = domains
+        self.reloads += 1
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.reload()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,218 @@
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import discord
+import numpy as np
+
+from .features import extract
+
+WORD_REGEX = re.compile(r"\w+")
+
+SHINGLE = 4
+
+# SimHash split into 8 bands of 8 bits. Two hashes within 7 bits of each
+# other always share at least one band exactly, so a band lookup finds them.
+# A band value is shared by many unrelated clusters too, each key maps to all
+# of them and the candidates are compared in full.
+BANDS = 8
+BAND_BITS = 8
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_DISTANCE = 7
+
+# (received at, channel ID, user ID, message ID)
+Hit = Tuple[float, int, int, int]
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash over character shingles of the text's words, ignoring
+    case and punctuation. None if the text has no words.
+    """
+
+    text = " ".join(WORD_REGEX.findall(text.casefold()))
+
+    if not text:
+        return None
+
+    shingles = [text[i : i + SHINGLE] for i in range(max(len(text) - SHINGLE + 1, 1))]
+    hashes = np.array(
+        [hash(s) & 0xFFFFFFFFFFFFFFFF for s in shingles], dtype=np.uint64
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+
+    return int.from_bytes(np.packbits(majority).tobytes(), "little")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class Cluster:
+    __slots__ = ("fingerprint", "hits", "flagged_until")
+
+    def __init__(self, fingerprint: int, max_hits: int):
+        self.fingerprint = fingerprint
+        self.hits: Deque[Hit] = deque(maxlen=max_hits)
+        self.flagged_until = 0.0
+
+
+class GuildWindow:
+    """Recent content clusters of one guild, least recently hit first."""
+
+    __slots__ = ("clusters", "bands", "next_id")
+
+    def __init__(self):
+        self.clusters: "OrderedDict[int, Cluster]" = OrderedDict()
+        # (band index, band value) -> IDs of the clusters with that band
+        self.bands: Dict[Tuple[int, int], Set[int]] = {}
+        self.next_id = 0
+
+
+class DuplicateDetector:
+    """
+    Finds the same or nearly the same message posted across channels/users.
+
+    Messages are fingerprinted with SimHash and grouped into clusters found
+    through band lookups, so recording is O(1). Each guild keeps at most
+    `max_clusters` clusters, each holding its hits from the last `window`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        window: float = 30.0,
+        min_length: int = 20,
+        max_clusters: int = 1000,
+        max_hits: int = 50,
+        max_guilds: int = 5000,
+    ):
+        self.window = window
+        self.min_length = min_length
+        self.max_clusters = max_clusters
+        self.max_hits = max_hits
+        self.max_guilds = max_guilds
+        self._guilds: "OrderedDict[int, GuildWindow]" = OrderedDict()
+
+    def record(
+        self, msg: discord.Message, threshold: int = 4
+    ) -> Optional[Dict[int, List[int]]]:
+        """
+        Records the message. Once similar content was posted `threshold`
+        times within `window` seconds by more than one user or in more than
+        one channel, returns the message IDs of those posts grouped by channel.
+        Further copies are returned one by one until the window passes.
+        """
+
+        # Short messages ("lol", "gm") repeat naturally
+        if len(msg.content) < self.min_length:
+            return None
+
+        # Normalized, so swapping in look-alike letters doesn't dodge it
+        fingerprint = simhash(extract(msg).normalized)
+        if fingerprint is None:
+            return None
+
+        now = time.monotonic()
+        guild = self._get_guild(msg.guild.id)  # type: ignore
+        cluster = self._find_cluster(guild, fingerprint)
+
+        hit = (now, msg.channel.id, msg.author.id, msg.id)
+
+        if cluster.flagged_until > now:
+            cluster.flagged_until = now + self.window
+            return {msg.channel.id: [msg.id]}
+
+        hits = cluster.hits
+        hits.append(hit)
+
+        while now - hits[0][0] >= self.window:
+            hits.popleft()
+
+        self._evict(guild, now)
+
+        if len(hits) < threshold:
+            return None
+
+        if len({h[1] for h in hits}) < 2 and len({h[2] for h in hits}) < 2:
+            # One user in one channel, that's message_spam's job
+            return None
+
+        cluster.flagged_until = now + self.window
+
+        recent: Dict[int, List[int]] = {}
+        for _, channel_id, _, message_id in hits:
+            recent.setdefault(channel_id, []).append(message_id)
+
+        hits.clear()
+        return recent
+
+    def _get_guild(self, guild_id: int) -> GuildWindow:
+        guild = self._guilds.get(guild_id)
+
+        if guild is None:
+            guild = self._guilds[guild_id] = GuildWindow()
+
+            while len(self._guilds) > self.max_guilds:
+                self._guilds.popitem(last=False)
+        else:
+            self._guilds.move_to_end(guild_id)
+
+        return guild
+
+    def _find_cluster(self, guild: GuildWindow, fingerprint: int) -> Cluster:
+        keys = [
+            (i, (fingerprint >> (i * BAND_BITS)) & BAND_MASK) for i in range(BANDS)
+        ]
+
+        best_id, best_distance = None, MAX_DISTANCE + 1
+        seen: Set[int] = set()
+
+        for key in keys:
+            for cluster_id in guild.bands.get(key, ()):
+                if cluster_id in seen:
+                    continue
+
+                seen.add(cluster_id)
+                distance = hamming(guild.clusters[cluster_id].fingerprint, fingerprint)
+
+                if distance < best_distance:
+                    best_id, best_distance = cluster_id, distance
+
+        if best_id is not None:
+            guild.clusters.move_to_end(best_id)
+            return guild.clusters[best_id]
+
+        cluster_id = guild.next_id
+        guild.next_id += 1
+
+        cluster = guild.clusters[cluster_id] = Cluster(fingerprint, self.max_hits)
+        for key in keys:
+            guild.bands.setdefault(key, set()).add(cluster_id)
+
+        return cluster
+
+    def _evict(self, guild: GuildWindow, now: float) -> None:
+        clusters = guild.clusters
+
+        while clusters:
+            cluster_id, cluster = next(iter(clusters.items()))
+
+            last = cluster.hits[-1][0] if cluster.hits else float("-inf")
+            idle = now - last >= self.window and cluster.flagged_until <= now
+
+            if not idle and len(clusters) <= self.max_clusters:
+                break
+
+            del clusters[cluster_id]
+
+            fp = cluster.fingerprint
+            for i in range(BANDS):
+                key = (i, (fp >> (i * BAND_BITS)) & BAND_MASK)
+                ids = guild.bands.get(key)
+                if ids is not None:
+                    ids.discard(cluster_id)
+                    if not ids:
+                        del guild.bands[key]
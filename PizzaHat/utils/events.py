@@ -3,7 +3,6 @@ import os
 from typing import List, Union
 
 import discord
-from async_lru import alru_cache
 from cogs.utility import format_date
 from core.bot import PizzaHat
 from core.cog import Cog
@@ -23,36 +22,13 @@ class Events(Cog):
         self.bot: PizzaHat = bot
         # bot.loop.create_task(self.update_stats())
 
-    @alru_cache()
     async def get_logs_channel(self, guild_id: int) -> Union[discord.TextChannel, None]:
-        return (
-            await self.bot.db.fetchval(
-                "SELECT channel_id FROM modlogs WHERE guild_id=$1", guild_id
-            )
-            if self.bot.db
-            else None
-        )
+        config = await self.bot.settings.get(guild_id)
 
-    @alru_cache()
-    async def get_starboard_config(self, guild_id: int) -> Union[dict, None]:
-        data = (
-            await self.bot.db.fetchrow(
-                "SELECT channel_id, star_count, self_star FROM star_config WHERE guild_id=$1",
-                guild_id,
-            )
-            if self.bot.db
-            else None
-        )
+        if config.modlogs_channel_id is None:
+            return None
 
-        return (
-            {
-                "channel_id": data["channel_id"],
-                "star_count": data["star_count"],
-                "self_star": data["self_star"],
-            }
-            if data
-            else None
-        )
+        return self.bot.get_channel(config.modlogs_channel_id)  # type: ignore
 
     # @tasks.loop(hours=24)
     # async def update_stats(self):
@@ -76,54 +52,6 @@ class Events(Cog):
     #     except Exception as e:
     #         print(e)
 
-    @Cog.listener()
-    async def on_ready(self):
-        if self.bot.db is not None:
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS afk 
-                (guild_id BIGINT, user_id BIGINT, reason TEXT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS warnlogs 
-                (id SERIAL PRIMARY KEY, guild_id BIGINT, user_id BIGINT, mod_id BIGINT, reason TEXT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS modlogs 
-                (guild_id BIGINT PRIMARY KEY, channel_id BIGINT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS automod 
-                (guild_id BIGINT PRIMARY KEY, enabled BOOL DEFAULT false)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS antialt 
-                (guild_id BIGINT PRIMARY KEY, enabled BOOL DEFAULT false, min_age INT, restricted_role BIGINT, level INT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS staff_role 
-                (guild_id BIGINT PRIMARY KEY, role_id BIGINT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS tags 
-                (guild_id BIGINT PRIMARY KEY, tag_name TEXT, content TEXT, creator BIGINT)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS star_config 
-                (guild_id BIGINT PRIMARY KEY, channel_id BIGINT, star_count INT DEFAULT 5, self_star BOOL DEFAULT true)"""
-            )
-
-            await self.bot.db.execute(
-                """CREATE TABLE IF NOT EXISTS star_info 
-                (guild_id BIGINT, user_msg_id BIGINT PRIMARY KEY, bot_msg_id BIGINT)"""
-            )
-
     # ====== MESSAGE LOGS ======
 
     @Cog.listener()
@@ -172,7 +100,7 @@ class Events(Cog):
         )
         em.set_footer(text=f"User ID: {before.author.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "message_edit", after.id, after.edited_at)
 
     @Cog.listener()
     async def on_message_delete(self, msg: discord.Message):
@@ -196,7 +124,7 @@ class Events(Cog):
         )
         em.set_footer(text=f"User ID: {msg.author.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "message_delete", msg.id, msg.created_at)
 
     @Cog.listener()
     async def on_bulk_message_delete(self, msgs: List[discord.Message]):
@@ -219,7 +147,9 @@ class Events(Cog):
         )
         em.set_footer(text=f"User ID: {msgs[0].author.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(
+            channel, em, "bulk_message_delete", msgs[0].id, msgs[0].created_at
+        )
 
     # ====== MEMBER LOGS ======
 
@@ -241,7 +171,7 @@ class Events(Cog):
         em.set_author(name=user, icon_url=user.avatar.url if user.avatar else None)
         em.set_footer(text=f"User ID: {user.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "member_ban", user.id)
 
     @Cog.listener()
     async def on_member_unban(self, guild: discord.Guild, user: discord.User):
@@ -260,7 +190,7 @@ class Events(Cog):
         em.set_author(name=user, icon_url=user.avatar.url if user.avatar else None)
         em.set_footer(text=f"User ID: {user.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "member_unban", user.id)
 
     @Cog.listener(name="on_member_update")
     async def member_role_update(self, before: discord.Member, after: discord.Member):
@@ -302,7 +232,7 @@ class Events(Cog):
         )
         em.set_footer(text=f"ID: {after.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "member_roles_update", after.id)
 
     @Cog.listener(name="on_member_update")
     async def member_nickname_update(
@@ -328,7 +258,7 @@ class Events(Cog):
         )
         em.set_footer(text=f"ID: {after.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "member_nick_update", after.id)
 
     # ====== ROLE LOGS ======
 
@@ -348,7 +278,7 @@ class Events(Cog):
         em.add_field(name="Color", value=role.color, inline=False)
         em.set_footer(text=f"Role ID: {role.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "role_create", role.id, role.created_at)
 
     @Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role):
@@ -366,7 +296,7 @@ class Events(Cog):
         em.add_field(name="Color", value=role.color, inline=False)
         em.set_footer(text=f"Role ID: {role.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "role_delete", role.id)
 
     @Cog.listener(name="on_guild_role_update")
     async def guild_role_update(self, before: discord.Role, after: discord.Role):
@@ -433,7 +363,7 @@ class Events(Cog):
 
         em.set_footer(text=f"Role ID: {before.id}")
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "role_update", after.id)
 
     # ===== GUILD LOGS =====
 
@@ -540,7 +470,7 @@ class Events(Cog):
                 inline=False,
             )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "guild_update", after.id)
 
     @Cog.listener()
     async def on_guild_emojis_update(
@@ -604,7 +534,7 @@ class Events(Cog):
                 inline=False,
             )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "emojis_update", guild.id)
 
     @Cog.listener()
     async def on_guild_stickers_update(
@@ -658,7 +588,7 @@ class Events(Cog):
                 inline=False,
             )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "stickers_update", guild.id)
 
     @Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
@@ -699,6 +629,7 @@ class Events(Cog):
             if self.bot.db
             else None
         )
+        self.bot.settings.invalidate(guild.id)
 
         channel = self.bot.get_channel(LOG_CHANNEL)
         await channel.send(f"Left {guild.name}")  # type: ignore
@@ -735,7 +666,7 @@ class Events(Cog):
             ),
         )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "integration_create", integration.id)
 
     @Cog.listener()
     async def on_integration_update(self, integration: discord.Integration):
@@ -767,7 +698,7 @@ class Events(Cog):
             ),
         )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "integration_update", integration.id)
 
     @Cog.listener()
     async def on_raw_integration_delete(
@@ -797,7 +728,7 @@ class Events(Cog):
                 icon_url=(guild.icon.url if guild.icon else None),
             )
 
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "integration_delete", payload.integration_id)
 
     # ====== GUILD AUTOMOD LOGS ======
     @Cog.listener()
@@ -823,7 +754,7 @@ class Events(Cog):
         """
 
         em.set_thumbnail(url=rule.guild.icon.url if rule.guild.icon else None)
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "automod_rule_create", rule.id)
 
     @Cog.listener()
     async def on_automod_rule_update(self, rule: discord.AutoModRule):
@@ -848,7 +779,7 @@ class Events(Cog):
         """
 
         em.set_thumbnail(url=rule.guild.icon.url if rule.guild.icon else None)
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "automod_rule_update", rule.id)
 
     @Cog.listener()
     async def on_automod_rule_delete(self, rule: discord.AutoModRule):
@@ -873,7 +804,7 @@ class Events(Cog):
         """
 
         em.set_thumbnail(url=rule.guild.icon.url if rule.guild.icon else None)
-        await channel.send(embed=em)
+        self.bot.modlog.send(channel, em, "automod_rule_delete", rule.id)
 
     @Cog.listener()
     async def on_automod_action(self, execution: discord.AutoModAction):
@@ -901,252 +832,53 @@ class Events(Cog):
         """
 
         em.set_thumbnail(url=execution.guild.icon.url if execution.guild.icon else None)
-        await channel.send(embed=em)
-
-    # ====== STARBOARD REACTION EVENTS ======
-
-    @Cog.listener(name="on_raw_reaction_add")
-    async def starboard_reaction_add(self, payload: discord.RawReactionActionEvent):
-        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
-        channel = guild.get_channel(payload.channel_id) if guild else None
-        message = await channel.fetch_message(payload.message_id)  # type: ignore
+        self.bot.modlog.send(
+            channel, em, "automod_action", execution.message_id or execution.user_id
+        )
 
-        if message.author.bot or payload.emoji.name != "⭐":
+    # ====== MEMBER PING - AFK EVENT ======
+    @Cog.listener(name="on_message")
+    async def member_ping_in_afk(self, msg: discord.Message):
+        if msg.guild is None or msg.author.bot:
             return
 
-        starboard_config = await self.get_starboard_config(guild.id) if guild else None
-
-        if starboard_config is not None:
-            star_channel = (
-                guild.get_channel(starboard_config["channel_id"]) if guild else None
-            )
-
-            if not star_channel:
-                return
+        afk_members = self.bot.afk.get_guild(msg.guild.id)
 
-            star_count = starboard_config["star_count"]
-            self_star = starboard_config["self_star"]
-
-            for reaction in message.reactions:
-                if reaction.count >= star_count:
-                    if not self_star:
-                        if message.author == payload.member:
-                            return await message.remove_reaction(payload.emoji, payload.member)  # type: ignore
-
-                    em = discord.Embed(
-                        description=message.content,
-                        color=discord.Color.blurple(),
-                        timestamp=datetime.datetime.now(),
-                    )
-                    em.set_footer(text=f"Message ID: {message.id}")
-
-                    em.add_field(
-                        name="Source",
-                        value=f"[Jump to message!]({message.jump_url})",
-                        inline=False,
-                    )
-
-                    for sticker in message.stickers:
-                        em.add_field(
-                            name=f"Sticker: `{sticker.name}`",
-                            value=f"ID: [`{sticker.id}`]({sticker.url})",
-                        )
-                    if len(message.stickers) == 1:
-                        em.set_thumbnail(url=message.stickers[0].url)
-
-                    em.set_author(
-                        name=message.author.name,
-                        icon_url=(
-                            message.author.avatar.url if message.author.avatar else None
-                        ),
-                    )
-                    em.set_image(
-                        url=(
-                            message.attachments[0].url if message.attachments else None
-                        )
-                    )
-
-                    try:
-                        em_id = (
-                            await self.bot.db.fetchval(
-                                "SELECT bot_msg_id FROM star_info WHERE guild_id=$1 AND user_msg_id=$2",
-                                guild.id,
-                                payload.message_id,
-                            )
-                            if self.bot.db and guild
-                            else None
-                        )
-
-                        if em_id is not None:
-                            star_embed = await star_channel.fetch_message(em_id)  # type: ignore
-                            await star_embed.edit(content=f"⭐ **{reaction.count}** | {channel.mention}", embed=em)  # type: ignore
-
-                        else:
-                            star_embed = await star_channel.send(content=f"⭐ **{reaction.count}** | {channel.mention}", embed=em)  # type: ignore
-                        (
-                            await self.bot.db.execute(
-                                "INSERT INTO star_info (guild_id, user_msg_id, bot_msg_id) VALUES ($1, $2, $3) ON CONFLICT ON CONSTRAINT star_info_pkey DO NOTHING",
-                                guild.id,
-                                payload.message_id,
-                                star_embed.id,
-                            )
-                            if guild and self.bot.db
-                            else None
-                        )
-
-                    except discord.NotFound:
-                        pass
-                    except discord.Forbidden:
-                        pass
-                    except Exception as e:
-                        print(f"Error in starboard reaction add: {e}")
-
-    @Cog.listener(name="on_raw_reaction_remove")
-    async def starboard_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
-        channel = guild.get_channel(payload.channel_id) if guild else None
-        message = await channel.fetch_message(payload.message_id)  # type: ignore
-
-        if message.author.bot or payload.emoji.name != "⭐":
+        if not afk_members:
             return
 
-        starboard_config = await self.get_starboard_config(guild.id) if guild else None
-
-        if starboard_config is not None:
-            star_channel = (
-                guild.get_channel(starboard_config["channel_id"]) if guild else None
-            )
-
-            if not star_channel:
-                return
-
-            star_count = starboard_config["star_count"]
-            self_star = starboard_config["self_star"]
-
-            em_id = (
-                await self.bot.db.fetchval(
-                    "SELECT bot_msg_id FROM star_info WHERE guild_id=$1 AND user_msg_id=$2",
-                    guild.id,
-                    payload.message_id,
-                )
-                if self.bot.db and guild
-                else None
-            )
-
-            try:
-                for reaction in message.reactions:
-                    if reaction.count == 0:
-                        msg = await star_channel.fetch_message(em_id)  # type:ignore
-                        await msg.delete()
-                        (
-                            await self.bot.db.execute(
-                                "DELETE FROM star_info WHERE guild_id=$1 AND bot_msg_id=$2",
-                                guild.id,
-                                em_id,
-                            )
-                            if self.bot.db and guild
-                            else None
-                        )
-
-                    elif reaction.count < star_count:
-                        if not self_star:
-                            if message.author == payload.member:
-                                return await message.remove_reaction(payload.emoji, payload.member)  # type: ignore
-
-                        star_embed = await star_channel.fetch_message(em_id)  # type: ignore
-                        await star_embed.edit(content=f"⭐ **{reaction.count}** | {channel.mention}")  # type: ignore
-
-            except discord.NotFound:
-                pass
-            except discord.Forbidden:
-                pass
-            except Exception as e:
-                print(f"Error in starboard reaction remove: {e}")
-
-    @Cog.listener(name="on_message_delete")
-    async def starred_msg_delete(self, msg: discord.Message):
-        guild = msg.guild
-        starboard_config = await self.get_starboard_config(guild.id) if guild else None
-        star_info = (
-            await self.bot.db.fetchrow(
-                "SELECT user_msg_id, bot_msg_id FROM star_info WHERE guild_id=$1",
-                guild.id,
-            )
-            if self.bot.db and guild
-            else None
-        )
+        author_afk = afk_members.get(msg.author.id)
 
-        if starboard_config is not None:
-            star_channel = (
-                guild.get_channel(starboard_config["channel_id"]) if guild else None
+        # Ignore the message that set the AFK status in the first place
+        if author_afk is not None and msg.created_at > author_afk.since:
+            await self.bot.afk.remove(msg.guild.id, msg.author.id)
+            await msg.channel.send(
+                f"Welcome back {msg.author.mention}, I removed your AFK status.",
+                delete_after=5,
             )
 
-            if not star_channel:
-                return
-
-            if star_info is not None:
-                try:
-                    em_id = (
-                        await self.bot.db.fetchval(
-                            "SELECT bot_msg_id FROM star_info WHERE guild_id=$1 AND user_msg_id=$2",
-                            guild.id,
-                            msg.id,
-                        )
-                        if self.bot.db and guild
-                        else None
-                    )
-
-                    star_embed = await star_channel.fetch_message(em_id)  # type: ignore
-                    await star_embed.delete()
-                    (
-                        await self.bot.db.execute(
-                            "DELETE FROM star_info WHERE guild_id=$1 AND bot_msg_id=$2",
-                            guild.id,
-                            em_id,
-                        )
-                        if self.bot.db and guild
-                        else None
-                    )
-
-                except discord.NotFound:
-                    pass
-                except discord.Forbidden:
-                    pass
-                except Exception as e:
-                    print(f"Error in starboard msg delete event: {e}")
+        if not isinstance(msg.channel, discord.TextChannel):
+            return
 
-    # ====== MEMBER PING - AFK EVENT ======
-    @Cog.listener(name="on_message")
-    async def member_ping_in_afk(self, msg: discord.Message):
-        data = (
-            await self.bot.db.fetch(
-                "SELECT user_id, reason FROM afk WHERE guild_id=$1", msg.guild.id
-            )
-            if self.bot.db and msg.guild
-            else None
-        )
+        for user in msg.mentions:
+            entry = afk_members.get(user.id)
 
-        if data is not None:
-            user = await msg.guild.fetch_member(data[0]) if msg.guild else None
-            reason = data[1]
+            if entry is None or user == msg.author:
+                continue
 
             em = discord.Embed(
                 title="Member AFK",
-                description=f"{user} is AFK\n**Reason:** {reason}",
+                description=f"{user} is AFK\n**Reason:** {entry.reason}",
                 color=discord.Color.og_blurple(),
                 timestamp=msg.created_at,
             )
-            em.set_author(
-                name=user, url=user.avatar.url if user and user.avatar else None
-            )
+            em.set_author(name=user, url=user.avatar.url if user.avatar else None)
             em.set_footer(
                 text=msg.author,
                 icon_url=msg.author.avatar.url if msg.author.avatar else None,
             )
 
-            if isinstance(msg.channel, discord.TextChannel):
-                await msg.channel.send(embed=em)
-
+            await msg.channel.send(embed=em)
 
 async def setup(bot):
     await bot.add_cog(Events(bot))
@@ -0,0 +1,158 @@
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+import discord
+
+from .normalize import normalize
+
+_EMOJI = (
+    "\U0001F300-\U0001F5FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF"
+    "\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF"
+)
+
+# One scan picks up every token the automod rules care about
+TOKEN_REGEX = re.compile(
+    r"(?P<custom_emoji><a?:\w{2,32}:\d{15,21}>)"
+    r"|(?P<invite>(?:https?://)?(?:www\.)?discord(?:\.(?:gg|io|me)/|app\.com/invite/)(?P<code>[\w-]+))"
+    r"|(?P<url>https?://[^\s<>]+)"
+    r"|(?P<flag>[\U0001F1E6-\U0001F1FF]{2})"
+    rf"|(?P<emoji>[{_EMOJI}][\uFE0F\U0001F3FB-\U0001F3FF]?(?:\u200D[{_EMOJI}][\uFE0F\U0001F3FB-\U0001F3FF]?)*)",
+    re.IGNORECASE,
+)
+
+
+class ContentScan(NamedTuple):
+    """The content-only part of the features, picklable for the check pool."""
+
+    length: int
+    upper: int
+    cased: int
+    combining_marks: int
+    emojis: int
+    custom_emojis: int
+    invite_codes: List[str]
+    urls: List[str]
+    normalized: str  # see utils.normalize, what text rules match against
+
+
+def scan(content: str) -> ContentScan:
+    upper = lower = marks = 0
+
+    for ch in content:
+        if ch.isupper():
+            upper += 1
+        elif ch.islower():
+            lower += 1
+        elif unicodedata.combining(ch):
+            marks += 1
+
+    emoji_count = custom_emojis = 0
+    invite_codes: List[str] = []
+    urls: List[str] = []
+
+    for match in TOKEN_REGEX.finditer(content):
+        kind = match.lastgroup
+
+        if kind == "custom_emoji":
+            custom_emojis += 1
+        elif kind == "invite":
+            invite_codes.append(match.group("code"))
+            urls.append(match.group("invite"))
+        elif kind == "url":
+            urls.append(match.group("url"))
+        else:
+            emoji_count += 1
+
+    return ContentScan(
+        len(content),
+        upper,
+        upper + lower,
+        marks,
+        emoji_count,
+        custom_emojis,
+        invite_codes,
+        urls,
+        normalize(content),
+    )
+
+
+class MessageFeatures:
+    """Everything automod needs from a message's content, computed once."""
+
+    __slots__ = (
+        "length",
+        "upper",
+        "cased",
+        "combining_marks",
+        "emojis",
+        "custom_emojis",
+        "invite_codes",
+        "urls",
+        "normalized",
+        "mentions",
+        "role_mentions",
+        "mention_everyone",
+    )
+
+    def __init__(self, msg: discord.Message, scanned: Optional[ContentScan] = None):
+        if scanned is None:
+            scanned = scan(msg.content)
+
+        (
+            self.length,
+            self.upper,
+            self.cased,
+            self.combining_marks,
+            self.emojis,
+            self.custom_emojis,
+            self.invite_codes,
+            self.urls,
+            self.normalized,
+        ) = scanned
+
+        self.mentions = len(msg.raw_mentions)
+        self.role_mentions = len(msg.raw_role_mentions)
+        self.mention_everyone = msg.mention_everyone
+
+    @property
+    def caps_ratio(self) -> float:
+        return self.upper / self.length if self.length else 0.0
+
+    @property
+    def combining_density(self) -> float:
+        return self.combining_marks / self.length if self.length else 0.0
+
+    @property
+    def total_emojis(self) -> int:
+        return self.emojis + self.custom_emojis
+
+
+_cache: "OrderedDict[int, Tuple[str, MessageFeatures]]" = OrderedDict()
+_CACHE_SIZE = 512
+
+
+def extract(msg: discord.Message) -> MessageFeatures:
+    """
+    Returns the features of a message, so every rule in the pipeline shares
+    one scan. Recomputed if the content changed since (edits).
+    """
+
+    cached = _cache.get(msg.id)
+
+    if cached is not None and cached[0] == msg.content:
+        return cached[1]
+
+    return store(msg, MessageFeatures(msg))
+
+
+def store(msg: discord.Message, features: MessageFeatures) -> MessageFeatures:
+    """Caches features computed elsewhere (the check pool) for `extract`."""
+
+    _cache[msg.id] = (msg.content, features)
+
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+
+    return features
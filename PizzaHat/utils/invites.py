@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
+
+import discord
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+
+class InviteResolver:
+    """
+    Resolves invite codes to the guild they point to.
+
+    Results are cached for `ttl` seconds, unknown codes for `negative_ttl`,
+    and concurrent lookups of the same code share one request. A guild's own
+    invites are loaded once and kept current from invite events, so links
+    back to the guild itself never need a fetch.
+    """
+
+    def __init__(
+        self,
+        bot: "PizzaHat",
+        ttl: float = 3600.0,
+        negative_ttl: float = 600.0,
+        max_size: int = 10000,
+    ):
+        self.bot = bot
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # code -> (expires at, guild ID or None if unknown)
+        self._cache: "OrderedDict[str, Tuple[float, Optional[int]]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        # guild ID -> its own invite codes
+        self._own: Dict[int, Set[str]] = {}
+        self._own_pending: Dict[int, asyncio.Task] = {}
+
+        self.hits = 0
+        self.fetches = 0
+
+    async def is_foreign(self, guild: discord.Guild, code: str) -> bool:
+        """Whether the invite points to a guild other than this one."""
+
+        if code == guild.vanity_url_code:
+            return False
+
+        if guild.id not in self._own:
+            await self.load_guild(guild)
+
+        if code in self._own.get(guild.id, ()):
+            return False
+
+        guild_id = await self.resolve(code)
+        return guild_id is not None and guild_id != guild.id
+
+    async def resolve(self, code: str) -> Optional[int]:
+        """Returns the ID of the guild the invite points to, if it has one."""
+
+        cached = self._cache.get(code)
+
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.hits += 1
+                self._cache.move_to_end(code)
+                return cached[1]
+
+            del self._cache[code]
+
+        pending = self._pending.get(code)
+
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[code] = future
+
+        try:
+            guild_id = await self._fetch(code)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so a lone lookup doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(guild_id)
+            return guild_id
+        finally:
+            del self._pending[code]
+
+    async def _fetch(self, code: str) -> Optional[int]:
+        self.fetches += 1
+
+        try:
+            invite = await self.bot.fetch_invite(code, with_counts=False)
+        except discord.NotFound:
+            self._store(code, None, self.negative_ttl)
+            return None
+
+        guild_id = invite.guild.id if invite.guild is not None else None
+        self._store(code, guild_id, self.ttl)
+        return guild_id
+
+    def _store(self, code: str, guild_id: Optional[int], ttl: float) -> None:
+        self._cache[code] = (time.monotonic() + ttl, guild_id)
+
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def load_guild(self, guild: discord.Guild) -> None:
+        """Loads the guild's own invites, needs Manage Server."""
+
+        task = self._own_pending.get(guild.id)
+
+        if task is None:
+            task = self._own_pending[guild.id] = asyncio.create_task(
+                self._load_guild(guild)
+            )
+
+        await asyncio.shield(task)
+
+    async def _load_guild(self, guild: discord.Guild) -> None:
+        try:
+            invites = await guild.invites()
+        except discord.HTTPException:
+            # Missing permissions, fall back to resolving codes one by one
+            invites = []
+        finally:
+            self._own_pending.pop(guild.id, None)
+
+        self._own[guild.id] = {i.code for i in invites}
+
+    def add(self, invite: discord.Invite) -> None:
+        if invite.guild is None:
+            return
+
+        codes = self._own.get(invite.guild.id)
+        if codes is not None:
+            codes.add(invite.code)
+
+        self._store(invite.code, invite.guild.id, self.ttl)
+
+    def remove(self, invite: discord.Invite) -> None:
+        if invite.guild is not None:
+            self._own.get(invite.guild.id, set()).discard(invite.code)
+
+        # Deleted invites resolve to nothing from now on
+        self._store(invite.code, None, self.negative_ttl)
+
+    def forget_guild(self, guild_id: int) -> None:
+        self._own.pop(guild_id, None)
@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+from core.bot import PizzaHat
+from core.cog import Cog
+from core.settings import GuildConfig
+
+# A raid is RAID_JOINS joins within RAID_WINDOW seconds, unless the guild set its own
+RAID_JOINS = int(os.getenv("RAID_JOINS", 10))
+RAID_WINDOW = float(os.getenv("RAID_WINDOW", 10))
+# Seconds a lockdown lasts after the last raid join
+LOCKDOWN_DURATION = float(os.getenv("LOCKDOWN_DURATION", 600))
+# Seconds to collect actions before running them together
+ACTION_INTERVAL = 1.0
+
+# antialt.level
+RESTRICT = 1
+KICK = 2
+BAN = 3
+
+# Discord's bulk ban limit
+MAX_BULK_BAN = 200
+
+
+class JoinGate(Cog):
+    """Anti-alt checks and raid lockdown for new members."""
+
+    def __init__(self, bot: PizzaHat, max_concurrency: int = 5):
+        self.bot: PizzaHat = bot
+        # guild ID -> (joined at, member ID) of recent joins
+        self._joins: Dict[int, Deque[Tuple[float, int]]] = {}
+        # guild ID -> monotonic time the lockdown ends
+        self._lockdowns: Dict[int, float] = {}
+        # guild ID -> member ID -> (level, member)
+        self._pending: Dict[int, Dict[int, Tuple[int, discord.Member]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def cog_unload(self) -> None:
+        for task in self._workers.values():
+            task.cancel()
+
+    def in_lockdown(self, guild_id: int) -> bool:
+        until = self._lockdowns.get(guild_id)
+
+        if until is None:
+            return False
+
+        if until <= time.monotonic():
+            del self._lockdowns[guild_id]
+            return False
+
+        return True
+
+    def lift_lockdown(self, guild_id: int) -> bool:
+        self._joins.pop(guild_id, None)
+        return self._lockdowns.pop(guild_id, None) is not None
+
+    def record_join(
+        self, member: discord.Member, raid_joins: int, raid_window: float
+    ) -> Optional[List[int]]:
+        """
+        Adds the join to the guild's window. Returns the IDs of the joins in
+        the window when they add up to a raid.
+        """
+
+        now = time.monotonic()
+        joins = self._joins.get(member.guild.id)
+
+        if joins is None or joins.maxlen != raid_joins:
+            joins = self._joins[member.guild.id] = deque(joins or (), maxlen=raid_joins)
+
+        joins.append((now, member.id))
+
+        if len(joins) < raid_joins or now - joins[0][0] >= raid_window:
+            return None
+
+        return [member_id for _, member_id in joins]
+
+    @Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        if member.bot:
+            return
+
+        guild = member.guild
+        config = await self.bot.settings.get(guild.id)
+
+        if not config.antialt_enabled:
+            return
+
+        raid_joins = config.antialt_raid_joins or RAID_JOINS
+        raid_window = config.antialt_raid_window or RAID_WINDOW
+        raid = self.record_join(member, raid_joins, raid_window)
+
+        if raid is not None:
+            starting = not self.in_lockdown(guild.id)
+            self._lockdowns[guild.id] = time.monotonic() + LOCKDOWN_DURATION
+
+            if starting:
+                self.log(
+                    guild,
+                    config,
+                    "🚨 Raid detected",
+                    f"{len(raid)} members joined within {raid_window:g} seconds. "
+                    f"New members will be handled until {LOCKDOWN_DURATION:g} seconds pass without a raid.",
+                )
+
+                # The joins that made up the raid went through before it was detected
+                for member_id in raid:
+                    m = guild.get_member(member_id)
+                    if m is not None and m.id != member.id:
+                        self.enqueue(m, self.raid_level(config))
+
+        if self.in_lockdown(guild.id):
+            self.enqueue(member, self.raid_level(config))
+            return
+
+        if not config.antialt_min_age:
+            return
+
+        age = discord.utils.utcnow() - member.created_at
+
+        if age < datetime.timedelta(days=config.antialt_min_age):
+            self.enqueue(member, config.antialt_level or RESTRICT)
+
+    def raid_level(self, config: GuildConfig) -> int:
+        if config.antialt_level:
+            return config.antialt_level
+
+        return RESTRICT if config.antialt_restricted_role else KICK
+
+    def enqueue(self, member: discord.Member, level: int) -> None:
+        pending = self._pending.setdefault(member.guild.id, {})
+        queued = pending.get(member.id)
+
+        # A member queued twice (alt and raid) gets the harsher action
+        if queued is None or queued[0] < level:
+            pending[member.id] = (level, member)
+
+        if member.guild.id not in self._workers:
+            self._workers[member.guild.id] = asyncio.create_task(
+                self._worker(member.guild)
+            )
+
+    async def _worker(self, guild: discord.Guild) -> None:
+        try:
+            while True:
+                await asyncio.sleep(ACTION_INTERVAL)
+
+                pending = self._pending.pop(guild.id, None)
+                if not pending:
+                    return
+
+                await self.run_actions(guild, pending)
+
+        finally:
+            self._workers.pop(guild.id, None)
+
+    async def run_actions(
+        self, guild: discord.Guild, queued: Dict[int, Tuple[int, discord.Member]]
+    ) -> None:
+        pending: Dict[int, List[discord.Member]] = {}
+        for level, member in queued.values():
+            pending.setdefault(level, []).append(member)
+
+        config = await self.bot.settings.get(guild.id)
+        role = (
+            guild.get_role(config.antialt_restricted_role)
+            if config.antialt_restricted_role
+            else None
+        )
+        done: Dict[str, int] = {}
+
+        if RESTRICT in pending:
+            members = pending.pop(RESTRICT)
+
+            if role is None:
+                # Deleted since anti-alt was set up, don't guess a harsher action
+                self.log(
+                    guild,
+                    config,
+                    "🛡️ Join gate",
+                    f"Couldn't restrict {len(members)} members, the restricted role is gone. "
+                    "Set it again with `automod antialt`.",
+                )
+            else:
+                done["Restricted"] = await self.gather(
+                    m.add_roles(role, reason="Anti-alt") for m in members
+                )
+
+        if KICK in pending:
+            done["Kicked"] = await self.gather(
+                m.kick(reason="Anti-alt") for m in pending.pop(KICK)
+            )
+
+        if BAN in pending:
+            members = pending.pop(BAN)
+            banned = 0
+
+            # One request per 200 members instead of one each
+            for i in range(0, len(members), MAX_BULK_BAN):
+                try:
+                    result = await guild.bulk_ban(
+                        members[i : i + MAX_BULK_BAN], reason="Anti-alt"
+                    )
+                    banned += len(result.banned)
+                except discord.HTTPException:
+                    pass
+
+            done["Banned"] = banned
+
+        summary = ", ".join(f"{action} {count}" for action, count in done.items() if count)
+
+        if summary:
+            self.log(guild, config, "🛡️ Join gate", summary)
+
+    async def gather(self, coros) -> int:
+        async def run(coro):
+            async with self._semaphore:
+                try:
+                    await coro
+                    return True
+                except discord.HTTPException:
+                    return False
+
+        return sum(await asyncio.gather(*(run(c) for c in coros)))
+
+    def log(self, guild: discord.Guild, config: GuildConfig, title: str, text: str):
+        channel = (
+            guild.get_channel(config.modlogs_channel_id)
+            if config.modlogs_channel_id
+            else None
+        )
+
+        if channel is None:
+            return
+
+        em = discord.Embed(
+            title=title,
+            description=text,
+            color=discord.Color.red(),
+            timestamp=datetime.datetime.now(),
+        )
+        self.bot.modlog.send(channel, em, "join_gate", guild.id)  # type: ignore
+
+
+async def setup(bot):
+    await bot.add_cog(JoinGate(bot))
@@ -0,0 +1,156 @@
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from .normalize import normalize
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    if index < 0 or index >= len(text):
+        return True
+
+    ch = text[index]
+    return not (ch.isalnum() or ch == "_")
+
+
+class WordMatcher:
+    """
+    Aho-Corasick automaton over a list of words.
+
+    Built once, then every search is a single pass over the text no
+    matter how many words there are. Matching is case-insensitive, and
+    with `whole_words` a match must not be surrounded by letters/digits.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "whole_words", "size")
+
+    def __init__(self, words: Iterable[str], whole_words: bool = True):
+        self.whole_words = whole_words
+        self.size = 0
+
+        goto: List[dict] = [{}]
+        # lengths of the words ending at each node
+        out: List[Tuple[int, ...]] = [()]
+
+        for word in words:
+            word = word.strip().lower()
+
+            if not word:
+                continue
+
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+
+                node = nxt
+
+            if not out[node]:
+                out[node] = (len(word),)
+                self.size += 1
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+
+            for ch, child in goto[node].items():
+                queue.append(child)
+
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+
+                fail[child] = goto[f].get(ch, 0)
+                out[child] += out[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def search(self, text: str) -> Optional[str]:
+        """Returns the first word found in the text, if any."""
+
+        if not self.size:
+            return None
+
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+
+            node = goto[node].get(ch, 0)
+
+            for length in out[node]:
+                start = i - length + 1
+
+                if not self.whole_words or (
+                    _is_boundary(text, start - 1) and _is_boundary(text, i + 1)
+                ):
+                    return text[start : i + 1]
+
+        return None
+
+
+class BannedWords:
+    """
+    Banned-word matchers, the global list plus one per guild.
+
+    The global automaton is shared by every guild. Guild lists live in the
+    `banned_words` table and their automata are built on first use, then
+    kept until `invalidate` is called for that guild.
+
+    Words are stored normalized (see utils.normalize), so searched text must
+    be normalized the same way.
+    """
+
+    def __init__(
+        self,
+        bot: "PizzaHat",
+        words: Iterable[str],
+        whole_words: bool = True,
+        max_size: int = 1000,
+    ):
+        self.bot = bot
+        self.whole_words = whole_words
+        self.max_size = max_size
+        self.base = WordMatcher(map(normalize, words), whole_words)
+        self._guilds: "OrderedDict[int, WordMatcher]" = OrderedDict()
+
+    async def get(self, guild_id: int) -> WordMatcher:
+        matcher = self._guilds.get(guild_id)
+
+        if matcher is not None:
+            self._guilds.move_to_end(guild_id)
+            return matcher
+
+        rows = (
+            await self.bot.db.fetch(
+                "SELECT word FROM banned_words WHERE guild_id=$1", guild_id
+            )
+            if self.bot.db
+            else []
+        )
+        matcher = WordMatcher((normalize(r["word"]) for r in rows), self.whole_words)
+
+        self._guilds[guild_id] = matcher
+        while len(self._guilds) > self.max_size:
+            self._guilds.popitem(last=False)
+
+        return matcher
+
+    async def search(self, guild_id: int, text: str) -> Optional[str]:
+        return self.base.search(text) or (await self.get(guild_id)).search(text)
+
+    def invalidate(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,176 @@
+import re
+import unicodedata
+from typing import Dict, Optional
+
+# Lowercase look-alikes from other scripts, by the Latin letter they imitate.
+# Uppercase forms are derived. Written as escapes since they are
+# indistinguishable from the Latin ones in an editor.
+_CONFUSABLES = {
+    "a": "\u0430\u03b1\u0251",
+    "b": "\u044c\u0185",
+    "c": "\u0441\u03f2\u1d04",
+    "d": "\u0501",
+    "e": "\u0435\u03b5\u0454\u1d07",
+    "g": "\u0261",
+    "h": "\u04bb\u043d",
+    "i": "\u0456\u03b9\u0131",
+    "j": "\u0458\u03f3",
+    "k": "\u043a\u03ba",
+    "l": "\u04cf",
+    "m": "\u043c",
+    "n": "\u043f\u03b7",
+    "o": "\u043e\u03bf\u03c3\u0585\u1d0f",
+    "p": "\u0440\u03c1",
+    "q": "\u051b",
+    "r": "\u0433\u0280",
+    "s": "\u0455",
+    "t": "\u0442\u03c4",
+    "u": "\u03c5\u057d\u1d1c",
+    "v": "\u03bd\u0475\u1d20",
+    "w": "\u0461\u051d\u1d21",
+    "x": "\u0445\u03c7",
+    "y": "\u0443\u04af\u03b3",
+    "z": "\u1d22",
+}
+
+# Their capitals imitate a different letter (Greek capital eta is an H)
+_LOWER_ONLY = "\u03c3\u03b3\u03b7\u03bd\u03c5\u043f\u0433\u0131"
+
+_LEET = {
+    "0": "o",
+    "1": "i",
+    "3": "e",
+    "4": "a",
+    "5": "s",
+    "7": "t",
+    "8": "b",
+    "9": "g",
+    "@": "a",
+    "$": "s",
+}
+
+# Three or more single characters split by spaces/dots/dashes: "b a d", "b.a.d"
+SPACED_REGEX = re.compile(r"(?<![\w@$])(?:[\w@$][\s.\-_*]+){2,}[\w@$](?![\w@$])")
+SEPARATOR_REGEX = re.compile(r"[\s.\-_*]+")
+
+TOKEN_REGEX = re.compile(r"\S+")
+LATIN_REGEX = re.compile(r"[A-Za-z]")
+LETTER_REGEX = re.compile(r"[^\W\d_]")
+LEET_REGEX = re.compile("[" + re.escape("".join(_LEET)) + "]")
+
+# Planes outside the BMP that hold combining or format characters
+_EXTRA_RANGES = (
+    range(0x10000, 0x20000),
+    range(0xE0000, 0xE0080),  # tags
+    range(0xE0100, 0xE01F0),  # variation selectors supplement
+)
+
+
+def _build_tables():
+    fold: Dict[int, Optional[str]] = {}
+    # Look-alikes from other scripts, only mapped in words that mix scripts
+    confusables: Dict[int, str] = {}
+    scripts: Dict[str, str] = {}
+
+    # Combining marks (left over from NFKD), zero-width and other invisible
+    # format characters are dropped
+    for ranges in (range(0x80, 0x10000), *_EXTRA_RANGES):
+        for cp in ranges:
+            if unicodedata.category(chr(cp)) in ("Mn", "Me", "Cf"):
+                fold[cp] = None
+
+    for latin, chars in _CONFUSABLES.items():
+        for ch in chars:
+            forms = [(ch, latin)]
+            upper = ch.upper()
+            if len(upper) == 1 and upper != ch and ch not in _LOWER_ONLY:
+                forms.append((upper, latin.upper()))
+
+            # Latin small capitals and IPA letters are never real words
+            script = unicodedata.name(ch).split()[0]
+            table = fold if script == "LATIN" else confusables
+
+            for form, target in forms:
+                table[ord(form)] = target
+                if table is confusables:
+                    scripts[form] = script
+
+    # Regional indicators, "\U0001F1E6" looks like A
+    for i in range(26):
+        fold[0x1F1E6 + i] = chr(ord("a") + i)
+
+    return fold, confusables, scripts, str.maketrans(_LEET)
+
+
+_FOLD, _CONFUSE, _SCRIPTS, _LEET_TABLE = _build_tables()
+CONFUSABLE_REGEX = re.compile("[" + "".join(_SCRIPTS) + "]")
+# Words with at least one look-alike in them
+CONFUSED_WORD_REGEX = re.compile(r"\w*[" + "".join(_SCRIPTS) + r"]\w*")
+
+
+def unconfuse(word: str) -> str:
+    """
+    Maps look-alike letters to Latin if the word mixes scripts ("раypal"
+    with a Cyrillic "р"). Words in a single script are left alone, "Иван"
+    is a name, not an evasion.
+    """
+
+    scripts = {_SCRIPTS[ch] for ch in word if ch in _SCRIPTS}
+
+    if not scripts or (len(scripts) == 1 and LATIN_REGEX.search(word) is None):
+        return word
+
+    return word.translate(_CONFUSE)
+
+
+def unleet(text: str) -> str:
+    """Undoes leetspeak in words that also have letters, "455" stays a number."""
+
+    if LEET_REGEX.search(text) is None:
+        return text
+
+    return TOKEN_REGEX.sub(
+        lambda m: (
+            m.group().translate(_LEET_TABLE)
+            if LETTER_REGEX.search(m.group())
+            else m.group()
+        ),
+        text,
+    )
+
+
+def fold(text: str, keep_case: bool = False) -> str:
+    """
+    Reduces the text to plain characters: compatibility forms (fullwidth,
+    math bold, circled letters) are decomposed, accents and invisible
+    characters dropped and look-alike letters in mixed script words mapped
+    to Latin. Casefolded unless `keep_case`.
+    """
+
+    if text.isascii():
+        return text if keep_case else text.lower()
+
+    # NFKD rather than NFKC so accents come apart and can be dropped
+    text = unicodedata.normalize("NFKD", text).translate(_FOLD)
+
+    if CONFUSABLE_REGEX.search(text) is not None:
+        text = CONFUSED_WORD_REGEX.sub(lambda m: unconfuse(m.group()), text)
+
+    return text if keep_case else text.casefold()
+
+
+def normalize(text: str) -> str:
+    """
+    The form text is matched in: folded, spaced out letters joined and
+    leetspeak undone. Banned words must go through this too.
+    """
+
+    text = fold(text)
+
+    if SPACED_REGEX.search(text) is not None:
+        # Joining can make a mixed script word out of single letters
+        text = SPACED_REGEX.sub(
+            lambda m: unconfuse(SEPARATOR_REGEX.sub("", m.group())), text
+        )
+
+    return unleet(text)
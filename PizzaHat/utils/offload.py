@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from core.database import Histogram
+
+
+def _timed(fn: Callable, submitted: float, *args) -> Tuple[float, float, Any]:
+    # Runs in the worker, wall clock because monotonic isn't shared between processes
+    started = time.time()
+    result = fn(*args)
+    return started - submitted, time.time() - started, result
+
+
+class CheckExecutor:
+    """
+    Runs CPU-heavy automod work in a process pool, so a huge message can't
+    stall the event loop (and with it the gateway heartbeat).
+
+    At most `max_pending` calls are in the pool at once. A call made while
+    it's full, or one that takes longer than its timeout, returns the
+    caller's fallback instead of waiting.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, timeout: float = 2.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.saturated = 0
+        self.errors = 0
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+
+    @property
+    def utilization(self) -> float:
+        """Share of the workers busy right now."""
+
+        return min(self.in_flight / self.max_workers, 1.0)
+
+    async def run(
+        self, fn: Callable, *args, fallback: Any = None, timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Returns `fn(*args)` computed in the pool, or `fallback` if the pool is
+        saturated, the call times out or the pool broke. `fn` and the
+        arguments must be picklable.
+        """
+
+        if self.in_flight >= self.max_pending:
+            self.saturated += 1
+            return fallback
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            cf = self._pool.submit(_timed, fn, time.time(), *args)
+        except BrokenExecutor:
+            self._reset()
+            self.errors += 1
+            return fallback
+
+        self.in_flight += 1
+        fut = asyncio.wrap_future(cf)
+        # A timed out call still holds its worker, count it until it's done
+        fut.add_done_callback(self._done)
+
+        try:
+            wait, took, result = await asyncio.wait_for(
+                asyncio.shield(fut), timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            # Only drops it if no worker picked it up yet
+            cf.cancel()
+            self.timeouts += 1
+            return fallback
+        except BrokenExecutor:
+            self._reset()
+            self.errors += 1
+            return fallback
+        except Exception:
+            self.errors += 1
+            return fallback
+
+        self.queue_wait.add(max(wait, 0.0) * 1000)
+        self.run_time.add(took * 1000)
+        return result
+
+    def _done(self, fut: asyncio.Future) -> None:
+        self.in_flight -= 1
+
+        if not fut.cancelled() and fut.exception() is None:
+            self.completed += 1
+
+    def _reset(self) -> None:
+        # A worker died (OOM kill, segfault in a C extension), start over
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def close(self) -> None:
+        self._reset()
@@ -0,0 +1,285 @@
+import asyncio
+import hashlib
+import io
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import aiohttp
+import discord
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+    from .offload import CheckExecutor
+
+HASH_SIZE = 8
+
+# Postgres has no unsigned BIGINT
+_SIGN = 1 << 63
+_WRAP = 1 << 64
+
+# guild_id of entries that apply everywhere
+GLOBAL = 0
+
+# Returned by the check pool when it couldn't hash in time, unlike None never cached
+_UNHASHED = object()
+
+
+def to_signed(h: int) -> int:
+    return h - _WRAP if h >= _SIGN else h
+
+
+def to_unsigned(h: int) -> int:
+    return h + _WRAP if h < 0 else h
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """
+    64-bit difference hash of an image, None if it can't be decoded.
+    CPU bound, runs in the check pool.
+    """
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # Lets JPEGs decode at reduced size, much cheaper than a full decode
+            img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+            small = img.convert("L").resize(
+                (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree of 64-bit hashes under Hamming distance."""
+
+    __slots__ = ("root", "size")
+
+    def __init__(self, hashes: Iterable[int] = ()):
+        # node: [hash, {distance: child node}]
+        self.root: Optional[list] = None
+        self.size = 0
+
+        for h in hashes:
+            self.add(h)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, h: int) -> None:
+        if self.root is None:
+            self.root = [h, {}]
+            self.size = 1
+            return
+
+        node = self.root
+
+        while True:
+            d = hamming(h, node[0])
+
+            if d == 0:
+                return
+
+            child = node[1].get(d)
+
+            if child is None:
+                node[1][d] = [h, {}]
+                self.size += 1
+                return
+
+            node = child
+
+    def find(self, h: int, max_distance: int) -> Optional[int]:
+        """Returns a hash within `max_distance` of `h`, if there is one."""
+
+        if self.root is None:
+            return None
+
+        stack = [self.root]
+
+        while stack:
+            value, children = stack.pop()
+            d = hamming(h, value)
+
+            if d <= max_distance:
+                return value
+
+            # Triangle inequality, only these subtrees can hold a match
+            for k in range(max(d - max_distance, 1), d + max_distance + 1):
+                child = children.get(k)
+                if child is not None:
+                    stack.append(child)
+
+        return None
+
+
+class ImageScanner:
+    """
+    Matches image attachments against the `image_blocklist` table.
+
+    Attachments are downloaded through `bot.session` up to `max_bytes` and
+    hashed in the automod check pool (a thread if there is none), so
+    decoding never blocks the event loop. Images the pool has no room or
+    time for are let through unhashed. Hashes are cached by URL and by
+    content digest, so re-posts cost nothing.
+    """
+
+    def __init__(
+        self,
+        bot: "PizzaHat",
+        executor: Optional["CheckExecutor"] = None,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_downloads: int = 4,
+        cache_size: int = 10000,
+    ):
+        self.bot = bot
+        self.executor = executor
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self._downloads = asyncio.Semaphore(max_downloads)
+        self._by_url: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._by_digest: "OrderedDict[bytes, Optional[int]]" = OrderedDict()
+        self._trees: "OrderedDict[int, BKTree]" = OrderedDict()
+
+        self.downloads = 0
+        self.hashed = 0
+        self.unhashed = 0
+        self.cache_hits = 0
+
+    async def find_blocked(
+        self, msg: discord.Message, max_distance: int
+    ) -> Optional[discord.Attachment]:
+        """Returns the first attachment matching the guild or global blocklist."""
+
+        images = [
+            a
+            for a in msg.attachments
+            if (a.content_type or "").startswith("image/") and a.size <= self.max_bytes
+        ]
+
+        if not images:
+            return None
+
+        global_tree = await self.get_tree(GLOBAL)
+        guild_tree = await self.get_tree(msg.guild.id)  # type: ignore
+        trees = [t for t in (global_tree, guild_tree) if t]
+
+        if not trees:
+            return None
+
+        for attachment in images:
+            h = await self.hash_attachment(attachment)
+
+            if h is not None and any(t.find(h, max_distance) is not None for t in trees):
+                return attachment
+
+        return None
+
+    async def hash_attachment(self, attachment: discord.Attachment) -> Optional[int]:
+        url = attachment.url
+
+        if url in self._by_url:
+            self.cache_hits += 1
+            self._by_url.move_to_end(url)
+            return self._by_url[url]
+
+        data = await self.download(url)
+        h = await self.hash_bytes(data) if data is not None else None
+
+        if h is not _UNHASHED:
+            self._remember(self._by_url, url, h)
+            return h
+
+        return None
+
+    async def hash_bytes(self, data: bytes):
+        """The image's hash, None if it isn't an image or `_UNHASHED`."""
+
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+
+        if digest in self._by_digest:
+            self.cache_hits += 1
+            self._by_digest.move_to_end(digest)
+            return self._by_digest[digest]
+
+        if self.executor is not None:
+            h = await self.executor.run(dhash, data, fallback=_UNHASHED)
+        else:
+            h = await asyncio.get_running_loop().run_in_executor(None, dhash, data)
+
+        if h is _UNHASHED:
+            self.unhashed += 1
+            return h
+
+        self.hashed += 1
+        self._remember(self._by_digest, digest, h)
+        return h
+
+    async def download(self, url: str) -> Optional[bytes]:
+        async with self._downloads:
+            self.downloads += 1
+
+            try:
+                async with self.bot.session.get(url) as resp:
+                    if resp.status != 200:
+                        return None
+
+                    if (resp.content_length or 0) > self.max_bytes:
+                        return None
+
+                    # Content-Length can be missing, enforce the cap while reading
+                    chunks = []
+                    size = 0
+
+                    async for chunk in resp.content.iter_chunked(64 * 1024):
+                        size += len(chunk)
+
+                        if size > self.max_bytes:
+                            return None
+
+                        chunks.append(chunk)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return None
+
+        return b"".join(chunks)
+
+    def _remember(self, cache: OrderedDict, key, h: Optional[int]) -> None:
+        cache[key] = h
+
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    async def get_tree(self, guild_id: int) -> BKTree:
+        tree = self._trees.get(guild_id)
+
+        if tree is not None:
+            self._trees.move_to_end(guild_id)
+            return tree
+
+        rows = (
+            await self.bot.db.fetch(
+                "SELECT hash FROM image_blocklist WHERE guild_id=$1", guild_id
+            )
+            if self.bot.db
+            else []
+        )
+        tree = self._trees[guild_id] = BKTree(to_unsigned(r["hash"]) for r in rows)
+
+        while len(self._trees) > 1000:
+            self._trees.popitem(last=False)
+
+        return tree
+
+    def invalidate(self, guild_id: int) -> None:
+        self._trees.pop(guild_id, None)
@@ -0,0 +1,307 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import discord
+from core.database import BufferedStatement
+
+if TYPE_CHECKING:
+    from core.bot import PizzaHat
+
+    from .automod import AutoMod
+
+# Counters are added to the hour they are flushed in
+STATS_UPSERT = BufferedStatement(
+    """INSERT INTO automod_stats (guild_id, rule, bucket, checked, hits, shadow_hits)
+    VALUES ($1, $2, date_trunc('hour', now()), $3, $4, $5)
+    ON CONFLICT (guild_id, rule, bucket) DO UPDATE SET
+    checked = automod_stats.checked + EXCLUDED.checked,
+    hits = automod_stats.hits + EXCLUDED.hits,
+    shadow_hits = automod_stats.shadow_hits + EXCLUDED.shadow_hits"""
+)
+
+# Index into a rule's counters
+CHECKED, HITS, SHADOW_HITS = 0, 1, 2
+
+
+class RuleSpec(NamedTuple):
+    method: str  # AutoMod check, called as (msg, threshold)
+    cost: int  # relative cost, cheaper rules run first
+    threshold: Optional[float]  # None if the rule has no threshold
+    reason: str
+    heavy: bool = False  # reads the content scan, done in the pool for big messages
+    shadow: bool = False  # only counted until a guild turns shadow mode off
+
+
+RULES: Dict[str, RuleSpec] = {
+    "mentions": RuleSpec("mass_mentions", 1, 3, "Don't spam mentions."),
+    "caps": RuleSpec("all_caps", 2, 0.7, "Too many caps.", True),
+    "emojis": RuleSpec("emoji_spam", 2, 10, "Don't spam emojis.", True),
+    "zalgo": RuleSpec("zalgo_text", 2, 0.2, "No zalgo allowed.", True),
+    "spam": RuleSpec("message_spam", 3, 5, "Stop spamming."),
+    "duplicates": RuleSpec(
+        "duplicate_messages", 3, 4, "Stop posting the same message.", shadow=True
+    ),
+    "words": RuleSpec("banned_words", 4, None, "Watch your language."),
+    # Known phishing domains, enforced from the start
+    "links": RuleSpec("blocked_links", 5, None, "That link is not allowed.", True),
+    # Downloads and hashes attachments, max Hamming distance as threshold
+    "images": RuleSpec(
+        "blocked_images", 8, 6, "That image is not allowed.", shadow=True
+    ),
+    # May need a REST call to resolve the invite
+    "invites": RuleSpec("invites", 10, None, "No invite links.", True),
+}
+
+ACTIONS = ("delete", "warn", "timeout", "log")
+
+
+class CompiledRule(NamedTuple):
+    name: str
+    check: Callable[[discord.Message, Optional[float]], Awaitable[Any]]
+    threshold: Optional[float]
+    action: str
+    reason: str
+    heavy: bool = False
+    shadow: bool = False  # only counted, never acted on
+
+
+class RuleStats:
+    """
+    Per-guild, per-rule counters of checks and hits, shadow rules included.
+
+    Counting is a list increment on the hot path. Every `interval` seconds
+    the non-zero counters are handed to the write buffer as one upsert per
+    (guild, rule) into `automod_stats`.
+    """
+
+    def __init__(self, bot: "PizzaHat", interval: float = 60.0):
+        self.bot = bot
+        self.interval = interval
+        # guild ID -> rule name -> [checked, hits, shadow hits]
+        self._counters: Dict[int, Dict[str, List[int]]] = {}
+        self._last_flush = time.monotonic()
+
+    def counters(self, guild_id: int) -> Dict[str, List[int]]:
+        counters = self._counters.get(guild_id)
+
+        if counters is None:
+            counters = self._counters[guild_id] = {
+                name: [0, 0, 0] for name in RULES
+            }
+
+        return counters
+
+    def tick(self) -> None:
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+
+        if getattr(self.bot, "write_buffer", None) is None:
+            return
+
+        for guild_id, counters in self._counters.items():
+            for name, c in counters.items():
+                if c[CHECKED] or c[HITS] or c[SHADOW_HITS]:
+                    self.bot.write_buffer.add(STATS_UPSERT, guild_id, name, *c)
+                    # Zeroed in place, plans hold on to these lists
+                    c[:] = (0, 0, 0)
+
+
+class Plan:
+    """A guild's enabled rules, in the order they are evaluated."""
+
+    __slots__ = ("exempt", "rules", "heavy", "counters")
+
+    def __init__(
+        self,
+        exempt: FrozenSet[int],
+        rules: Tuple[CompiledRule, ...],
+        counters: Optional[Dict[str, List[int]]] = None,
+    ):
+        # Role and channel IDs, snowflakes never collide so one set does both
+        self.exempt = exempt
+        self.rules = rules
+        self.heavy = any(r.heavy for r in rules)
+        self.counters = counters
+
+    def count(self, rule: CompiledRule, hit: bool) -> None:
+        if self.counters is None:
+            return
+
+        c = self.counters[rule.name]
+        c[CHECKED] += 1
+
+        if hit:
+            c[SHADOW_HITS if rule.shadow else HITS] += 1
+
+    def is_exempt(self, msg: discord.Message) -> bool:
+        exempt = self.exempt
+
+        if not exempt:
+            return False
+
+        channel = msg.channel
+        if channel.id in exempt or getattr(channel, "parent_id", None) in exempt:
+            return True
+
+        # Member._roles holds the bare IDs, no Role lookups needed
+        return not exempt.isdisjoint(getattr(msg.author, "_roles", ()))
+
+    async def evaluate(
+        self, msg: discord.Message, known: Optional[Mapping[str, Any]] = None
+    ) -> Optional[Tuple[CompiledRule, Any]]:
+        """
+        Returns the first enforced rule the message breaks and what the check
+        found. Shadow rules are only counted. Rules in `known` (by name) are
+        not checked again, their result is taken from there.
+        """
+
+        if not self.rules or self.is_exempt(msg):
+            return None
+
+        for rule in self.rules:
+            if known is not None and rule.name in known:
+                hit = known[rule.name]
+            else:
+                hit = await rule.check(msg, rule.threshold)
+
+            self.count(rule, bool(hit))
+
+            if hit and not rule.shadow:
+                return rule, hit
+
+        return None
+
+
+class RuleEngine:
+    """
+    Per-guild automod plans compiled from the `automod_rules` and
+    `automod_exempt` tables. Commands that change either table must call
+    `invalidate` afterwards.
+    """
+
+    def __init__(self, automod: "AutoMod", max_size: int = 5000):
+        self.automod = automod
+        self.bot = automod.bot
+        self.max_size = max_size
+        self._plans: "OrderedDict[int, Plan]" = OrderedDict()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._invalidated: Set[int] = set()
+        self.stats = RuleStats(self.bot)
+
+    async def get(self, guild_id: int) -> Plan:
+        plan = self._plans.get(guild_id)
+
+        if plan is not None:
+            self._plans.move_to_end(guild_id)
+            return plan
+
+        # Coalesce concurrent misses for the same guild into one compile
+        pending = self._pending.get(guild_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[guild_id] = future
+
+        try:
+            plan = await self._compile(guild_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            self._invalidated.discard(guild_id)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # silence "never retrieved" when nobody waits
+            self._invalidated.discard(guild_id)
+            raise
+        else:
+            future.set_result(plan)
+        finally:
+            del self._pending[guild_id]
+
+        # Don't cache plans that were invalidated while they compiled
+        if guild_id in self._invalidated:
+            self._invalidated.discard(guild_id)
+            return plan
+
+        self._plans[guild_id] = plan
+
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+
+        return plan
+
+    async def _compile(self, guild_id: int) -> Plan:
+        rows = exempt = []
+
+        if self.bot.db:
+            rows = await self.bot.db.fetch(
+                "SELECT rule, enabled, threshold, action, shadow FROM automod_rules WHERE guild_id=$1",
+                guild_id,
+            )
+            exempt = await self.bot.db.fetch(
+                "SELECT target_id FROM automod_exempt WHERE guild_id=$1", guild_id
+            )
+
+        overrides = {r["rule"]: r for r in rows}
+        rules = []
+
+        for name, spec in sorted(RULES.items(), key=lambda i: i[1].cost):
+            row = overrides.get(name)
+
+            if row is not None and not row["enabled"]:
+                continue
+
+            threshold = spec.threshold
+            action = "delete"
+            shadow = spec.shadow
+
+            if row is not None:
+                if row["threshold"] is not None and threshold is not None:
+                    threshold = row["threshold"]
+                if row["action"] in ACTIONS:
+                    action = row["action"]
+                if row["shadow"] is not None:
+                    shadow = row["shadow"]
+
+            rules.append(
+                CompiledRule(
+                    name,
+                    getattr(self.automod, spec.method),
+                    threshold,
+                    action,
+                    spec.reason,
+                    spec.heavy,
+                    shadow,
+                )
+            )
+
+        return Plan(
+            frozenset(r["target_id"] for r in exempt),
+            tuple(rules),
+            self.stats.counters(guild_id),
+        )
+
+    def invalidate(self, guild_id: int) -> None:
+        self._plans.pop(guild_id, None)
+
+        if guild_id in self._pending:
+            self._invalidated.add(guild_id)
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+
+# (received at, channel ID, message ID)
+Entry = Tuple[float, int, int]
+
+
+class SpamTracker:
+    """
+    Sliding window of recent messages per (guild, user).
+
+    Each member gets a ring buffer holding their last `max_limit` messages,
+    so recording a message is O(1). Members are kept in least recently active
+    order, which lets idle ones be evicted from the front without a scan.
+    """
+
+    def __init__(
+        self,
+        limit: int = 5,
+        window: float = 7.0,
+        max_users: int = 50000,
+        max_limit: int = 20,
+    ):
+        self.limit = limit
+        self.max_limit = max_limit
+        self.window = window
+        self.max_users = max_users
+        self._users: "OrderedDict[Tuple[int, int], Deque[Entry]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def record(
+        self, msg: discord.Message, limit: Optional[int] = None
+    ) -> Optional[Dict[int, List[int]]]:
+        """
+        Records the message. If the author sent `limit` messages within
+        `window` seconds, returns their IDs grouped by channel and forgets them.
+        """
+
+        limit = max(2, min(limit or self.limit, self.max_limit))
+        now = time.monotonic()
+        key = (msg.guild.id, msg.author.id)  # type: ignore
+        buffer = self._users.get(key)
+
+        if buffer is None:
+            buffer = self._users[key] = deque(maxlen=self.max_limit)
+        else:
+            self._users.move_to_end(key)
+
+        buffer.append((now, msg.channel.id, msg.id))
+        self._evict(now)
+
+        if len(buffer) < limit or now - buffer[-limit][0] >= self.window:
+            return None
+
+        recent: Dict[int, List[int]] = {}
+        for i in range(-limit, 0):
+            _, channel_id, message_id = buffer[i]
+            recent.setdefault(channel_id, []).append(message_id)
+
+        del self._users[key]
+        return recent
+
+    def _evict(self, now: float) -> None:
+        users = self._users
+
+        while users:
+            key, buffer = next(iter(users.items()))
+
+            if now - buffer[-1][0] < self.window and len(users) <= self.max_users:
+                break
+
+            del users[key]
@@ -0,0 +1,424 @@
+import asyncio
+import datetime
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import discord
+from core.bot import PizzaHat
+from core.cog import Cog
+from core.database import BufferedStatement
+from core.settings import GuildConfig
+
+STAR = "⭐"
+
+# Seconds to wait for more reactions before touching the starboard post
+UPDATE_WINDOW = float(os.getenv("STARBOARD_UPDATE_WINDOW", 5))
+
+STAR_INFO_INSERT = BufferedStatement(
+    "INSERT INTO star_info (guild_id, user_msg_id, bot_msg_id) VALUES ($1, $2, $3) ON CONFLICT ON CONSTRAINT star_info_pkey DO NOTHING"
+)
+
+
+class StarState:
+    """Star count and starboard post of a single source message."""
+
+    __slots__ = (
+        "guild_id",
+        "channel_id",
+        "message_id",
+        "author_id",
+        "author_bot",
+        "count",
+        "message",
+        "bot_msg_id",
+        "posted_count",
+    )
+
+    def __init__(self, message: discord.Message, bot_msg_id: Optional[int]):
+        self.guild_id: int = message.guild.id  # type: ignore
+        self.channel_id: int = message.channel.id
+        self.message_id: int = message.id
+        self.author_id: int = message.author.id
+        self.author_bot: bool = message.author.bot
+        self.count: int = next(
+            (r.count for r in message.reactions if str(r.emoji) == STAR), 0
+        )
+        # Only kept until the starboard post is built from it
+        self.message: Optional[discord.Message] = message
+        self.bot_msg_id: Optional[int] = bot_msg_id
+        # Count currently shown on the starboard post, None if unknown
+        self.posted_count: Optional[int] = None
+
+
+def star_embed(message: discord.Message) -> discord.Embed:
+    em = discord.Embed(
+        description=message.content,
+        color=discord.Color.blurple(),
+        timestamp=datetime.datetime.now(),
+    )
+    em.set_footer(text=f"Message ID: {message.id}")
+
+    em.add_field(
+        name="Source",
+        value=f"[Jump to message!]({message.jump_url})",
+        inline=False,
+    )
+
+    for sticker in message.stickers:
+        em.add_field(
+            name=f"Sticker: `{sticker.name}`",
+            value=f"ID: [`{sticker.id}`]({sticker.url})",
+        )
+    if len(message.stickers) == 1:
+        em.set_thumbnail(url=message.stickers[0].url)
+
+    em.set_author(
+        name=message.author.name,
+        icon_url=(message.author.avatar.url if message.author.avatar else None),
+    )
+    em.set_image(url=(message.attachments[0].url if message.attachments else None))
+
+    return em
+
+
+class StarboardEvents(Cog):
+    """Starboard reaction pipeline."""
+
+    def __init__(
+        self, bot: PizzaHat, max_states: int = 2000, window: float = UPDATE_WINDOW
+    ):
+        self.bot: PizzaHat = bot
+        self.max_states = max_states
+        self.window = window
+        self._states: "OrderedDict[int, StarState]" = OrderedDict()
+        self._scheduled: Dict[int, asyncio.Task] = {}
+        # Messages whose update is running, and those that changed meanwhile
+        self._updating: Set[int] = set()
+        self._rerun: Set[int] = set()
+        # guild ID -> source message ID -> starboard post ID, mirrors star_info
+        self._starred: Dict[int, Dict[int, int]] = {}
+
+        self.updates_requested = 0
+        self.updates_coalesced = 0
+        self.updates_skipped = 0
+        self.updates_sent = 0
+
+    async def cog_load(self) -> None:
+        if not self.bot.db:
+            return
+
+        for row in await self.bot.db.fetch(
+            "SELECT guild_id, user_msg_id, bot_msg_id FROM star_info"
+        ):
+            self._starred.setdefault(row["guild_id"], {})[row["user_msg_id"]] = row[
+                "bot_msg_id"
+            ]
+
+    async def cog_unload(self) -> None:
+        for task in self._scheduled.values():
+            task.cancel()
+        self._scheduled.clear()
+        self._rerun.clear()
+
+    def schedule_update(self, state: StarState) -> None:
+        """
+        Updates the starboard post `window` seconds after the first star of
+        a burst, so the whole burst costs a single edit.
+        """
+
+        self.updates_requested += 1
+
+        if state.message_id in self._scheduled:
+            self.updates_coalesced += 1
+
+            # The running update may have read the count already
+            if state.message_id in self._updating:
+                self._rerun.add(state.message_id)
+            return
+
+        self._scheduled[state.message_id] = asyncio.create_task(
+            self._delayed_update(state)
+        )
+
+    async def _delayed_update(self, state: StarState) -> None:
+        message_id = state.message_id
+
+        # Scheduled until the update is done, a second one could post it twice
+        try:
+            await asyncio.sleep(self.window)
+            self._updating.add(message_id)
+
+            # Config may have changed during the window
+            config = await self.get_config(state.guild_id)
+
+            if config is not None:
+                await self.update_starboard(state, config)
+
+        finally:
+            self._updating.discard(message_id)
+            self._scheduled.pop(message_id, None)
+
+        if message_id in self._rerun:
+            self._rerun.discard(message_id)
+            self._scheduled[message_id] = asyncio.create_task(
+                self._delayed_update(state)
+            )
+
+    async def get_config(self, guild_id: Optional[int]) -> Optional[GuildConfig]:
+        if guild_id is None:
+            return None
+
+        config = await self.bot.settings.get(guild_id)
+        return config if config.star_channel_id is not None else None
+
+    async def get_state(
+        self, payload: discord.RawReactionActionEvent
+    ) -> Tuple[Optional[StarState], bool]:
+        """
+        Returns the star state of the reacted message and whether it was just
+        built, in which case its count already includes this reaction.
+        """
+
+        message_id = payload.message_id
+        state = self._states.get(message_id)
+
+        if state is not None:
+            self._states.move_to_end(message_id)
+            return state, False
+
+        message = self.bot._connection._get_message(message_id)
+
+        if message is None:
+            message = await self.fetch_message(
+                payload.guild_id, payload.channel_id, message_id  # type: ignore
+            )
+
+            if message is None:
+                return None, False
+
+            # Another reaction may have built the state while we were fetching
+            state = self._states.get(message_id)
+            if state is not None:
+                return state, True
+
+        state = StarState(
+            message, self.get_starboard_post(payload.guild_id, message_id)  # type: ignore
+        )
+        self._states[message_id] = state
+
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+
+        return state, True
+
+    async def fetch_message(
+        self, guild_id: int, channel_id: int, message_id: int
+    ) -> Optional[discord.Message]:
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel_or_thread(channel_id) if guild else None
+
+        if channel is None:
+            return None
+
+        try:
+            return await channel.fetch_message(message_id)  # type: ignore
+        except (discord.NotFound, discord.Forbidden):
+            return None
+
+    def get_starboard_post(self, guild_id: int, message_id: int) -> Optional[int]:
+        posts = self._starred.get(guild_id)
+        return posts.get(message_id) if posts else None
+
+    def remember_post(self, guild_id: int, message_id: int, bot_msg_id: int) -> None:
+        self._starred.setdefault(guild_id, {})[message_id] = bot_msg_id
+        self.bot.write_buffer.add(STAR_INFO_INSERT, guild_id, message_id, bot_msg_id)
+
+    async def forget_post(self, guild_id: int, message_id: int) -> None:
+        posts = self._starred.get(guild_id)
+        bot_msg_id = posts.pop(message_id, None) if posts else None
+
+        if bot_msg_id is None:
+            return
+
+        if not posts:
+            del self._starred[guild_id]
+
+        if self.bot.db:
+            # The insert may still be sitting in the write buffer
+            await self.bot.write_buffer.flush(STAR_INFO_INSERT)
+            await self.bot.db.execute(
+                "DELETE FROM star_info WHERE guild_id=$1 AND bot_msg_id=$2",
+                guild_id,
+                bot_msg_id,
+            )
+
+    async def update_starboard(self, state: StarState, config: GuildConfig) -> None:
+        guild = self.bot.get_guild(state.guild_id)
+        star_channel = guild.get_channel(config.star_channel_id) if guild else None  # type: ignore
+
+        if not isinstance(star_channel, discord.TextChannel):
+            return
+
+        content = f"{STAR} **{state.count}** | <#{state.channel_id}>"
+        bot_msg_id = state.bot_msg_id
+
+        if bot_msg_id is not None and state.count == state.posted_count:
+            # Stars were added and removed again within the window
+            self.updates_skipped += 1
+            return
+
+        try:
+            if bot_msg_id is None:
+                if state.count < config.star_count:
+                    return
+
+                message = state.message or await self.fetch_message(
+                    state.guild_id, state.channel_id, state.message_id
+                )
+                if message is None:
+                    return
+
+                self.updates_sent += 1
+                star_msg = await star_channel.send(
+                    content=content, embed=star_embed(message)
+                )
+                state.bot_msg_id = star_msg.id
+                state.posted_count = state.count
+                state.message = None
+                self.remember_post(state.guild_id, state.message_id, star_msg.id)
+
+            elif state.count == 0:
+                self.updates_sent += 1
+                await star_channel.get_partial_message(bot_msg_id).delete()
+                await self.forget_post(state.guild_id, state.message_id)
+                state.bot_msg_id = None
+                state.posted_count = None
+
+            else:
+                self.updates_sent += 1
+                await star_channel.get_partial_message(bot_msg_id).edit(content=content)
+                state.posted_count = state.count
+
+        except discord.NotFound:
+            # Starboard post was deleted by hand
+            await self.forget_post(state.guild_id, state.message_id)
+            state.bot_msg_id = None
+            state.posted_count = None
+        except discord.Forbidden:
+            pass
+        except Exception as e:
+            print(f"Error in starboard update: {e}")
+
+    @Cog.listener(name="on_raw_reaction_add")
+    async def starboard_reaction_add(self, payload: discord.RawReactionActionEvent):
+        # Everything up to get_state only uses the payload and cached config
+        if payload.emoji.name != STAR:
+            return
+
+        config = await self.get_config(payload.guild_id)
+
+        if config is None or payload.channel_id == config.star_channel_id:
+            return
+
+        state, fresh = await self.get_state(payload)
+
+        if state is None or state.author_bot:
+            return
+
+        if not fresh:
+            state.count += 1
+
+        if not config.self_star and payload.user_id == state.author_id:
+            # The matching remove event takes the count back down
+            channel = self.bot.get_partial_messageable(payload.channel_id)
+            try:
+                await channel.get_partial_message(payload.message_id).remove_reaction(
+                    payload.emoji, discord.Object(payload.user_id)
+                )
+            except discord.HTTPException:
+                pass
+            return
+
+        self.schedule_update(state)
+
+    @Cog.listener(name="on_raw_reaction_remove")
+    async def starboard_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        if payload.emoji.name != STAR:
+            return
+
+        config = await self.get_config(payload.guild_id)
+
+        if config is None or payload.channel_id == config.star_channel_id:
+            return
+
+        state, fresh = await self.get_state(payload)
+
+        if state is None or state.author_bot:
+            return
+
+        if not fresh:
+            state.count = max(state.count - 1, 0)
+
+        self.schedule_update(state)
+
+    @Cog.listener(name="on_raw_reaction_clear")
+    async def starboard_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        self._states.pop(payload.message_id, None)
+
+    @Cog.listener(name="on_raw_reaction_clear_emoji")
+    async def starboard_reaction_clear_emoji(
+        self, payload: discord.RawReactionClearEmojiEvent
+    ):
+        if payload.emoji.name == STAR:
+            self._states.pop(payload.message_id, None)
+
+    @Cog.listener(name="on_raw_message_delete")
+    async def starred_msg_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.guild_id is not None:
+            await self.remove_starred(payload.guild_id, payload.message_id)
+
+    @Cog.listener(name="on_raw_bulk_message_delete")
+    async def starred_msg_bulk_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ):
+        if payload.guild_id is not None:
+            for message_id in payload.message_ids:
+                await self.remove_starred(payload.guild_id, message_id)
+
+    async def remove_starred(self, guild_id: int, message_id: int) -> None:
+        task = self._scheduled.pop(message_id, None)
+        if task is not None:
+            task.cancel()
+        self._rerun.discard(message_id)
+
+        self._states.pop(message_id, None)
+
+        # Deleting an unstarred message never reaches the DB or the API
+        em_id = self.get_starboard_post(guild_id, message_id)
+
+        if em_id is None:
+            return
+
+        await self.forget_post(guild_id, message_id)
+
+        config = await self.get_config(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        star_channel = (
+            guild.get_channel(config.star_channel_id) if config and guild else None  # type: ignore
+        )
+
+        try:
+            if isinstance(star_channel, discord.TextChannel):
+                await star_channel.get_partial_message(em_id).delete()
+
+        except discord.NotFound:
+            pass
+        except discord.Forbidden:
+            pass
+        except Exception as e:
+            print(f"Error in starboard msg delete event: {e}")
+
+
+async def setup(bot):
+    await bot.add_cog(StarboardEvents(bot))